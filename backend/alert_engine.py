@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+"""
+예측 기반 혈당 알림 평가
+
+save_predictions가 예측을 저장한 직후 새 예측값만으로 알림 상태를 갱신한다 (과거 데이터 재조회 없음).
+- hypo / hyper: 예측 구간의 최저/최고값이 환자 목표 범위(target_glucose_range)를 벗어남
+- rapid_fall / rapid_rise: 연속 예측값 사이의 변화 속도가 임계값 이상 (mg/dL/분)
+
+저장 형식 (환자별 문서 1건 읽기로 활성 알림 조회):
+    alerts/{patient_id} = {
+        "active": {알림 종류: 알림},     # 종류별 최대 1건 (중복 알림 방지)
+        "cooldowns": {알림 종류: ISO 시각},  # 해제/확인 후 같은 종류 재알림 금지 시각
+        "updated_at": ...,
+    }
+    alerts/{patient_id}/log/{alert_id}  # 발생/해제 이력
+"""
+import os
+from datetime import datetime, timedelta
+
+import pytz
+from firebase_admin import firestore
+
+import doctor_summary
+from firebase_client import db
+from live_events import hub as live_hub
+from singleflight import SingleFlight
+
+ALERTS_COLLECTION = "alerts"
+ALERT_LOG_COLLECTION = "log"
+ALERT_COOLDOWN_MINUTES = int(os.environ.get("ALERT_COOLDOWN_MINUTES", 30))  # 같은 종류 재알림 금지 시간
+RATE_OF_CHANGE_LIMIT = float(os.environ.get("ALERT_RATE_OF_CHANGE_LIMIT", 2.0))  # mg/dL/분
+SEVERE_HYPO = 54  # 2단계 저혈당 (mg/dL)
+SEVERE_HYPER = 250  # 심한 고혈당 (mg/dL)
+THRESHOLD_CACHE_TTL = 300  # 환자 목표 범위 캐시 시간 (초)
+PREDICTION_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+DEFAULT_TARGET_RANGE = {"min": 70, "max": 180}
+SEVERITY_RANK = {"warning": 1, "high": 2}
+KST = pytz.timezone("Asia/Seoul")
+
+ALERT_MESSAGES = {
+    "hypo": "저혈당 예측: {value:.0f} mg/dL (목표 하한 {threshold:.0f})",
+    "hyper": "고혈당 예측: {value:.0f} mg/dL (목표 상한 {threshold:.0f})",
+    "rapid_fall": "혈당 급하강 예측: {value:.1f} mg/dL/분",
+    "rapid_rise": "혈당 급상승 예측: {value:.1f} mg/dL/분",
+}
+
+patient_thresholds = SingleFlight(ttl=THRESHOLD_CACHE_TTL)
+
+
+def alerts_ref(patient_id):
+    return db.collection(ALERTS_COLLECTION).document(patient_id)
+
+
+def target_range(patient_id):
+    """환자 목표 혈당 범위 (캐시)"""
+    def load():
+        doc = db.collection("users").document(patient_id).get()
+        data = doc.to_dict() if doc.exists else {}
+        return data.get("target_glucose_range") or DEFAULT_TARGET_RANGE
+    return patient_thresholds.do(patient_id, load)
+
+
+def now_kst():
+    return datetime.now(KST)
+
+
+def detect_conditions(points, target):
+    """
+    예측값에서 알림 조건 검출
+
+    Args:
+        points: [{'timestamp': 'YYYY-MM-DD HH:MM:SS', 'value': float}, ...]
+        target: {'min': ..., 'max': ...}
+
+    Returns:
+        {알림 종류: {'severity', 'value', 'threshold', 'predicted_for'}}
+    """
+    points = sorted(points, key=lambda p: p["timestamp"])
+    low, high = target.get("min", 70), target.get("max", 180)
+    found = {}
+    if not points:
+        return found
+
+    lowest = min(points, key=lambda p: p["value"])
+    if lowest["value"] < low:
+        found["hypo"] = {"severity": "high" if lowest["value"] < SEVERE_HYPO else "warning",
+                         "value": lowest["value"], "threshold": low, "predicted_for": lowest["timestamp"]}
+    highest = max(points, key=lambda p: p["value"])
+    if highest["value"] > high:
+        found["hyper"] = {"severity": "high" if highest["value"] > SEVERE_HYPER else "warning",
+                          "value": highest["value"], "threshold": high, "predicted_for": highest["timestamp"]}
+
+    # 연속 예측값 사이 변화 속도 (가장 가파른 구간)
+    steepest_fall = steepest_rise = None
+    for prev, cur in zip(points, points[1:]):
+        minutes = (datetime.strptime(cur["timestamp"], PREDICTION_TIMESTAMP_FORMAT) -
+                   datetime.strptime(prev["timestamp"], PREDICTION_TIMESTAMP_FORMAT)).total_seconds() / 60
+        if minutes <= 0:
+            continue
+        rate = (cur["value"] - prev["value"]) / minutes
+        if steepest_fall is None or rate < steepest_fall[0]:
+            steepest_fall = (rate, cur["timestamp"])
+        if steepest_rise is None or rate > steepest_rise[0]:
+            steepest_rise = (rate, cur["timestamp"])
+    if steepest_fall and steepest_fall[0] <= -RATE_OF_CHANGE_LIMIT:
+        found["rapid_fall"] = {"severity": "high" if steepest_fall[0] <= -2 * RATE_OF_CHANGE_LIMIT else "warning",
+                               "value": round(steepest_fall[0], 2), "threshold": -RATE_OF_CHANGE_LIMIT,
+                               "predicted_for": steepest_fall[1]}
+    if steepest_rise and steepest_rise[0] >= RATE_OF_CHANGE_LIMIT:
+        found["rapid_rise"] = {"severity": "high" if steepest_rise[0] >= 2 * RATE_OF_CHANGE_LIMIT else "warning",
+                               "value": round(steepest_rise[0], 2), "threshold": RATE_OF_CHANGE_LIMIT,
+                               "predicted_for": steepest_rise[1]}
+    return found
+
+
+def new_alert(alert_type, condition, raised_at):
+    return {
+        "id": f"{alert_type}-{raised_at.strftime('%Y%m%d%H%M%S')}",
+        "type": alert_type,
+        "severity": condition["severity"],
+        "message": ALERT_MESSAGES[alert_type].format(**condition),
+        "value": condition["value"],
+        "threshold": condition["threshold"],
+        "predicted_for": condition["predicted_for"],
+        "timestamp": raised_at.isoformat(),
+        "status": "active",
+        "acknowledged": False,
+    }
+
+
+def sorted_alerts(active):
+    return sorted(active.values(), key=lambda a: a.get("timestamp") or "", reverse=True)
+
+
+def publish_changes(patient_id, active):
+    alerts = sorted_alerts(active)
+    doctor_summary.record_alerts(patient_id, alerts)
+    live_hub.publish(patient_id, "alerts", alerts)
+
+
+def evaluate_forecast(patient_id, points):
+    """
+    새 예측 결과로 환자 알림 상태 갱신
+
+    - 조건이 새로 발생하면 알림 생성 (쿨다운 중이면 심각도가 높아진 경우에만)
+    - 이미 활성인 종류는 새 알림을 만들지 않고, 심각도가 높아진 경우에만 상향
+    - 조건이 사라지면 해제하고 쿨다운 시작
+    상태가 바뀐 경우에만 쓰기. 읽기-수정-쓰기는 트랜잭션으로 처리하여 주기 평가 / 예측 저장 / 확인 요청이
+    동시에 실행되어도 쿨다운이나 확인 상태를 덮어쓰지 않음
+
+    Returns:
+        dict: {"raised": [...], "resolved": [...], "active": [...]}
+    """
+    conditions = detect_conditions(points, target_range(patient_id))
+    raised, resolved, active, changed = _apply_conditions(db.transaction(), patient_id, conditions)
+    if changed:
+        publish_changes(patient_id, active)
+        print(f"[alert] 환자({patient_id}) 알림 발생 {len(raised)}건, 해제 {len(resolved)}건, 활성 {len(active)}건")
+    return {"raised": raised, "resolved": resolved, "active": sorted_alerts(active)}
+
+
+@firestore.transactional
+def _apply_conditions(transaction, patient_id, conditions):
+    """evaluate_forecast의 트랜잭션 본문 (충돌 시 재실행되므로 부수 효과 없음)"""
+    doc = alerts_ref(patient_id).get(transaction=transaction)
+    state = doc.to_dict() if doc.exists else {}
+    active = dict(state.get("active") or {})
+    cooldowns = dict(state.get("cooldowns") or {})
+    now = now_kst()
+    raised, resolved, changed = [], [], False
+
+    for alert_type, condition in conditions.items():
+        current = active.get(alert_type)
+        if current is not None:
+            # 같은 종류가 이미 활성: 심각도가 높아진 경우에만 갱신 (다시 확인 필요)
+            if SEVERITY_RANK[condition["severity"]] > SEVERITY_RANK[current["severity"]]:
+                escalated = new_alert(alert_type, condition, now)
+                active[alert_type] = dict(current, severity=escalated["severity"], value=escalated["value"],
+                                          message=escalated["message"], predicted_for=escalated["predicted_for"],
+                                          acknowledged=False, updated_at=now.isoformat())
+                changed = True
+            continue
+        cooldown_until = cooldowns.get(alert_type)
+        in_cooldown = cooldown_until is not None and datetime.fromisoformat(cooldown_until) > now
+        if in_cooldown and condition["severity"] != "high":
+            continue
+        active[alert_type] = new_alert(alert_type, condition, now)
+        raised.append(active[alert_type])
+        changed = True
+
+    for alert_type in [t for t in active if t not in conditions]:
+        alert = active.pop(alert_type)
+        resolved.append(dict(alert, status="resolved", resolved_at=now.isoformat()))
+        cooldowns[alert_type] = (now + timedelta(minutes=ALERT_COOLDOWN_MINUTES)).isoformat()
+        changed = True
+
+    if changed:
+        transaction.set(alerts_ref(patient_id), {"active": active, "cooldowns": cooldowns,
+                                                 "updated_at": firestore.SERVER_TIMESTAMP})
+        log_ref = alerts_ref(patient_id).collection(ALERT_LOG_COLLECTION)
+        for alert in raised + resolved:
+            transaction.set(log_ref.document(alert["id"]), alert, merge=True)
+    return raised, resolved, active, changed
+
+
+def active_alerts(doc):
+    """alerts/{patient_id} 문서 스냅샷의 활성 알림 목록 (최신순)"""
+    return sorted_alerts((doc.to_dict() or {}).get("active") or {}) if doc.exists else []
+
+
+def fetch_alerts(patient_id, active_only=True, limit=None):
+    """활성 알림(문서 1건) 또는 이력 포함 알림 목록 (최신순)"""
+    alerts = active_alerts(alerts_ref(patient_id).get())
+    if not active_only:
+        active_ids = {a["id"] for a in alerts}
+        query = alerts_ref(patient_id).collection(ALERT_LOG_COLLECTION) \
+            .order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit or 50)
+        alerts += [d.to_dict() for d in query.stream() if d.id not in active_ids]
+        alerts.sort(key=lambda a: a.get("timestamp") or "", reverse=True)
+    return alerts[:limit] if limit else alerts
+
+
+def update_alert_status(patient_id, alert_id, status):
+    """
+    알림 확인(acknowledged) 또는 해제(resolved) (트랜잭션으로 읽기-수정-쓰기)
+
+    Returns:
+        갱신된 알림 (없으면 None)
+    """
+    alert, active = _apply_status(db.transaction(), patient_id, alert_id, status)
+    if alert is not None:
+        publish_changes(patient_id, active)
+    return alert
+
+
+@firestore.transactional
+def _apply_status(transaction, patient_id, alert_id, status):
+    """update_alert_status의 트랜잭션 본문. (갱신된 알림 또는 None, 활성 알림)"""
+    doc = alerts_ref(patient_id).get(transaction=transaction)
+    state = doc.to_dict() if doc.exists else {}
+    active = dict(state.get("active") or {})
+    cooldowns = dict(state.get("cooldowns") or {})
+    alert_type = next((t for t, a in active.items() if a.get("id") == alert_id), None)
+    if alert_type is None:
+        return None, active
+
+    now = now_kst()
+    if status == "resolved":
+        alert = dict(active.pop(alert_type), status="resolved", resolved_at=now.isoformat())
+    else:
+        alert = active[alert_type] = dict(active[alert_type], acknowledged=True, acknowledged_at=now.isoformat())
+    # 확인/해제한 종류는 쿨다운 동안 같은 심각도로 다시 알리지 않음
+    cooldowns[alert_type] = (now + timedelta(minutes=ALERT_COOLDOWN_MINUTES)).isoformat()
+
+    transaction.set(alerts_ref(patient_id), {"active": active, "cooldowns": cooldowns,
+                                             "updated_at": firestore.SERVER_TIMESTAMP})
+    transaction.set(alerts_ref(patient_id).collection(ALERT_LOG_COLLECTION).document(alert_id), alert, merge=True)
+    return alert, active
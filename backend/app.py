@@ -1,54 +1,44 @@
 # -*- coding: utf-8 -*-
 from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 
 import pytz
-from flask import Flask, request, jsonify, send_from_directory, url_for, session  # send_from_directory 제거
+from flask import Flask, request, jsonify, url_for, session
+from flask.json.provider import DefaultJSONProvider
 from flask_restful import Api, Resource
 from flask_cors import CORS
 import os
 import json
+import hashlib
+import itertools
+import base64
+import gzip
 import requests
-from apscheduler.schedulers.background import BackgroundScheduler
 import time
 from datetime import datetime, timedelta, timezone
 import random
-import firebase_admin
-from firebase_admin import credentials, firestore
+from firebase_admin import firestore
 from google.api_core import exceptions as google_exceptions
 import numpy as np
-from bit_maml import run_prediction_task
-from bit_maml import predict_and_store_once
+from firebase_client import db  # 공용 Firestore 클라이언트 (처음 사용할 때 생성)
+from live_events import hub as live_hub
+import alert_engine
+import doctor_summary
+from singleflight import SingleFlight
+from static_assets import StaticAssetIndex
+from webex_tokens import WebexClientPool, WebexTokenCache
+from worker import PREDICTION_REQUESTS_COLLECTION
 
-KST = pytz.timezone("Asia/Seoul")
-
-# --- Firebase 초기화 ---
-# GOOGLE_APPLICATION_CREDENTIALS 환경 변수 또는 기본 경로의 키 파일을 사용하여 초기화 시도
-SERVICE_ACCOUNT_KEY_PATH = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", "./ccccssss2-bde41-firebase-adminsdk-fbsvc-9438d30e40.json")
-db = None
 try:
-    print(f"서비스 계정 키 파일 경로 확인: {SERVICE_ACCOUNT_KEY_PATH}")
-    if not os.path.exists(SERVICE_ACCOUNT_KEY_PATH):
-        raise FileNotFoundError(f"서비스 계정 키 파일이 존재하지 않습니다: {SERVICE_ACCOUNT_KEY_PATH}")
-    if not os.access(SERVICE_ACCOUNT_KEY_PATH, os.R_OK):
-         raise PermissionError(f"서비스 계정 키 파일 읽기 권한 없음: {SERVICE_ACCOUNT_KEY_PATH}")
-
-    # 앱 중복 초기화 방지
-    if not firebase_admin._apps:
-        cred = credentials.Certificate(SERVICE_ACCOUNT_KEY_PATH)
-        firebase_admin.initialize_app(cred)
-        print("Firebase Admin SDK 초기화 성공")
-    else:
-        print("Firebase Admin SDK 이미 초기화됨")
-    db = firestore.client()
-    print("Firebase Firestore 클라이언트 생성 및 연결 성공")
-    # 간단한 연결 테스트 (옵션)
-    # db.collection('__test__').document('conn').set({'timestamp': firestore.SERVER_TIMESTAMP})
-    # print("Firestore 쓰기 테스트 완료 (무시해도 됨)")
-except Exception as e:
-    print(f"!!! Firebase 초기화 중 심각한 오류 발생: {e} !!!")
-    print("!!! Firestore 기능이 비활성화됩니다. 서비스 계정 키 경로 및 권한, 파일 형식을 확인하세요. !!!")
-    db = None
+    import orjson
+except ImportError:
+    orjson = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
 
+KST = pytz.timezone("Asia/Seoul")
 
 # 최근 12개 데이터를 가져오는 함수
 def get_recent_glucose_features(patient_id, limit=12):
@@ -85,6 +75,73 @@ app = Flask(__name__,static_folder=None)
 FRONTEND_URL = os.environ.get("FRONTEND_URL","https://cisco-git-main-kihoon-moons-projects.vercel.app") # 기본값 설정
 CORS(app, origins=[FRONTEND_URL, "http://localhost:5000","*"], supports_credentials=True) # 로컬 및 배포 주소 허용
 api = Api(app)
+
+# --- JSON 직렬화 및 응답 압축 ---
+# orjson이 설치되어 있으면 모든 API 응답 직렬화에 사용 (없으면 표준 json)
+COMPRESS_MIN_SIZE = 1024  # 이보다 작은 응답은 압축하지 않음
+COMPRESSIBLE_MIMETYPES = ("application/json", "application/x-ndjson", "text/html", "text/plain")
+
+def _json_default(obj):
+    if isinstance(obj, datetime):
+        return obj.isoformat()
+    if isinstance(obj, set):
+        return list(obj)
+    if isinstance(obj, np.generic):
+        return obj.item()
+    return str(obj)
+
+def json_dumps(obj):
+    """API 응답용 JSON 문자열 직렬화"""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_json_default,
+                            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, default=_json_default)
+
+@api.representation('application/json')
+def output_json(data, code, headers=None):
+    response = app.response_class(json_dumps(data), status=code, mimetype="application/json")
+    response.headers.extend(headers or {})
+    return response
+
+class FastJSONProvider(DefaultJSONProvider):
+    """jsonify()도 같은 직렬화 경로 사용"""
+    def dumps(self, obj, **kwargs):
+        return json_dumps(obj)
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s) if orjson is not None else json.loads(s, **kwargs)
+
+app.json = FastJSONProvider(app)
+
+def choose_content_encoding():
+    """Accept-Encoding 협상: brotli(설치 시) > gzip"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+@app.after_request
+def compress_response(response):
+    # 스트리밍(SSE, NDJSON 등)이나 이미 인코딩된 응답은 건드리지 않음
+    if (response.direct_passthrough or response.is_streamed or response.status_code < 200
+            or response.status_code >= 300 or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = choose_content_encoding()
+    body = response.get_data()
+    if not encoding or len(body) < COMPRESS_MIN_SIZE:
+        return response
+    body = brotli.compress(body, quality=5) if encoding == "br" else gzip.compress(body, compresslevel=6)
+    response.set_data(body)
+    response.headers["Content-Encoding"] = encoding
+    # 인코딩별로 바이트가 달라지므로 약한 ETag로 변환 (If-None-Match는 약한 비교)
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
 # --- Webex OAuth 설정 ---
 WEBEX_CLIENT_ID = os.environ.get('WEBEX_CLIENT_ID')
 WEBEX_CLIENT_SECRET = os.environ.get('WEBEX_CLIENT_SECRET')
@@ -95,19 +152,23 @@ WEBEX_SCOPES = os.environ.get("WEBEX_SCOPES", "spark-admin:messages_write meetin
 # --- Webex 통합 설정 (기존 코드 유지) ---
 try:
     from webex_integration import WebexAPI, MedicalWebexIntegration
+    from webex_outbox import WebexOutbox
+    from webex_bootstrap import ensure_emergency_team
 except ImportError:
     print("경고: webex_integration.py 모듈을 찾을 수 없습니다. Webex 기능이 시뮬레이션됩니다.")
     class WebexAPI: # Dummy
-        def __init__(self, access_token=None): pass
+        def __init__(self, access_token=None, **kwargs): self.access_token = access_token
         def get_user_info(self): return {"displayName": "Simulated User"}
     class MedicalWebexIntegration: # Dummy
-         def __init__(self, webex_api): self.webex_api = webex_api
+         def __init__(self, webex_api, outbox=None, team=None, account=None): self.webex_api = webex_api
          def create_emergency_session(self, **kwargs): print("[SIM] 긴급 세션 생성:", kwargs); return {"id": "sim_session"}
          def send_glucose_alert(self, **kwargs): print("[SIM] 혈당 알림:", kwargs); return {"id": "sim_msg"}
          def schedule_regular_checkup(self, **kwargs): print("[SIM] 정기 검진 예약:", kwargs); return {"id": "sim_meeting"}
+    def ensure_emergency_team(webex_api, account="service", **kwargs): return None
 
 webex_api = None
 medical_webex = None
+webex_outbox = None  # 발신 보관함: 실패한 메시지를 보낸 계정(서비스 토큰 또는 의사별 토큰)으로 재전송
 webex_token = os.environ.get("WEBEX_ACCESS_TOKEN")
 
 if not webex_token:
@@ -116,14 +177,31 @@ if not webex_token:
     medical_webex = MedicalWebexIntegration(webex_api_sim)
 else:
     try:
-        webex_api = WebexAPI(access_token=webex_token)
+        webex_api = WebexAPI(access_token=webex_token, response_cache=True)  # 사용자 / 미팅 / 세션 조회 캐시
         user_info = webex_api.get_user_info()
         print(f"Webex API 연결 성공: 사용자 '{user_info.get('displayName')}'")
-        medical_webex = MedicalWebexIntegration(webex_api)
     except Exception as e:
         print(f"!!! Webex API 초기화 실패: {e} !!! 시뮬레이션 모드.")
         webex_api_sim = WebexAPI()
         medical_webex = MedicalWebexIntegration(webex_api_sim)
+    else:
+        # 보관함을 만들 수 없으면 (읽기 전용 파일 시스템 등) 재시도 없이 바로 전송
+        try:
+            webex_outbox = WebexOutbox(webex_api, client_for=lambda user_id: get_webex_api_client_for_user(user_id)).start()
+        except Exception as e:
+            print(f"!!! Webex 발신 보관함 생성 실패: {e} !!! 보관함 없이 바로 전송합니다.")
+        medical_webex = MedicalWebexIntegration(webex_api, outbox=webex_outbox)
+
+def bootstrap_service_team():
+    # 서비스 계정의 긴급 대응 팀 / 룸을 시작 시 준비 (기록이 있으면 조회만, 요청 처리를 막지 않도록 백그라운드)
+    try:
+        team = ensure_emergency_team(webex_api, account="service")
+        medical_webex.emergency_team_id, medical_webex.emergency_room_id = team["team_id"], team["room_id"]
+    except Exception as e:
+        print(f"!!! 서비스 계정 긴급 대응 룸 준비 실패: {e} !!!")
+
+if webex_api is not None and medical_webex.webex_api is webex_api:  # 서비스 토큰 연결 성공
+    Thread(target=bootstrap_service_team, name="webex-bootstrap", daemon=True).start()
 
 # --- Firestore 컬렉션 이름 상수화 ---
 PATIENTS_COLLECTION = 'patients'
@@ -170,10 +248,12 @@ def store_tokens(user_id, access_token, refresh_token, expires_in):
     try:
         expires_at = datetime.now(timezone.utc) + timedelta(seconds=int(expires_in) - 300) # 5분 여유
         token_ref = db.collection(TOKENS_COLLECTION).document(user_id)
-        token_ref.set({
+        record = {
             'user_id': user_id, 'access_token': access_token,
             'refresh_token': refresh_token, 'expires_at': expires_at
-        }, merge=True)
+        }
+        token_ref.set(record, merge=True)
+        webex_token_cache.put(user_id, record)
         print(f"토큰 저장 완료: 사용자={user_id}")
         return True
     except Exception as e: print(f"!!! 토큰 저장 실패 ({user_id}): {e} !!!"); return False
@@ -205,35 +285,318 @@ def refresh_tokens(user_id, refresh_token):
             print("Refresh Token 만료/오류 가능성. 재인증 필요.")
             try: db.collection(TOKENS_COLLECTION).document(user_id).delete(); print(f"갱신 실패로 사용자 {user_id} 토큰 삭제됨")
             except: pass
+            webex_token_cache.invalidate(user_id)
         return None
 
+# 사용자별 토큰 메모리 캐시: 유효한 토큰은 Firestore 조회 없이 반환, 만료 전에 백그라운드에서 미리 갱신
+webex_token_cache = WebexTokenCache(get_tokens, lambda user_id, record: refresh_tokens(user_id, record.get('refresh_token')))
+if WEBEX_CLIENT_ID and WEBEX_CLIENT_SECRET:
+    webex_token_cache.start()
+
+# --- 조회 헬퍼 (개별 API와 대시보드 API에서 공용) ---
+GLULOG_VERSIONS_COLLECTION = "glulog_versions"  # 환자별 혈당 기록 쓰기 카운터 (수집 경로에서 증가)
+
+def glulog_ref(patient_id):
+    return db.collection("users").document(patient_id).collection("glulog")
+
+def glulog_version_ref(patient_id):
+    return db.collection(GLULOG_VERSIONS_COLLECTION).document(patient_id)
+
+def glulog_version_marker(snapshot):
+    """혈당 기록 쓰기 카운터 (최신 측정값이 그대로인 백필도 ETag에 반영)"""
+    if snapshot is None or not snapshot.exists:
+        return 0
+    return (snapshot.to_dict() or {}).get("writes", 0)
+
+def predict_ref(patient_id):
+    return db.collection("users").document(patient_id).collection("predict")
+
+def state_log_ref(patient_id):
+    return db.collection("state").document(patient_id).collection("log")
+
+def fetch_patient_profile(patient_id):
+    """환자 기본 정보 조회 (문서 없으면 기본값)"""
+    return patient_profile_from_snapshot(db.collection('users').document(patient_id).get())
+
+def patient_profile_from_snapshot(doc):
+    if doc.exists:
+        data = doc.to_dict()
+        # 직렬화 불가능한 타입 정제
+        for key, value in data.items():
+            if isinstance(value, set):
+                data[key] = list(value)
+
+        # 누락된 필드 보완
+        data.setdefault("name", "이름 없음")
+        data.setdefault("target_glucose_range", {"min": 70, "max": 180})
+        return data
+
+    # 문서 없을 시 기본 환자 정보 리턴
+    return {
+        "name": "김재홍",
+        "target_glucose_range": {"min": 40, "max": 200}
+    }
+
+def fetch_state_logs(patient_id, limit=50):
+    """상태 기록 조회 (최신순)"""
+    docs = state_log_ref(patient_id) \
+        .order_by("time", direction=firestore.Query.DESCENDING) \
+        .limit(limit).stream()
+
+    return [state_from_doc(doc) for doc in docs]
+
+def state_from_doc(doc):
+    return state_item(doc.to_dict())
+
+def state_item(data):
+    time_raw = data.get("time")
+    # time 필드가 datetime일 경우 ISO 포맷으로 직렬화
+    if isinstance(time_raw, datetime):
+        time_str = time_raw.astimezone(pytz.timezone("Asia/Seoul")).isoformat()
+    else:
+        time_str = time_raw  # 혹시 모르니 fallback
+
+    return {
+        "time": time_str,
+        "state": data.get("state"),
+        "meal": data.get("meal", 0),
+        "exercise": data.get("exercise", 0)
+    }
+
+def glucose_limit_for_hours(hours):
+    return min(hours * 12, 1000)  # 최대 1000개 조회 (5분 간격 기준)
+
+def fetch_glucose_readings(patient_id, hours=24):
+    """최근 혈당 기록 조회 (시간순 오름차순)"""
+    limit = glucose_limit_for_hours(hours)
+
+    # 하위 컬렉션 'glulog'에서 조회
+    readings_query = glulog_ref(patient_id) \
+        .order_by('timestamp', direction=firestore.Query.DESCENDING) \
+        .limit(limit)
+
+    readings_list = [glucose_reading_from_doc(doc) for doc in readings_query.stream()]
+    readings_list.reverse()  # 시간순 정렬 (오름차순)
+    print(f"환자({patient_id}) 혈당 {len(readings_list)}개 조회 완료 (최대 {limit}개)")
+    return readings_list
+
+# --- 혈당 스트리밍 응답 ---
+# Firestore가 문서를 넘겨주는 대로 청크 단위로 전송 (전체 목록을 메모리에 모으지 않음)
+GLUCOSE_STREAM_CHUNK_SIZE = 100
+
+def glucose_window_start(patient_id, hours):
+    """
+    스트리밍 구간 시작 timestamp (비스트리밍 경로와 같은 범위: 최신 limit개)
+
+    limit번째로 최신인 문서의 timestamp만 조회 (offset, timestamp 필드만). 기록이 limit개 이하면 None(전체).
+    """
+    limit = glucose_limit_for_hours(hours)
+    docs = glulog_ref(patient_id) \
+        .order_by("timestamp", direction=firestore.Query.DESCENDING) \
+        .select(["timestamp"]).offset(limit - 1).limit(1).stream()
+    oldest = next(iter(docs), None)
+    return oldest.get("timestamp") if oldest is not None else None
+
+def glucose_window_docs(patient_id, hours):
+    """
+    최근 혈당 문서를 오름차순으로 Firestore가 넘겨주는 대로 반환 (목록으로 모으지 않음)
+
+    첫 문서는 응답 시작 전에 받아서 쿼리 오류(인덱스 등)가 응답 전에 드러나도록 한다.
+    """
+    query = glulog_ref(patient_id).order_by("timestamp", direction=firestore.Query.ASCENDING)
+    window_start = glucose_window_start(patient_id, hours)
+    if window_start is not None:
+        query = query.where("timestamp", ">=", window_start)
+    docs = iter(query.stream())
+    first = next(docs, None)
+    return docs if first is None else itertools.chain([first], docs)
+
+def iter_glucose_json(docs, sync_token=None):
+    """{"readings": [...], "sync_token": ...} 형식 JSON을 청크 단위로 생성"""
+    yield '{"readings": ['
+    separator, chunk = "", []
+    for doc in docs:
+        chunk.append(json_dumps(glucose_reading_from_doc(doc)))
+        if len(chunk) >= GLUCOSE_STREAM_CHUNK_SIZE:
+            yield separator + ",".join(chunk)
+            separator, chunk = ",", []
+    if chunk:
+        yield separator + ",".join(chunk)
+    yield '], "sync_token": ' + json_dumps(sync_token) + '}'
+
+def iter_glucose_ndjson(docs):
+    """측정값 1건당 1줄 (NDJSON)"""
+    chunk = []
+    for doc in docs:
+        chunk.append(json_dumps(glucose_reading_from_doc(doc)))
+        if len(chunk) >= GLUCOSE_STREAM_CHUNK_SIZE:
+            yield "\n".join(chunk) + "\n"
+            chunk = []
+    if chunk:
+        yield "\n".join(chunk) + "\n"
+
+# --- 열 지향(columnar) 혈당 응답 ---
+# 측정값마다 반복되는 키 이름 대신 필드별 배열 + 델타 인코딩된 epoch 초 타임스탬프
+GLUCOSE_COLUMNS = ("glucose", "meal", "exercise", "stressors", "hypo_event", "hour", "is_night", "is_meal_time")
+
+def iso_to_epoch(iso_str):
+    dt = datetime.fromisoformat(iso_str)
+    if dt.tzinfo is None:
+        dt = KST.localize(dt)  # glulog timestamp는 KST 기준
+    return int(dt.timestamp())
+
+def glucose_columnar(readings):
+    """
+    readings(오름차순) -> {"t0": 첫 epoch 초, "dt": [이전 대비 초 차이...], "glucose": [...], ...}
+    timestamp[i] = t0 + sum(dt[:i + 1])
+    """
+    readings = [r for r in readings if r.get("timestamp")]
+    epochs = np.array([iso_to_epoch(r["timestamp"]) for r in readings], dtype=np.int64)
+    columns = {"format": "columnar", "count": len(readings),
+               "t0": int(epochs[0]) if len(epochs) else None,
+               "dt": np.diff(epochs, prepend=epochs[:1]).tolist() if len(epochs) else []}
+    for name in GLUCOSE_COLUMNS:
+        columns[name] = [r.get(name) for r in readings]
+    return columns
+
+def glucose_reading_from_doc(doc):
+    data = doc.to_dict()
+    data['timestamp'] = firestore_timestamp_to_iso(data.get('timestamp'))
+    # data['glucose'] = data.get('value', 0)  # 필요 시 사용
+    return data
+
+def fetch_predictions(patient_id, limit=20):
+    """예측 데이터 조회 (최신순)"""
+    docs = predict_ref(patient_id).order_by("timestamp", direction=firestore.Query.DESCENDING).limit(limit).stream()
+
+    return [prediction_from_doc(doc) for doc in docs]
+
+def prediction_from_doc(doc):
+    data = doc.to_dict()
+    return {
+        "timestamp": data.get("timestamp"),
+        "value": data.get("value"),
+        "predicted_at": data.get("predicted_at")
+    }
+
+# --- 조건부 GET (ETag / Cache-Control) ---
+# 폴링 시 변경이 없으면 전체 컬렉션을 다시 읽지 않고 304 응답
+# ETag는 각 컬렉션의 최신 문서(ID + update_time) 1건만 조회하여 계산
+# (혈당은 최신 문서 + 쓰기 카운터: 과거 시각 측정값 백필은 최신 문서를 바꾸지 않음)
+PATIENT_DATA_CACHE_CONTROL = "private, no-cache"  # 브라우저 캐시 허용, 매 요청 ETag 재검증
+
+# --- 동시 동일 조회 병합 (single-flight) ---
+# 같은 (조회 종류, 환자, 파라미터)로 동시에 들어온 요청은 하나의 Firestore 조회 결과를 공유
+# 결과는 공유 객체이므로 호출 측에서 수정하지 않아야 함
+READ_COALESCE_TTL = float(os.environ.get("READ_COALESCE_TTL", 0.5))  # 완료 결과 재사용 시간 (초)
+read_coalescer = SingleFlight(ttl=READ_COALESCE_TTL)
+
+def coalesced_read(key, fn):
+    return read_coalescer.do(key, fn)
+
+def invalidate_patient_reads(patient_id):
+    """자체 쓰기 직후 해당 환자의 병합 캐시 무효화"""
+    read_coalescer.forget_if(lambda key: key[1] == patient_id)
+
+def latest_doc(collection_ref, order_field):
+    """정렬 필드 기준 최신 문서 1건 (정렬 필드만 조회)"""
+    docs = collection_ref.order_by(order_field, direction=firestore.Query.DESCENDING) \
+        .select([order_field]).limit(1).stream()
+    return next(iter(docs), None)
+
+def doc_marker(snapshot):
+    """문서 버전 표식 (문서 ID + 수정 시각)"""
+    if snapshot is None:
+        return "empty"
+    return f"{snapshot.id}@{snapshot.update_time}"
+
+def make_etag(*parts):
+    return hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()[:32]
+
+def cache_headers(etag):
+    return {"ETag": f'"{etag}"', "Cache-Control": PATIENT_DATA_CACHE_CONTROL}
+
+def not_modified_response(etag):
+    response = app.response_class(status=304)
+    response.headers.update(cache_headers(etag))
+    return response
+
+# --- 증분 동기화 (since / sync_token) ---
+# 클라이언트가 마지막으로 받은 레코드의 정렬 필드 값(+ 문서 ID)을 토큰으로 보관하고,
+# 다음 폴링 시 그 이후 레코드만 인덱스 범위 쿼리로 조회
+# 혈당은 측정 시각이 아닌 서버 기록 시각(ingested_at) 기준: 과거 시각 측정값 백필도 다음 증분에 포함
+SYNC_MAX_RECORDS = 1000
+GLULOG_SYNC_FIELD = "ingested_at"
+
+def encode_sync_token(value, doc_id=None, field=None):
+    """정렬 필드 값(문자열 또는 datetime)과 마지막 문서 ID를 불투명 토큰으로 인코딩"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        raw = {"t": "d", "v": value.isoformat()}
+    else:
+        raw = {"t": "s", "v": str(value)}
+    if doc_id is not None:
+        raw["id"] = doc_id
+    if field is not None:
+        raw["f"] = field
+    return base64.urlsafe_b64encode(json.dumps(raw).encode("utf-8")).decode("ascii").rstrip("=")
+
+def decode_sync_token(token, field=None):
+    """토큰을 (정렬 필드 값, 문서 ID 또는 None)으로 복원 (형식 오류 / 다른 정렬 필드의 토큰이면 ValueError)"""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        value = datetime.fromisoformat(raw["v"]) if raw["t"] == "d" else raw["v"]
+    except Exception as e:
+        raise ValueError(f"잘못된 sync token: {token}") from e
+    if raw.get("f") != field:
+        raise ValueError(f"잘못된 sync token: {token} (전체 조회 후 새 토큰 사용)")
+    return value, raw.get("id")
+
+def token_field(order_field):
+    # 정렬 필드가 바뀐 혈당 토큰만 필드를 기록 (기존 상태 / 예측 토큰은 그대로 유효)
+    return order_field if order_field == GLULOG_SYNC_FIELD else None
+
+def since_query(collection_ref, order_field, since_token, limit=SYNC_MAX_RECORDS):
+    """토큰 이후 레코드를 오름차순으로 조회하는 쿼리 (같은 값의 문서는 문서 ID 순, 동기 / 비동기 컬렉션 공용)"""
+    since_value, since_id = decode_sync_token(since_token, token_field(order_field))
+    if since_id is None:
+        return collection_ref.where(order_field, ">", since_value).order_by(order_field).limit(limit)
+    # 같은 배치로 기록된 문서는 ingested_at이 같으므로 문서 ID까지 커서로 사용
+    return collection_ref.order_by(order_field).order_by("__name__") \
+        .start_after({order_field: since_value, "__name__": since_id}).limit(limit)
+
+def next_sync_token(docs, order_field, since_token):
+    if not docs:
+        return since_token
+    return encode_sync_token(docs[-1].get(order_field), docs[-1].id, token_field(order_field))
+
+def delta_response(collection_ref, order_field, to_item, key, since_token):
+    """증분 응답: {key: [...], sync_token, has_more}"""
+    docs = list(since_query(collection_ref, order_field, since_token).stream())
+    return {key: [to_item(doc) for doc in docs], "sync_token": next_sync_token(docs, order_field, since_token),
+            "has_more": len(docs) >= SYNC_MAX_RECORDS}
+
+def glucose_sync_token(version):
+    """혈당 전체 조회 응답의 sync token: 마지막 수집 배치의 서버 기록 시각 (쓰기 카운터 문서, 없으면 None)"""
+    if version is None or not version.exists:
+        return None
+    return encode_sync_token((version.to_dict() or {}).get("updated_at"), field=GLULOG_SYNC_FIELD)
+
+def request_since_token():
+    return request.args.get('since') or request.args.get('sync_token')
+
 class PatientResource(Resource):
     def get(self, patient_id):
         if not db:
             return {"error": "Database service unavailable"}, 503
         try:
-            patient_ref = db.collection('users').document(patient_id)
-            doc = patient_ref.get()
-
-            if doc.exists:
-                data = doc.to_dict()
-                # 직렬화 불가능한 타입 정제
-                for key, value in data.items():
-                    if isinstance(value, set):
-                        data[key] = list(value)
-
-                # 누락된 필드 보완
-                data.setdefault("name", "이름 없음")
-                data.setdefault("target_glucose_range", {"min": 70, "max": 180})
-                return data, 200
-
-            else:
-                # 문서 없을 시 기본 환자 정보 리턴
-                default_data = {
-                    "name": "김재홍",
-                    "target_glucose_range": {"min": 40, "max": 200}
-                }
-                return default_data, 200
+            doc = coalesced_read(("patient_doc", patient_id),
+                                 lambda: db.collection('users').document(patient_id).get())
+            etag = make_etag("patient", patient_id, doc.update_time if doc.exists else "default")
+            if request.if_none_match.contains_weak(etag):
+                return not_modified_response(etag)
+            return patient_profile_from_snapshot(doc), 200, cache_headers(etag)
 
         except Exception as e:
             print(f"[PatientResource.get] Error for patient_id={patient_id}: {e}")
@@ -241,35 +604,74 @@ class PatientResource(Resource):
 
 
 
+# --- 예측 실행 요청 ---
+# inline: 웹 프로세스에서 바로 예측 (torch는 이때 처음 import)
+# worker: prediction_requests/{patient_id} 문서만 남기고 예측 워커(worker.py)가 처리
+#   워커(python worker.py)를 별도로 실행하는 배포에서만 사용 (Vercel 배포는 워커가 없으므로 inline)
+PREDICTION_MODE = os.environ.get("PREDICTION_MODE", "inline")
+
+def request_prediction(patient_id, batch=None):
+    """예측 요청 (worker 모드에서 batch를 주면 요청 문서 쓰기를 호출 측 배치에 포함)"""
+    if PREDICTION_MODE == "worker":
+        request_ref = db.collection(PREDICTION_REQUESTS_COLLECTION).document(patient_id)
+        request_doc = {"patient_id": patient_id, "requested_at": firestore.SERVER_TIMESTAMP}
+        if batch is not None:
+            batch.set(request_ref, request_doc)
+        else:
+            request_ref.set(request_doc)
+        print(f"[request_prediction] 환자({patient_id}) 예측 요청 등록 (워커 처리)")
+        return
+    from bit_maml import predict_and_store_once  # torch / 모델은 실제 예측 시에만 로드
+    predict_and_store_once(patient_id)
+
+# --- 환자별 최신 glulog 문서 포인터 ---
+# 상태 기록 시 최신 측정값을 찾는 쿼리를 생략하기 위한 캐시 (혈당 수집/조회/실시간 리스너가 갱신)
+# 다른 인스턴스의 쓰기를 놓칠 수 있으므로 TTL이 지나면 다시 쿼리
+LATEST_GLULOG_POINTER_TTL = float(os.environ.get("LATEST_GLULOG_POINTER_TTL", 60))
+latest_glulog_ids = {}  # patient_id -> (glulog 문서 ID, 기록 시각)
+
+def remember_latest_glulog(patient_id, doc_id):
+    """더 최신(문서 ID = KST timestamp 문자열 비교)이거나 만료된 경우에만 포인터 교체"""
+    if not doc_id:
+        return
+    cached = latest_glulog_ids.get(patient_id)
+    if cached is None or doc_id >= cached[0] or time.monotonic() - cached[1] >= LATEST_GLULOG_POINTER_TTL:
+        latest_glulog_ids[patient_id] = (doc_id, time.monotonic())
+
+def forget_latest_glulog(patient_id):
+    latest_glulog_ids.pop(patient_id, None)
+
+def latest_glulog_id(patient_id):
+    """최신 glulog 문서 ID (캐시 미스 시에만 쿼리, 기록 없으면 None)"""
+    cached = latest_glulog_ids.get(patient_id)
+    if cached is not None and time.monotonic() - cached[1] < LATEST_GLULOG_POINTER_TTL:
+        return cached[0]
+    latest = latest_doc(glulog_ref(patient_id), "timestamp")
+    if latest is None:
+        return None
+    latest_glulog_ids[patient_id] = (latest.id, time.monotonic())
+    return latest.id
+
 class StateResource(Resource):
     def get(self, patient_id):
         """상태 기록 조회"""
         if not db:
             return {"error": "Database unavailable"}, 503
         try:
-            docs = db.collection("state").document(patient_id).collection("log") \
-                .order_by("time", direction=firestore.Query.DESCENDING) \
-                .limit(50).stream()
-
-            states = []
-            for doc in docs:
-                data = doc.to_dict()
-                time_raw = data.get("time")
-                # time 필드가 datetime일 경우 ISO 포맷으로 직렬화
-                if isinstance(time_raw, datetime):
-                    time_str = time_raw.astimezone(pytz.timezone("Asia/Seoul")).isoformat()
-                else:
-                    time_str = time_raw  # 혹시 모르니 fallback
-
-                states.append({
-                    "time": time_str,
-                    "state": data.get("state"),
-                    "meal": data.get("meal", 0),
-                    "exercise": data.get("exercise", 0)
-                })
-
-            return {"states": states}, 200
-
+            since = request_since_token()
+            if since:
+                return delta_response(state_log_ref(patient_id), "time", state_from_doc, "states", since), 200
+
+            latest = coalesced_read(("states_latest", patient_id), lambda: latest_doc(state_log_ref(patient_id), "time"))
+            etag = make_etag("states", patient_id, doc_marker(latest))
+            if request.if_none_match.contains_weak(etag):
+                return not_modified_response(etag)
+            sync_token = encode_sync_token(latest.get("time")) if latest else None
+            states = coalesced_read(("states", patient_id, 50), lambda: fetch_state_logs(patient_id))
+            return {"states": states, "sync_token": sync_token}, 200, cache_headers(etag)
+
+        except ValueError as e:
+            return {"error": str(e)}, 400
         except Exception as e:
             print(f"[StateResource.get] Error: {e}")
             return {"error": "Internal server error fetching states"}, 500
@@ -296,36 +698,201 @@ class StateResource(Resource):
             else:
                 return {"error": "Invalid state type. Only 'meal' or 'exercise' allowed."}, 400
 
-            # --- 1단계: glulog 가장 최근 데이터 업데이트 ---
-            logs_ref = db.collection("users").document(patient_id).collection("glulog")
-            docs = logs_ref.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(1).stream()
-            recent_doc = next(docs, None)
-
-            if not recent_doc:
-                return {"error": "No existing glucose log found to update"}, 404
-
-            recent_doc_ref = logs_ref.document(recent_doc.id)
-            recent_doc_ref.update({field_name: value})
-
-            # --- 2단계: state/{patient_id}/{timestamp} 저장 ---
             now_kst = datetime.now(pytz.timezone("Asia/Seoul"))
             timestamp_str = now_kst.strftime("%Y-%m-%d %H:%M:%S")
-
-            state_ref = db.collection("state").document(patient_id).collection("log").document(timestamp_str)
-            state_ref.set({
+            state_doc = {
                 "state": state_type,
                 "value": value,
                 "time": timestamp_str,
                 "patient_id": patient_id
-            })
+            }
+
+            # 최신 glulog 갱신 + state/{patient_id}/log/{timestamp} 저장 (+ 워커 예측 요청)을 배치 1회로 커밋
+            # 포인터가 가리키던 문서가 사라진 경우(NotFound)에만 쿼리로 다시 찾아 한 번 재시도
+            for attempt in range(2):
+                recent_id = latest_glulog_id(patient_id)
+                if not recent_id:
+                    return {"error": "No existing glucose log found to update"}, 404
+                batch = db.batch()
+                batch.update(glulog_ref(patient_id).document(recent_id), {field_name: value})
+                batch.set(state_log_ref(patient_id).document(timestamp_str), state_doc)
+                if PREDICTION_MODE == "worker":
+                    request_prediction(patient_id, batch)
+                try:
+                    batch.commit()
+                    break
+                except google_exceptions.NotFound:
+                    forget_latest_glulog(patient_id)
+                    if attempt:
+                        return {"error": "No existing glucose log found to update"}, 404
+
+            invalidate_patient_reads(patient_id)
+            live_hub.publish(patient_id, "state", state_item(state_doc), timestamp_str)
 
             print(f"[StateResource.post] ✅ {field_name}={value} 업데이트 완료 & 상태 기록 저장")
-            predict_and_store_once(patient_id)
+            if PREDICTION_MODE != "worker":
+                request_prediction(patient_id)
             return {"message": f"{field_name} updated & state saved"}, 200
 
         except Exception as e:
             print(f"[StateResource.post] Error: {e}")
             return {"error": "Internal server error updating state"}, 500
+
+# --- 혈당 일괄 수집 (Bulk Ingest) ---
+GLULOG_TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"  # glulog 문서 ID 및 timestamp 필드 형식 (KST)
+FIRESTORE_BATCH_LIMIT = 500  # Firestore 배치 1회당 최대 쓰기 수
+NIGHT_START_HOUR, NIGHT_END_HOUR = 22, 6  # is_night: 22시 ~ 6시
+MEAL_HOURS = (7, 8, 12, 13, 18, 19)  # is_meal_time: 아침/점심/저녁 시간대
+INGEST_OPTIONAL_FIELDS = ("meal", "exercise", "stressors", "hypo_event")
+LIVE_EVENT_MAX_READINGS = 20  # 수집 시 실시간 구독자에게 전달할 최신 측정값 수
+
+def normalize_glulog_timestamp(value):
+    """입력 timestamp(문자열/ISO 8601/epoch 초)를 glulog 형식(KST, '%Y-%m-%d %H:%M:%S')으로 변환"""
+    if isinstance(value, (int, float)):
+        dt = datetime.fromtimestamp(value, tz=timezone.utc)
+    elif isinstance(value, str):
+        try:
+            return datetime.strptime(value, GLULOG_TIMESTAMP_FORMAT).strftime(GLULOG_TIMESTAMP_FORMAT)
+        except ValueError:
+            dt = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    else:
+        raise ValueError(f"지원되지 않는 timestamp 형식: {value!r}")
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(KST)
+    return dt.strftime(GLULOG_TIMESTAMP_FORMAT)
+
+def parse_ingest_payload():
+    """요청 바디에서 측정값 목록 추출 (JSON 배열, {"readings": [...]} 또는 NDJSON)"""
+    content_type = (request.content_type or "").lower()
+    if "ndjson" in content_type or "jsonlines" in content_type:
+        body = request.get_data(as_text=True)
+        return [json.loads(line) for line in body.splitlines() if line.strip()]
+    payload = request.get_json(silent=True)
+    if isinstance(payload, dict):
+        payload = payload.get("readings", [payload])
+    if not isinstance(payload, list):
+        raise ValueError("readings 배열이 필요합니다.")
+    return payload
+
+def compute_glulog_features(timestamps):
+    """timestamp 문자열 배열에서 hour / is_night / is_meal_time 파생 변수를 벡터 연산으로 계산"""
+    ts = np.array(timestamps, dtype='datetime64[s]')
+    hours = (ts.astype('datetime64[h]') - ts.astype('datetime64[D]')).astype(int)
+    is_night = ((hours >= NIGHT_START_HOUR) | (hours < NIGHT_END_HOUR)).astype(int)
+    is_meal_time = np.isin(hours, MEAL_HOURS).astype(int)
+    return hours, is_night, is_meal_time
+
+def parse_glucose_readings(raw_readings):
+    """
+    요청 측정값 파싱. 형식이 잘못된 측정값(선택 필드 포함)은 건너뛰고 invalid로 집계
+
+    Returns:
+        (timestamps, glucose_values, extras, invalid)
+    """
+    timestamps, glucose_values, extras, invalid = [], [], [], 0
+    for raw in raw_readings:
+        try:
+            ts_str = normalize_glulog_timestamp(raw["timestamp"])
+            glucose = float(raw.get("glucose", raw.get("value")))
+            extra = {k: float(raw[k]) for k in INGEST_OPTIONAL_FIELDS if raw.get(k) is not None}
+        except (KeyError, TypeError, ValueError, AttributeError):
+            invalid += 1
+            continue
+        timestamps.append(ts_str)
+        glucose_values.append(glucose)
+        extras.append(extra)
+    return timestamps, glucose_values, extras, invalid
+
+def first_occurrences(timestamps):
+    """요청 내 중복 제거: {timestamp: 처음 등장한 위치}"""
+    first_idx = {}
+    for i, ts in enumerate(timestamps):
+        first_idx.setdefault(ts, i)
+    return first_idx
+
+def ingest_glucose_readings(patient_id, raw_readings):
+    """
+    혈당 측정값 일괄 저장 (멱등)
+
+    - 요청 내 중복 timestamp 제거 (처음 값 유지)
+    - 이미 저장된 문서 ID(timestamp) 제외
+    - 파생 변수 계산 후 최대 500개 단위 배치 쓰기
+
+    Returns:
+        summary: 처리 결과 요약 딕셔너리
+    """
+    started = time.perf_counter()
+
+    timestamps, glucose_values, extras, invalid = parse_glucose_readings(raw_readings)
+    first_idx = first_occurrences(timestamps)
+    duplicates_in_request = len(timestamps) - len(first_idx)
+
+    logs_ref = glulog_ref(patient_id)
+
+    # 이미 저장된 문서 ID 확인 (필드 없이 존재 여부만 조회)
+    stored_ids = set()
+    unique_ts = list(first_idx)
+    for start in range(0, len(unique_ts), FIRESTORE_BATCH_LIMIT):
+        refs = [logs_ref.document(ts) for ts in unique_ts[start:start + FIRESTORE_BATCH_LIMIT]]
+        for snap in db.get_all(refs, field_paths=[]):
+            if snap.exists:
+                stored_ids.add(snap.id)
+
+    new_idx = sorted((i for ts, i in first_idx.items() if ts not in stored_ids), key=lambda i: timestamps[i])
+
+    written, live_docs = 0, []
+    if new_idx:
+        new_ts = [timestamps[i] for i in new_idx]
+        hours, is_night, is_meal_time = compute_glulog_features(new_ts)
+        chunk = FIRESTORE_BATCH_LIMIT - 1  # 배치마다 쓰기 카운터 1건 포함
+        for start in range(0, len(new_idx), chunk):
+            batch = db.batch()
+            end = min(start + chunk, len(new_idx))
+            for j in range(start, end):
+                i = new_idx[j]
+                doc = {"meal": 0.0, "exercise": 0.0, "stressors": 0.0, "hypo_event": 0.0}
+                doc.update(extras[i])
+                doc.update({
+                    "timestamp": new_ts[j],
+                    "glucose": glucose_values[i],
+                    "hour": int(hours[j]),
+                    "is_night": int(is_night[j]),
+                    "is_meal_time": int(is_meal_time[j]),
+                })
+                batch.set(logs_ref.document(new_ts[j]), dict(doc, ingested_at=firestore.SERVER_TIMESTAMP))
+                if j >= len(new_idx) - LIVE_EVENT_MAX_READINGS:
+                    live_docs.append(doc)
+            # 측정값과 같은 배치로 카운터 증가 (ETag가 백필 / 과거 측정값 추가도 감지)
+            batch.set(glulog_version_ref(patient_id),
+                      {"writes": firestore.Increment(end - start), "updated_at": firestore.SERVER_TIMESTAMP}, merge=True)
+            batch.commit()
+        written = len(new_idx)
+        invalidate_patient_reads(patient_id)
+
+        # 백필(과거 데이터)이 아닌 경우에만 의사 대시보드 요약의 최신 혈당 갱신
+        latest = latest_doc(logs_ref, "timestamp")
+        remember_latest_glulog(patient_id, latest.id if latest else None)
+        if latest is not None and latest.id in new_ts:
+            j = new_ts.index(latest.id)
+            doctor_summary.record_reading(patient_id, glucose_values[new_idx[j]], latest.id)
+
+        # 실시간 구독자에게 최신 측정값 전달 (대량 백필 시 최근 일부만)
+        for doc in live_docs:
+            live_hub.publish(patient_id, "reading", dict(doc, timestamp=firestore_timestamp_to_iso(doc["timestamp"])), doc["timestamp"])
+
+    elapsed = time.perf_counter() - started
+    summary = {
+        "received": len(raw_readings),
+        "invalid": invalid,
+        "duplicates_in_request": duplicates_in_request,
+        "already_stored": len(stored_ids),
+        "written": written,
+        "elapsed_ms": round(elapsed * 1000, 1),
+        "readings_per_second": round(len(raw_readings) / elapsed, 1) if elapsed > 0 else None,
+    }
+    print(f"[ingest] 환자({patient_id}) 혈당 수집: {summary}")
+    return summary
+
 class GlucoseResource(Resource):
     """혈당 데이터 API"""
     """혈당 데이터 API"""
@@ -334,28 +901,38 @@ class GlucoseResource(Resource):
         if not db:
             return {"error": "DB 미연결"}, 503
         try:
+            since = request_since_token()
+            if since:
+                return delta_response(glulog_ref(patient_id), GLULOG_SYNC_FIELD, glucose_reading_from_doc, "readings", since), 200
+
             hours = request.args.get('hours', default=24, type=int)
-            limit = min(hours * 12, 1000)  # 최대 1000개 조회 (5분 간격 기준)
-
-            # 하위 컬렉션 'glulog'에서 조회
-            readings_query = db.collection('users') \
-                .document(patient_id) \
-                .collection('glulog') \
-                .order_by('timestamp', direction=firestore.Query.DESCENDING) \
-                .limit(limit)
-
-            docs = readings_query.stream()
-            readings_list = []
-            for doc in docs:
-                data = doc.to_dict()
-                data['timestamp'] = firestore_timestamp_to_iso(data.get('timestamp'))
-                # data['glucose'] = data.get('value', 0)  # 필요 시 사용
-                readings_list.append(data)
-
-            readings_list.reverse()  # 시간순 정렬 (오름차순)
-            print(f"환자({patient_id}) 혈당 {len(readings_list)}개 조회 완료 (최대 {limit}개)")
-            return {"readings": readings_list}, 200
+            response_format = request.args.get('format', default='json')
+            streaming = response_format == 'ndjson' or request.args.get('stream', type=int) == 1
+            latest = coalesced_read(("glucose_latest", patient_id), lambda: latest_doc(glulog_ref(patient_id), "timestamp"))
+            remember_latest_glulog(patient_id, latest.id if latest else None)
+            version = coalesced_read(("glucose_version", patient_id), lambda: glulog_version_ref(patient_id).get())
+            etag = make_etag("glucose", patient_id, hours, response_format, streaming, doc_marker(latest),
+                             glulog_version_marker(version))
+            if request.if_none_match.contains_weak(etag):
+                return not_modified_response(etag)
+
+            if streaming:
+                # 스트리밍 모드: 최근 hours 시간 범위를 청크 단위로 직렬화하여 전송
+                docs = glucose_window_docs(patient_id, hours)
+                if response_format == 'ndjson':
+                    body, mimetype = iter_glucose_ndjson(docs), "application/x-ndjson"
+                else:
+                    body, mimetype = iter_glucose_json(docs, glucose_sync_token(version)), "application/json"
+                return app.response_class(body, mimetype=mimetype, headers=cache_headers(etag))
+
+            sync_token = glucose_sync_token(version)
+            readings = coalesced_read(("glucose", patient_id, hours), lambda: fetch_glucose_readings(patient_id, hours))
+            if response_format == 'columnar':
+                return dict(glucose_columnar(readings), sync_token=sync_token), 200, cache_headers(etag)
+            return {"readings": readings, "sync_token": sync_token}, 200, cache_headers(etag)
 
+        except ValueError as e:
+            return {"error": str(e)}, 400
         except google_exceptions.NotFound as e:
             print(f"Firestore 하위 컬렉션(glulog) 없음 오류: {e}")
             return {"error": f"DB 오류: 'glulog' 하위 컬렉션 없음"}, 500
@@ -371,7 +948,20 @@ class GlucoseResource(Resource):
             return {"error": f"서버 오류 (혈당 조회): {str(e)}"}, 500
 
     def post(self, patient_id):
-        return 500
+        """단일 혈당 측정값 저장 (일괄 수집 경로 재사용)"""
+        if not db:
+            return {"error": "DB 미연결"}, 503
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict):
+            return {"error": "측정값 데이터가 필요합니다."}, 400
+        try:
+            summary = ingest_glucose_readings(patient_id, [payload])
+        except Exception as e:
+            print(f"혈당({patient_id}) 저장 오류: {e}")
+            return {"error": f"서버 오류 (혈당 저장): {str(e)}"}, 500
+        if summary["invalid"]:
+            return {"error": "timestamp 및 glucose 값이 올바르지 않습니다."}, 400
+        return summary, 201 if summary["written"] else 200
 
     def _trigger_prediction_update(self, patient_id):
         return 500
@@ -379,63 +969,265 @@ class GlucoseResource(Resource):
     def _run_prediction_and_alerting_logic(self, patient_id):
         return 500
 
+class GlucoseBulkIngestResource(Resource):
+    """혈당 데이터 일괄 수집 API (JSON 배열 또는 NDJSON)"""
+    def post(self, patient_id):
+        if not db:
+            return {"error": "DB 미연결"}, 503
+        try:
+            raw_readings = parse_ingest_payload()
+        except ValueError as e:
+            return {"error": f"잘못된 요청 형식: {e}"}, 400
+        if not raw_readings:
+            return {"error": "No input data provided"}, 400
+        try:
+            return ingest_glucose_readings(patient_id, raw_readings), 200
+        except Exception as e:
+            print(f"혈당({patient_id}) 일괄 수집 오류: {e}")
+            return {"error": f"서버 오류 (혈당 일괄 수집): {str(e)}"}, 500
+
 class PredictionResource(Resource):
     """예측 정보 API"""
     def get(self, patient_id):
         if not db:
             return {"error": "Database service unavailable"}, 503
         try:
-            # Firestore에서 해당 환자의 예측 데이터 조회
-            pred_ref = db.collection("users").document(patient_id).collection("predict")
-            docs = pred_ref.order_by("timestamp", direction=firestore.Query.DESCENDING).limit(20).stream()
-
-            predictions = []
-            for doc in docs:
-                data = doc.to_dict()
-                predictions.append({
-                    "timestamp": data.get("timestamp"),
-                    "value": data.get("value"),
-                    "predicted_at": data.get("predicted_at")
-                })
-
-            return {"predictions": predictions}, 200
+            # 예측 문서는 예측 시점(timestamp)을 키로 덮어쓰므로 새 레코드 기준은 predicted_at
+            since = request_since_token()
+            if since:
+                return delta_response(predict_ref(patient_id), "predicted_at", prediction_from_doc, "predictions", since), 200
 
+            # Firestore에서 해당 환자의 예측 데이터 조회
+            latest = coalesced_read(("predictions_latest", patient_id), lambda: latest_doc(predict_ref(patient_id), "timestamp"))
+            etag = make_etag("predictions", patient_id, doc_marker(latest))
+            if request.if_none_match.contains_weak(etag):
+                return not_modified_response(etag)
+            predictions = coalesced_read(("predictions", patient_id, 20), lambda: fetch_predictions(patient_id))
+            predicted_at = [p["predicted_at"] for p in predictions if p["predicted_at"]]
+            sync_token = encode_sync_token(max(predicted_at)) if predicted_at else None
+            return {"predictions": predictions, "sync_token": sync_token}, 200, cache_headers(etag)
+
+        except ValueError as e:
+            return {"error": str(e)}, 400
         except Exception as e:
             print(f"[PredictionResource.get] Error for patient_id={patient_id}: {e}")
             return {"error": "Internal server error fetching predictions"}, 500
 
 
+# --- 실시간 스트림 (Server-Sent Events) ---
+# 환자별 Firestore 리스너는 첫 구독자가 생길 때 시작되어 모든 구독자가 공유
+LIVE_STREAM_MAX_SUBSCRIBERS = int(os.environ.get("LIVE_STREAM_MAX_SUBSCRIBERS", 500))
+LIVE_FORECAST_POINTS = 20
+
+def start_patient_listeners(patient_id, publish):
+    """환자의 glulog / state / predict 변경을 감시하는 Firestore 리스너 시작"""
+    def watch(query, on_changes):
+        initial = [True]
+        def on_snapshot(docs, changes, read_time):
+            # 최초 스냅샷은 기존 문서 전체이므로 건너뜀
+            if initial[0]:
+                initial[0] = False
+                return
+            changed = [c.document for c in changes if c.type.name in ("ADDED", "MODIFIED")]
+            if changed:
+                on_changes(changed)
+        return query.on_snapshot(on_snapshot)
+
+    def on_readings(changed):
+        for doc in changed:
+            remember_latest_glulog(patient_id, doc.id)
+            publish("reading", glucose_reading_from_doc(doc), doc.get("timestamp"))
+
+    def on_states(changed):
+        for doc in changed:
+            publish("state", state_from_doc(doc), doc.id)
+
+    def on_forecast(changed):
+        points = sorted((prediction_from_doc(doc) for doc in changed), key=lambda p: p["timestamp"] or "")
+        publish("forecast", points, max((p["predicted_at"] or "") for p in points))
+
+    desc = firestore.Query.DESCENDING
+    return [
+        watch(glulog_ref(patient_id).order_by("timestamp", direction=desc).limit(1), on_readings),
+        watch(state_log_ref(patient_id).order_by("time", direction=desc).limit(1), on_states),
+        watch(predict_ref(patient_id).order_by("timestamp", direction=desc).limit(LIVE_FORECAST_POINTS), on_forecast),
+    ]
+
+live_hub.listener_factory = lambda patient_id, publish: start_patient_listeners(patient_id, publish) if db else []
+
+class PatientStreamResource(Resource):
+    """환자 실시간 이벤트 스트림 API (text/event-stream)"""
+    def get(self, patient_id):
+        if live_hub.subscriber_count() >= LIVE_STREAM_MAX_SUBSCRIBERS:
+            return {"error": "실시간 스트림 연결 수 초과"}, 503
+        subscription = live_hub.subscribe(patient_id)
+        return app.response_class(
+            live_hub.stream(subscription),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+
 class AlertResource(Resource):
     """알림 정보 API"""
+    def get(self, patient_id, alert_id=None):
+        """
+        Query Params:
+            active_only: true(기본)면 활성 알림만 (alerts/{patient_id} 문서 1건), false면 이력 포함
+            limit: 최대 알림 수
+        """
+        if not db:
+            return {"error": "Database service unavailable"}, 503
+        active_only = request.args.get('active_only', default='true').lower() != 'false'
+        limit = request.args.get('limit', default=None, type=int)
+        try:
+            if active_only:
+                alerts = coalesced_read(("alerts", patient_id, limit), lambda: alert_engine.fetch_alerts(patient_id, limit=limit))
+            else:
+                alerts = alert_engine.fetch_alerts(patient_id, active_only=False, limit=limit)
+            if alert_id:
+                alert = next((a for a in alerts if a.get("id") == alert_id), None)
+                return (alert, 200) if alert else ({"error": "알림 없음"}, 404)
+            return {"alerts": alerts}, 200
+        except Exception as e:
+            print(f"[AlertResource.get] Error for patient_id={patient_id}: {e}")
+            return {"error": "Internal server error fetching alerts"}, 500
+
+    def put(self, patient_id, alert_id=None):
+        """알림 확인/해제: {"status": "acknowledged" | "resolved"}"""
+        if not db:
+            return {"error": "Database service unavailable"}, 503
+        if not alert_id:
+            return {"error": "alert_id 필수"}, 400
+        payload = request.get_json(silent=True) or {}
+        status = payload.get("status", "acknowledged")
+        if status not in ("acknowledged", "resolved"):
+            return {"error": "status는 acknowledged 또는 resolved"}, 400
+        try:
+            alert = alert_engine.update_alert_status(patient_id, alert_id, status)
+            if alert is None:
+                return {"error": "활성 알림 없음"}, 404
+            invalidate_patient_reads(patient_id)
+            return alert, 200
+        except Exception as e:
+            print(f"[AlertResource.put] Error for patient_id={patient_id}, alert_id={alert_id}: {e}")
+            return {"error": "Internal server error updating alert"}, 500
+
+
+# --- 대시보드 통합 조회 API ---
+# 환자/예측/알림/혈당/상태 조회를 동시에 실행하여 한 번의 응답으로 반환
+DASHBOARD_SECTIONS = ("patient", "predictions", "alerts", "readings", "states")
+DASHBOARD_MAX_WORKERS = int(os.environ.get("DASHBOARD_MAX_WORKERS", 16))
+dashboard_executor = ThreadPoolExecutor(max_workers=DASHBOARD_MAX_WORKERS, thread_name_prefix="dashboard")
+
+class DashboardResource(Resource):
+    """
+    환자 대시보드 통합 API
+
+    Query Params:
+        sections: 조회할 섹션 (쉼표 구분, 기본값: 전체)
+        hours: 혈당 조회 시간 범위 (기본 24)
+        predictions_limit / states_limit / alerts_limit: 섹션별 최대 개수
+    """
     def get(self, patient_id):
-        return 500
+        if not db:
+            return {"error": "Database service unavailable"}, 503
 
-    def put(self, patient_id, alert_id):
-        return 500
+        requested = request.args.get('sections')
+        sections = [s for s in requested.split(',') if s in DASHBOARD_SECTIONS] if requested else list(DASHBOARD_SECTIONS)
+        # 작업 스레드에서는 request 컨텍스트가 없으므로 파라미터는 미리 읽어둠
+        hours = request.args.get('hours', default=24, type=int)
+        predictions_limit = request.args.get('predictions_limit', default=20, type=int)
+        alerts_limit = request.args.get('alerts_limit', default=None, type=int)
+        states_limit = request.args.get('states_limit', default=50, type=int)
+        loaders = {
+            "patient": lambda: coalesced_read(("patient", patient_id), lambda: fetch_patient_profile(patient_id)),
+            "predictions": lambda: coalesced_read(("predictions", patient_id, predictions_limit),
+                                                  lambda: fetch_predictions(patient_id, predictions_limit)),
+            "alerts": lambda: coalesced_read(("alerts", patient_id, alerts_limit),
+                                             lambda: alert_engine.fetch_alerts(patient_id, limit=alerts_limit)),
+            "readings": lambda: coalesced_read(("glucose", patient_id, hours), lambda: fetch_glucose_readings(patient_id, hours)),
+            "states": lambda: coalesced_read(("states", patient_id, states_limit), lambda: fetch_state_logs(patient_id, states_limit)),
+        }
+
+        started = time.perf_counter()
+        futures = {name: dashboard_executor.submit(loaders[name]) for name in sections}
+        result, errors = {}, {}
+        for name, future in futures.items():
+            try:
+                result[name] = future.result()
+            except Exception as e:
+                print(f"[DashboardResource.get] {name} 조회 오류 ({patient_id}): {e}")
+                result[name] = None
+                errors[name] = str(e)
+
+        if errors:
+            result["errors"] = errors
+        print(f"환자({patient_id}) 대시보드 조회 완료: {len(sections)}개 섹션, {(time.perf_counter() - started) * 1000:.1f}ms")
+        return result, 200
+
+
+# --- 의사 대시보드 API ---
+# 담당 환자 요약 문서(doctor_summaries/{doctor_id}) 1건만 읽음 (환자 수와 무관)
+class DoctorPatientsResource(Resource):
+    """담당 환자 목록 API"""
+    def get(self, doctor_id):
+        if not db:
+            return {"error": "Database service unavailable"}, 503
+        try:
+            summary, doc = doctor_summary.get_summary(doctor_id)
+            etag = make_etag("doctor_patients", doctor_id, doc.update_time if doc else "rebuilt")
+            if request.if_none_match.contains_weak(etag):
+                return not_modified_response(etag)
+            return {"doctor_id": doctor_id, "patients": doctor_summary.patient_rows(summary)}, 200, cache_headers(etag)
+        except Exception as e:
+            print(f"[DoctorPatientsResource.get] Error for doctor_id={doctor_id}: {e}")
+            return {"error": "Internal server error fetching patients"}, 500
+
+class DoctorAlertsResource(Resource):
+    """
+    담당 환자 알림 API
+
+    Query Params:
+        doctor_id: 의사 ID (필수)
+        limit: 최대 알림 수
+    """
+    def get(self):
+        if not db:
+            return {"error": "Database service unavailable"}, 503
+        doctor_id = request.args.get('doctor_id')
+        if not doctor_id:
+            return {"error": "doctor_id 필수"}, 400
+        limit = request.args.get('limit', default=None, type=int)
+        try:
+            summary, _ = doctor_summary.get_summary(doctor_id)
+            return {"doctor_id": doctor_id, "alerts": doctor_summary.doctor_alerts(summary, limit)}, 200
+        except Exception as e:
+            print(f"[DoctorAlertsResource.get] Error for doctor_id={doctor_id}: {e}")
+            return {"error": "Internal server error fetching alerts"}, 500
 
 
 # --- Webex 통합 API 엔드포인트 (Firestore 사용) ---
 
 def get_valid_webex_token(user_id):
-    token_data = get_tokens(user_id)
-    if not token_data: return None
-
-    expires_at = token_data.get('expires_at')
-    # Firestore Timestamp -> Python datetime 변환 (타임존 인식)
-    if expires_at and hasattr(expires_at, 'replace') and not isinstance(expires_at, datetime):
-         try: expires_at = expires_at.replace(tzinfo=timezone.utc)
-         except: expires_at = None
-
-    if isinstance(expires_at, datetime) and expires_at > datetime.now(timezone.utc):
-        print(f"유효한 토큰 사용: 사용자={user_id}")
-        return token_data.get('access_token')
-    else:
-        print(f"토큰 만료 또는 시간 정보 없음, 갱신 시도: 사용자={user_id}")
-        return refresh_tokens(user_id, token_data.get('refresh_token'))
+    # 캐시에 유효한 토큰이 있으면 Firestore를 읽지 않음. 만료 시 사용자당 1건만 갱신 (동시 요청은 결과 공유)
+    return webex_token_cache.get(user_id)
+
+# 사용자별 클라이언트 재사용 (토큰 캐시가 토큰을 갱신하면 풀의 클라이언트에도 반영)
+webex_client_pool = WebexClientPool(lambda access_token: WebexAPI(access_token=access_token, response_cache=True))
+webex_token_cache.add_listener(webex_client_pool.rebind)
 
 def get_webex_api_client_for_user(user_id):
     access_token = get_valid_webex_token(user_id)
-    return WebexAPI(access_token=access_token) if access_token else None
+    return webex_client_pool.get(user_id, access_token) if access_token else None
+
+def emergency_team_for(user_id, webex_api_client):
+    # 계정별 긴급 대응 팀 / 룸 (프로세스당 한 번 조회 또는 생성). 실패해도 긴급 연결은 담당 의사 메시지로 진행
+    try:
+        return ensure_emergency_team(webex_api_client, account=user_id)
+    except Exception as e:
+        print(f"!!! 긴급 대응 룸 준비 실패 ({user_id}): {e} !!!")
+        return None
+
 class WebexEmergencyConnect(Resource):
     def post(self):
         if not db: return {"error": "DB 미연결"}, 503
@@ -449,7 +1241,9 @@ class WebexEmergencyConnect(Resource):
             auth_url = url_for('webex_auth_initiate', user_id=requesting_user_id, _external=True) if 'webex_auth_initiate' in app.view_functions else None
             return {"error": "Webex 인증 필요", "reauth_url": auth_url}, 401
 
-        medical_webex_instance = MedicalWebexIntegration(webex_api_client)
+        medical_webex_instance = MedicalWebexIntegration(webex_api_client, outbox=webex_outbox,
+                                                         team=emergency_team_for(requesting_user_id, webex_api_client),
+                                                         account=requesting_user_id)
         try:
             patient_snap = db.collection(PATIENTS_COLLECTION).document(patient_id).get()
             if not patient_snap.exists: return {"error": "환자 없음"}, 404
@@ -488,32 +1282,48 @@ class SeedDemoData(Resource):
 # --- API 라우트 등록 ---
 api.add_resource(PatientResource, '/api/patients/<string:patient_id>')
 api.add_resource(GlucoseResource, '/api/patients/<string:patient_id>/glucose')
+api.add_resource(GlucoseBulkIngestResource, '/api/patients/<string:patient_id>/glucose/bulk')
 api.add_resource(PredictionResource, '/api/patients/<string:patient_id>/predictions')
+api.add_resource(PatientStreamResource, '/api/patients/<string:patient_id>/stream')
+api.add_resource(DashboardResource, '/api/patients/<string:patient_id>/dashboard')
 api.add_resource(AlertResource, '/api/patients/<string:patient_id>/alerts', '/api/patients/<string:patient_id>/alerts/<string:alert_id>')
 api.add_resource(WebexEmergencyConnect, '/api/webex/emergency_connect')
 api.add_resource(WebexScheduleCheckup, '/api/webex/schedule_checkup')
 api.add_resource(SeedDemoData, '/api/seed_demo_data')
 api.add_resource(StateResource, '/api/patients/<string:patient_id>/states')
+api.add_resource(DoctorPatientsResource, '/api/doctors/<string:doctor_id>/patients')
+api.add_resource(DoctorAlertsResource, '/api/alerts')
 
 # 서버 상태 확인 엔드포인트
 
 
 # 프론트엔드 제공 라우트
+# 정적 파일은 시작 시 메모리에 적재된 색인(static_assets)에서만 제공 (요청마다 파일 시스템 접근 없음)
+try:
+    static_index = StaticAssetIndex.load()
+except Exception as e:
+    print(f"!!! 프론트엔드 정적 파일 적재 실패: {e} !!!")
+    static_index = StaticAssetIndex()
+
+def static_asset_response(path):
+    asset = static_index.get(path)
+    if asset is None:
+        return jsonify({"error": f"Frontend file not found: {path}"}), 404
+    # 인코딩별 본문이 다르므로 약한 ETag 사용
+    headers = {"ETag": f'W/"{asset.etag}"', "Cache-Control": asset.cache_control, "Vary": "Accept-Encoding"}
+    if request.if_none_match.contains_weak(asset.etag):
+        return app.response_class(status=304, headers=headers)
+    encoding = choose_content_encoding()
+    if encoding not in asset.bodies:
+        encoding = "gzip" if "gzip" in asset.bodies and request.accept_encodings["gzip"] else "identity"
+    response = app.response_class(asset.bodies[encoding], mimetype=asset.mimetype, headers=headers)
+    if encoding != "identity":
+        response.headers["Content-Encoding"] = encoding
+    return response
+
 @app.route('/')
 def serve_index():
-    index_path = 'index.html'
-    static_folder = '../frontend'
-    print(f"Serving {index_path} from {static_folder}")
-    try:
-        if not os.path.exists(os.path.join(static_folder, index_path)):
-            raise FileNotFoundError(f"{index_path} 파일이 {static_folder} 폴더에 존재하지 않습니다.")
-        return send_from_directory(static_folder, index_path)
-    except FileNotFoundError as e:
-        print(f"!!! 오류: {e} !!!")
-        return jsonify({"error": f"Frontend file not found: {index_path} in {static_folder}"}), 404
-    except Exception as e:
-        print(f"!!! 오류: {e} !!!")
-        return jsonify({"error": "Internal server error serving frontend"}), 500
+    return static_asset_response('/')
 
 @app.route('/api/webex/auth/callback')
 def webex_auth_callback():
@@ -551,25 +1361,17 @@ def webex_auth_callback():
          return jsonify({"error": "서버 내부 오류 (토큰 교환)"}), 500
 @app.route('/static/<path:filename>')
 def serve_static(filename):
-    static_folder = '../frontend/static/'
-    print(f"Serving static file {filename} from {static_folder}")
-    try:
-        if not os.path.exists(os.path.join(static_folder, filename)):
-            raise FileNotFoundError(f"{filename} 파일이 {static_folder} 폴더에 존재하지 않습니다.")
-        return send_from_directory(static_folder, filename)
-    except FileNotFoundError as e:
-        print(f"!!! 오류: {e} !!!")
-        return jsonify({"error": f"Static file not found: {filename} in {static_folder}"}), 404
-    except Exception as e:
-        print(f"!!! 오류: {e} !!!")
-        return jsonify({"error": "Internal server error serving static file"}), 500
+    return static_asset_response('/static/' + filename)
 
 # --- 메인 실행 ---
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000)) # 포트 번호 변경 가능성 고려 (기존 5371?)
     print(f"Starting server on port {port}...")
 
-    Thread(target=run_prediction_task, daemon=True).start()
+    # 개발 서버: 별도 워커 프로세스를 띄우지 않은 경우 같은 프로세스에서 예측 루프 실행
+    if os.environ.get("RUN_PREDICTION_WORKER", "1") == "1":
+        from worker import run_worker
+        Thread(target=run_worker, daemon=True).start()
     # Vercel 배포 환경 감지하여 디버그 모드 결정
     is_vercel = os.environ.get('VERCEL') == '1'
     app.run(host='0.0.0.0', port=port, debug=not is_vercel)
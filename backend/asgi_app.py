@@ -0,0 +1,413 @@
+# -*- coding: utf-8 -*-
+"""
+pGluc-Webex 비동기(ASGI) 서버 진입점
+
+Firestore 조회 위주의 읽기 API와 긴급 연결 Webex 호출은 이벤트 루프에서
+Firestore AsyncClient와 httpx로 처리하여, 느린 Firestore/Webex 응답이 요청마다 스레드를 붙잡지 않는다.
+Webex 토큰 조회 / 갱신은 Flask 앱과 같은 토큰 캐시(사용자당 갱신 1건)를 사용한다.
+환자 실시간 이벤트(SSE)도 연결마다 asyncio.Queue로 구독하여 WSGI 스레드를 점유하지 않는다.
+그 외 경로(쓰기, OAuth 콜백, 프론트엔드)는 기존 Flask 앱(app.py)이 WSGI로 그대로 처리한다.
+
+실행 예)
+    uvicorn asgi_app:app --host 0.0.0.0 --port 5000
+"""
+import asyncio
+import contextlib
+import os
+import time
+
+import httpx
+from a2wsgi import WSGIMiddleware
+from firebase_admin import firestore
+from google.api_core import exceptions as google_exceptions
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+
+import alert_engine
+import app as web  # 기존 Flask 앱 + 공용 헬퍼 (직렬화, ETag, sync token, 문서 변환)
+from firebase_client import get_async_db
+from live_events import AsyncSubscription
+from singleflight import AsyncSingleFlight
+from webex_async import AsyncMedicalWebexIntegration, AsyncWebexAPI
+from webex_bootstrap import cached_emergency_team
+from webex_tokens import WebexClientPool
+
+WSGI_WORKERS = int(os.environ.get("ASGI_WSGI_WORKERS", 32))  # Flask 경로 처리용 스레드 수
+WEBEX_HTTP_TIMEOUT = float(os.environ.get("WEBEX_HTTP_TIMEOUT", 10.0))  # Webex API 요청 타임아웃 (초)
+DESC = firestore.Query.DESCENDING
+
+flask_app = WSGIMiddleware(web.app, workers=WSGI_WORKERS)
+read_coalescer = AsyncSingleFlight()
+http_client = None  # lifespan에서 생성되는 httpx.AsyncClient
+# 사용자별 비동기 Webex 클라이언트 재사용 (토큰 캐시가 토큰을 갱신하면 함께 반영)
+async_client_pool = WebexClientPool(lambda access_token: AsyncWebexAPI(access_token=access_token, client=http_client))
+web.webex_token_cache.add_listener(async_client_pool.rebind)
+
+
+# --- 응답 헬퍼 ---
+class FastJSONResponse(Response):
+    """Flask API와 같은 직렬화 경로(orjson 우선) 사용"""
+    media_type = "application/json"
+
+    def render(self, content):
+        return web.json_dumps(content).encode("utf-8")
+
+def json_response(data, status=200, headers=None):
+    return FastJSONResponse(data, status_code=status, headers=headers)
+
+def etag_matches(request, etag):
+    """If-None-Match 약한 비교 (Flask의 if_none_match.contains_weak와 동일)"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = [tag.strip() for tag in header.split(",")]
+    return "*" in tags or any(tag.removeprefix("W/").strip('"') == etag for tag in tags)
+
+def cache_headers(etag):
+    # GZipMiddleware가 본문 바이트를 바꾸므로 항상 약한 ETag로 응답 (If-None-Match는 약한 비교)
+    return {"ETag": f'W/"{etag}"', "Cache-Control": web.PATIENT_DATA_CACHE_CONTROL}
+
+def not_modified_response(etag):
+    return Response(status_code=304, headers=cache_headers(etag))
+
+def query_int(request, name, default):
+    try:
+        return int(request.query_params[name])
+    except (KeyError, ValueError):
+        return default
+
+def request_since_token(request):
+    return request.query_params.get("since") or request.query_params.get("sync_token")
+
+
+# --- 비동기 조회 헬퍼 (app.py의 동기 헬퍼와 같은 쿼리) ---
+def glulog_ref(adb, patient_id):
+    return adb.collection("users").document(patient_id).collection("glulog")
+
+def predict_ref(adb, patient_id):
+    return adb.collection("users").document(patient_id).collection("predict")
+
+def state_log_ref(adb, patient_id):
+    return adb.collection("state").document(patient_id).collection("log")
+
+def coalesced_read(key, coro_fn):
+    return read_coalescer.do(key, coro_fn)
+
+async def latest_doc(collection_ref, order_field):
+    """정렬 필드 기준 최신 문서 1건 (정렬 필드만 조회)"""
+    docs = await collection_ref.order_by(order_field, direction=DESC).select([order_field]).limit(1).get()
+    return docs[0] if docs else None
+
+async def fetch_patient_doc(adb, patient_id):
+    return await adb.collection("users").document(patient_id).get()
+
+async def fetch_glucose_readings(adb, patient_id, hours=24):
+    """최근 혈당 기록 조회 (시간순 오름차순)"""
+    limit = web.glucose_limit_for_hours(hours)
+    docs = await glulog_ref(adb, patient_id).order_by("timestamp", direction=DESC).limit(limit).get()
+    readings = [web.glucose_reading_from_doc(doc) for doc in reversed(docs)]
+    print(f"환자({patient_id}) 혈당 {len(readings)}개 조회 완료 (최대 {limit}개, async)")
+    return readings
+
+async def fetch_state_logs(adb, patient_id, limit=50):
+    docs = await state_log_ref(adb, patient_id).order_by("time", direction=DESC).limit(limit).get()
+    return [web.state_from_doc(doc) for doc in docs]
+
+async def fetch_predictions(adb, patient_id, limit=20):
+    docs = await predict_ref(adb, patient_id).order_by("timestamp", direction=DESC).limit(limit).get()
+    return [web.prediction_from_doc(doc) for doc in docs]
+
+async def fetch_active_alerts(adb, patient_id, limit=None):
+    doc = await adb.collection(alert_engine.ALERTS_COLLECTION).document(patient_id).get()
+    alerts = alert_engine.active_alerts(doc)
+    return alerts[:limit] if limit else alerts
+
+async def delta_response(collection_ref, order_field, to_item, key, since_token):
+    """증분 응답: {key: [...], sync_token, has_more}"""
+    docs = await web.since_query(collection_ref, order_field, since_token).get()
+    return json_response({key: [to_item(doc) for doc in docs],
+                          "sync_token": web.next_sync_token(docs, order_field, since_token),
+                          "has_more": len(docs) >= web.SYNC_MAX_RECORDS})
+
+
+# --- 읽기 API (Flask 리소스와 같은 응답 형식) ---
+async def get_patient(request):
+    patient_id = request.path_params["patient_id"]
+    adb = get_async_db()
+    if adb is None:
+        return json_response({"error": "Database service unavailable"}, 503)
+    try:
+        doc = await coalesced_read(("patient_doc", patient_id), lambda: fetch_patient_doc(adb, patient_id))
+        etag = web.make_etag("patient", patient_id, doc.update_time if doc.exists else "default")
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        return json_response(web.patient_profile_from_snapshot(doc), headers=cache_headers(etag))
+    except Exception as e:
+        print(f"[asgi.get_patient] Error for patient_id={patient_id}: {e}")
+        return json_response({"error": "Internal server error fetching patient data"}, 500)
+
+async def get_glucose(request):
+    patient_id = request.path_params["patient_id"]
+    adb = get_async_db()
+    if adb is None:
+        return json_response({"error": "DB 미연결"}, 503)
+    response_format = request.query_params.get("format", "json")
+    streaming = response_format == "ndjson" or request.query_params.get("stream") == "1"
+    try:
+        since = request_since_token(request)
+        if since:
+            return await delta_response(glulog_ref(adb, patient_id), web.GLULOG_SYNC_FIELD,
+                                        web.glucose_reading_from_doc, "readings", since)
+
+        hours = query_int(request, "hours", 24)
+        latest, version = await asyncio.gather(
+            coalesced_read(("glucose_latest", patient_id),
+                           lambda: latest_doc(glulog_ref(adb, patient_id), "timestamp")),
+            coalesced_read(("glucose_version", patient_id),
+                           lambda: adb.collection(web.GLULOG_VERSIONS_COLLECTION).document(patient_id).get()))
+        etag = web.make_etag("glucose", patient_id, hours, response_format, streaming, web.doc_marker(latest),
+                             web.glulog_version_marker(version))
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+
+        if streaming:
+            # 청크 스트리밍: Flask 경로와 같은 생성기를 사용, 문서는 스레드풀에서 받는 대로 전송
+            docs = await run_in_threadpool(web.glucose_window_docs, patient_id, hours)
+            if response_format == "ndjson":
+                body, media_type = web.iter_glucose_ndjson(docs), "application/x-ndjson"
+            else:
+                body, media_type = web.iter_glucose_json(docs, web.glucose_sync_token(version)), "application/json"
+            return StreamingResponse(body, media_type=media_type, headers=cache_headers(etag))
+
+        sync_token = web.glucose_sync_token(version)
+        readings = await coalesced_read(("glucose", patient_id, hours),
+                                        lambda: fetch_glucose_readings(adb, patient_id, hours))
+        if response_format == "columnar":
+            return json_response(dict(web.glucose_columnar(readings), sync_token=sync_token),
+                                 headers=cache_headers(etag))
+        return json_response({"readings": readings, "sync_token": sync_token}, headers=cache_headers(etag))
+
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    except google_exceptions.FailedPrecondition as e:
+        if "index" in str(e).lower():
+            print(f"!!! Firestore 인덱스 필요 오류: {e} !!!")
+            return json_response({"error": "DB 쿼리 인덱스 필요. Firestore 콘솔에서 생성하세요."}, 400)
+        print(f"Firestore 조건 오류 ({patient_id}): {e}")
+        return json_response({"error": "DB 조건 오류"}, 500)
+    except Exception as e:
+        print(f"혈당({patient_id}) 조회 오류 (async): {e}")
+        return json_response({"error": f"서버 오류 (혈당 조회): {str(e)}"}, 500)
+
+async def get_states(request):
+    patient_id = request.path_params["patient_id"]
+    adb = get_async_db()
+    if adb is None:
+        return json_response({"error": "Database unavailable"}, 503)
+    try:
+        since = request_since_token(request)
+        if since:
+            return await delta_response(state_log_ref(adb, patient_id), "time", web.state_from_doc, "states", since)
+
+        latest = await coalesced_read(("states_latest", patient_id),
+                                      lambda: latest_doc(state_log_ref(adb, patient_id), "time"))
+        etag = web.make_etag("states", patient_id, web.doc_marker(latest))
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        sync_token = web.encode_sync_token(latest.get("time")) if latest else None
+        states = await coalesced_read(("states", patient_id, 50), lambda: fetch_state_logs(adb, patient_id))
+        return json_response({"states": states, "sync_token": sync_token}, headers=cache_headers(etag))
+
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    except Exception as e:
+        print(f"[asgi.get_states] Error: {e}")
+        return json_response({"error": "Internal server error fetching states"}, 500)
+
+async def get_predictions(request):
+    patient_id = request.path_params["patient_id"]
+    adb = get_async_db()
+    if adb is None:
+        return json_response({"error": "Database service unavailable"}, 503)
+    try:
+        since = request_since_token(request)
+        if since:
+            return await delta_response(predict_ref(adb, patient_id), "predicted_at",
+                                        web.prediction_from_doc, "predictions", since)
+
+        latest = await coalesced_read(("predictions_latest", patient_id),
+                                      lambda: latest_doc(predict_ref(adb, patient_id), "timestamp"))
+        etag = web.make_etag("predictions", patient_id, web.doc_marker(latest))
+        if etag_matches(request, etag):
+            return not_modified_response(etag)
+        predictions = await coalesced_read(("predictions", patient_id, 20),
+                                           lambda: fetch_predictions(adb, patient_id))
+        predicted_at = [p["predicted_at"] for p in predictions if p["predicted_at"]]
+        sync_token = web.encode_sync_token(max(predicted_at)) if predicted_at else None
+        return json_response({"predictions": predictions, "sync_token": sync_token},
+                             headers=cache_headers(etag))
+
+    except ValueError as e:
+        return json_response({"error": str(e)}, 400)
+    except Exception as e:
+        print(f"[asgi.get_predictions] Error for patient_id={patient_id}: {e}")
+        return json_response({"error": "Internal server error fetching predictions"}, 500)
+
+async def stream_patient_events(request):
+    """환자 실시간 이벤트 스트림 (text/event-stream). 공유 Firestore 리스너가 연결별 asyncio.Queue를 채움"""
+    patient_id = request.path_params["patient_id"]
+    if web.live_hub.subscriber_count() >= web.LIVE_STREAM_MAX_SUBSCRIBERS:
+        return json_response({"error": "실시간 스트림 연결 수 초과"}, 503)
+    # 첫 구독자는 Firestore 리스너를 시작하므로 스레드에서 구독
+    subscription = await run_in_threadpool(web.live_hub.subscribe, patient_id, AsyncSubscription(patient_id))
+    return StreamingResponse(web.live_hub.astream(subscription), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+async def get_dashboard(request):
+    """환자 대시보드 통합 API (섹션별 조회를 asyncio.gather로 동시에 실행)"""
+    patient_id = request.path_params["patient_id"]
+    adb = get_async_db()
+    if adb is None:
+        return json_response({"error": "Database service unavailable"}, 503)
+
+    requested = request.query_params.get("sections")
+    sections = [s for s in requested.split(",") if s in web.DASHBOARD_SECTIONS] if requested \
+        else list(web.DASHBOARD_SECTIONS)
+    hours = query_int(request, "hours", 24)
+    predictions_limit = query_int(request, "predictions_limit", 20)
+    alerts_limit = query_int(request, "alerts_limit", None)
+    states_limit = query_int(request, "states_limit", 50)
+
+    async def load_patient():
+        doc = await coalesced_read(("patient_doc", patient_id), lambda: fetch_patient_doc(adb, patient_id))
+        return web.patient_profile_from_snapshot(doc)
+
+    loaders = {
+        "patient": load_patient,
+        "predictions": lambda: coalesced_read(("predictions", patient_id, predictions_limit),
+                                              lambda: fetch_predictions(adb, patient_id, predictions_limit)),
+        "alerts": lambda: coalesced_read(("alerts", patient_id, alerts_limit),
+                                         lambda: fetch_active_alerts(adb, patient_id, alerts_limit)),
+        "readings": lambda: coalesced_read(("glucose", patient_id, hours),
+                                           lambda: fetch_glucose_readings(adb, patient_id, hours)),
+        "states": lambda: coalesced_read(("states", patient_id, states_limit),
+                                         lambda: fetch_state_logs(adb, patient_id, states_limit)),
+    }
+
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(*(loaders[name]() for name in sections), return_exceptions=True)
+    result, errors = {}, {}
+    for name, outcome in zip(sections, outcomes):
+        if isinstance(outcome, Exception):
+            print(f"[asgi.get_dashboard] {name} 조회 오류 ({patient_id}): {outcome}")
+            result[name] = None
+            errors[name] = str(outcome)
+        else:
+            result[name] = outcome
+
+    if errors:
+        result["errors"] = errors
+    print(f"환자({patient_id}) 대시보드 조회 완료 (async): {len(sections)}개 섹션, {(time.perf_counter() - started) * 1000:.1f}ms")
+    return json_response(result)
+
+
+# --- Webex 토큰 ---
+async def get_valid_webex_token(user_id):
+    # 유효한 토큰이 캐시에 있으면 바로 반환. 조회 / 갱신은 Flask 앱과 같은 토큰 캐시에 맡김
+    # (사용자당 갱신 경로가 하나뿐이므로 동기 / 비동기 요청과 백그라운드 갱신이 refresh_token을 동시에 쓰지 않음)
+    access_token = web.webex_token_cache.peek(user_id)
+    if access_token is not None:
+        return access_token
+    return await run_in_threadpool(web.webex_token_cache.get, user_id)
+
+async def webex_emergency_connect(request):
+    adb = get_async_db()
+    if adb is None:
+        return json_response({"error": "DB 미연결"}, 503)
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not data or 'patient_id' not in data:
+        return json_response({"error": "patient_id 필수"}, 400)
+    patient_id = data.get('patient_id')
+    requesting_user_id = data.get('requesting_user_id', 'doctor1')  # 요청자 ID (의사)
+
+    access_token = await get_valid_webex_token(requesting_user_id)
+    if not access_token:
+        return json_response({"error": "Webex 인증 필요", "reauth_url": None}, 401)
+
+    try:
+        patient_snap, pred_snap = await asyncio.gather(
+            adb.collection(web.PATIENTS_COLLECTION).document(patient_id).get(),
+            adb.collection(web.PREDICTIONS_COLLECTION).document(patient_id).get())
+        if not patient_snap.exists:
+            return json_response({"error": "환자 없음"}, 404)
+        patient_info = patient_snap.to_dict()
+        doctor_id = patient_info.get("doctor_id")
+        if not doctor_id:
+            return json_response({"error": "담당 의사 미지정"}, 400)
+        doctor_snap = await adb.collection(web.PATIENTS_COLLECTION).document(doctor_id).get()  # 임시
+        if not doctor_snap.exists:
+            return json_response({"error": f"의사({doctor_id}) 없음"}, 404)
+        doctor_info = doctor_snap.to_dict()
+        prediction = pred_snap.to_dict() if pred_snap.exists else {}
+        current_glucose = prediction.get('current', {}).get('value', 'N/A')
+        predicted_glucose = prediction.get('prediction_30min', {}).get('value', 'N/A')
+
+        print(f"Webex 긴급 연결 시도 (사용자 {requesting_user_id}, async)...")
+        # 긴급 대응 룸: 메모리에 없을 때만 Flask 앱과 같은 동기 준비 경로를 스레드에서 실행 (프로세스당 한 번)
+        team = cached_emergency_team(requesting_user_id) or await run_in_threadpool(
+            web.emergency_team_for, requesting_user_id, web.webex_client_pool.get(requesting_user_id, access_token))
+        medical_webex_instance = AsyncMedicalWebexIntegration(
+            async_client_pool.get(requesting_user_id, access_token), outbox=web.webex_outbox, team=team,
+            account=requesting_user_id)
+        session_info = await medical_webex_instance.create_emergency_session(
+            patient_email=patient_info.get("email"), patient_name=patient_info.get("name"),
+            glucose_value=current_glucose, prediction=predicted_glucose,
+            doctor_email=doctor_info.get("email"))
+        print(f"Webex 긴급 연결 성공: 세션 ID={session_info.get('id')}")
+        return json_response(session_info, 201)
+    except Exception as e:
+        print(f"!!! Webex 긴급 연결 실패: {e} !!!")
+        return json_response({"error": f"Webex 긴급 연결 실패: {str(e)}"}, 500)
+
+
+# --- 앱 구성 ---
+@contextlib.asynccontextmanager
+async def lifespan(_app):
+    global http_client
+    http_client = httpx.AsyncClient(timeout=WEBEX_HTTP_TIMEOUT)
+    await run_in_threadpool(get_async_db)  # 자격 증명 파일 읽기는 시작 시 한 번만
+    try:
+        yield
+    finally:
+        async_client_pool.clear()  # 닫힌 http_client를 참조하는 클라이언트 제거
+        await http_client.aclose()
+
+routes = [
+    Route("/api/patients/{patient_id}", get_patient, methods=["GET"]),
+    Route("/api/patients/{patient_id}/glucose", get_glucose, methods=["GET"]),
+    Route("/api/patients/{patient_id}/states", get_states, methods=["GET"]),
+    Route("/api/patients/{patient_id}/predictions", get_predictions, methods=["GET"]),
+    Route("/api/patients/{patient_id}/dashboard", get_dashboard, methods=["GET"]),
+    Route("/api/patients/{patient_id}/stream", stream_patient_events, methods=["GET"]),
+    Route("/api/webex/emergency_connect", webex_emergency_connect, methods=["POST"]),
+    # 비동기 처리하지 않는 나머지 경로 (같은 경로의 POST 포함)는 Flask 앱으로 전달
+    Mount("/", app=flask_app),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=[web.FRONTEND_URL, "http://localhost:5000", "*"],
+                   allow_credentials=True, allow_methods=["*"], allow_headers=["*"]),
+        Middleware(GZipMiddleware, minimum_size=web.COMPRESS_MIN_SIZE),
+    ],
+    lifespan=lifespan,
+)
@@ -1,17 +1,14 @@
 import torch
 import torch.nn as nn
 import numpy as np
-from firebase_admin import credentials, firestore, initialize_app
-import firebase_admin
+from firebase_admin import firestore
 import time
 from datetime import datetime
 import math
-
-# Firebase 초기화 (중복 초기화 방지)
-cred = credentials.Certificate("ccccssss2-bde41-firebase-adminsdk-fbsvc-9438d30e40.json")
-if not firebase_admin._apps:
-    initialize_app(cred)
-db = firestore.client()
+from firebase_client import db
+from live_events import hub as live_hub
+import alert_engine
+import doctor_summary
 
 
 class PositionalEncoding(nn.Module):
@@ -207,16 +204,27 @@ def predict_future(model_trainer, recent_data, future_steps=15):
 def save_predictions(username, predictions):
     collection_ref = db.collection(f"users/{username}/predict")
     batch = db.batch()
+    predicted_at = datetime.now().isoformat()  # 한 번의 예측 실행은 같은 predicted_at 사용
 
+    points = []
     for timestamp, value in predictions:
         doc_ref = collection_ref.document(timestamp)
-        batch.set(doc_ref, {
+        point = {
             'timestamp': timestamp,
             'value': float(value),
-            'predicted_at': datetime.now().isoformat()
-        })
+            'predicted_at': predicted_at,
+            'run_id': predicted_at  # 예측 실행 표시 (이전 문서는 예측점마다 predicted_at이 달라 실행 구분 불가)
+        }
+        batch.set(doc_ref, point)
+        points.append(point)
 
     batch.commit()
+    live_hub.publish(username, "forecast", sorted(points, key=lambda p: p['timestamp']), predicted_at)
+    doctor_summary.record_forecast(username, points, predicted_at)
+    try:
+        alert_engine.evaluate_forecast(username, points)
+    except Exception as e:
+        print(f"[alert] 환자({username}) 알림 평가 실패: {e}")
     print(f"{len(predictions)}개의 예측 데이터를 Firestore의 'users/{username}/predict'에 저장 완료.")
 
 
@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+예측(users/{id}/predict) / 상태 기록(state/{id}/log) 보존 기간 관리 및 압축
+
+- 보존 기간 이내의 데이터는 원본 그대로 유지
+- 보존 기간이 지난 데이터는 날짜별 보관 문서 1건으로 요약한 뒤 원본 삭제
+    users/{id}/predict_archive/{YYYY-MM-DD} = {"points": {"HH:MM:SS": 예측값}, "count", "min", "max", "mean"}
+    state/{id}/archive/{YYYY-MM-DD} = {"entries": {"HH:MM:SS": {"state", "value"}}, "count", "totals"}
+- 최신 예측 실행이 덮어쓰지 못한 이전 실행의 남은 예측점(더 긴 예측 구간의 끝부분 등)은 삭제 (run_id가 있는 문서만)
+- 삭제는 배치 단위로 나누고 초당 삭제 수를 제한
+
+실행: worker.py가 주기적으로 run_compaction() 호출, 또는 수동 실행
+    python compaction.py [--patient kimjaehoug] [--dry-run]
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+
+import pytz
+from firebase_admin import firestore
+from google.api_core import exceptions as google_exceptions
+
+from firebase_client import db
+
+PREDICT_RETENTION_HOURS = int(os.environ.get("PREDICT_RETENTION_HOURS", 48))  # 예측 원본 보존 시간
+STATE_RETENTION_DAYS = int(os.environ.get("STATE_RETENTION_DAYS", 30))  # 상태 기록 원본 보존 일수
+COMPACTION_BATCH_SIZE = int(os.environ.get("COMPACTION_BATCH_SIZE", 200))  # 배치 1회당 삭제 수 (Firestore 최대 500)
+COMPACTION_MAX_DELETES_PER_SEC = float(os.environ.get("COMPACTION_MAX_DELETES_PER_SEC", 200))  # 초당 최대 삭제 수
+COMPACTION_PAGE_SIZE = 1000  # 보존 기간 경과 데이터 조회 단위
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+KST = pytz.timezone("Asia/Seoul")
+
+
+class RateLimitedDeleter:
+    """문서 삭제를 배치로 모아 커밋하고, 커밋 간격을 조절하여 초당 삭제 수 제한"""
+
+    def __init__(self, batch_size=COMPACTION_BATCH_SIZE, max_per_second=COMPACTION_MAX_DELETES_PER_SEC, dry_run=False):
+        self.batch_size = batch_size
+        self.max_per_second = max_per_second
+        self.dry_run = dry_run
+        self.pending = []
+        self.deleted = 0
+        self.skipped = 0
+        self._next_commit_at = 0.0
+
+    def delete(self, doc_ref, update_time=None):
+        """삭제 예약 (update_time을 주면 그 이후 문서가 바뀐 경우 삭제하지 않음)"""
+        self.pending.append((doc_ref, update_time))
+        if len(self.pending) >= self.batch_size:
+            self.flush()
+
+    def _delete_option(self, update_time):
+        return db.write_option(last_update_time=update_time) if update_time is not None else None
+
+    def flush(self):
+        if not self.pending:
+            return
+        wait = self._next_commit_at - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        deleted = len(self.pending)
+        if not self.dry_run:
+            batch = db.batch()
+            for doc_ref, update_time in self.pending:
+                batch.delete(doc_ref, option=self._delete_option(update_time))
+            try:
+                batch.commit()
+            except google_exceptions.FailedPrecondition:
+                # 조회 후 다시 쓰인 문서가 있으면 배치 전체가 거부되므로 1건씩 다시 삭제 (바뀐 문서는 유지)
+                for doc_ref, update_time in self.pending:
+                    try:
+                        doc_ref.delete(option=self._delete_option(update_time))
+                    except google_exceptions.FailedPrecondition:
+                        deleted -= 1
+                        self.skipped += 1
+        self.deleted += deleted
+        if self.max_per_second:
+            self._next_commit_at = time.monotonic() + len(self.pending) / self.max_per_second
+        self.pending = []
+
+
+def kst_now_str(delta=timedelta()):
+    return (datetime.now(KST) + delta).strftime(TIMESTAMP_FORMAT)
+
+
+def expired_docs(collection_ref, field, cutoff):
+    """field < cutoff 인 문서를 오래된 순으로 페이지 단위 조회"""
+    last = None
+    while True:
+        query = collection_ref.where(field, "<", cutoff).order_by(field).limit(COMPACTION_PAGE_SIZE)
+        if last is not None:
+            query = query.start_after(last)
+        page = list(query.stream())
+        yield from page
+        if len(page) < COMPACTION_PAGE_SIZE:
+            return
+        last = page[-1]
+
+
+def group_by_day(docs, field):
+    """{'YYYY-MM-DD': [(HH:MM:SS, 문서), ...]}"""
+    days = {}
+    for doc in docs:
+        value = doc.get(field)
+        if not isinstance(value, str) or " " not in value:
+            continue
+        day, clock = value.split(" ", 1)
+        days.setdefault(day, []).append((clock, doc))
+    return days
+
+
+def archive_predictions(archive_ref, day, items, dry_run=False):
+    """하루치 예측점을 기존 보관 문서와 합쳐 저장 (같은 시각은 덮어쓰므로 재실행해도 중복 없음)"""
+    doc = archive_ref.document(day).get()
+    points = dict((doc.to_dict() or {}).get("points", {})) if doc.exists else {}
+    for clock, point in items:
+        value = point.get("value")
+        if value is not None:
+            points[clock] = float(value)
+    values = list(points.values())
+    summary = {
+        "date": day,
+        "points": points,
+        "count": len(values),
+        "min": min(values) if values else None,
+        "max": max(values) if values else None,
+        "mean": round(sum(values) / len(values), 2) if values else None,
+        "compacted_at": firestore.SERVER_TIMESTAMP,
+    }
+    if not dry_run:
+        archive_ref.document(day).set(summary)
+
+
+def archive_states(archive_ref, day, items, dry_run=False):
+    """하루치 상태 기록을 기존 보관 문서와 합쳐 저장"""
+    doc = archive_ref.document(day).get()
+    entries = dict((doc.to_dict() or {}).get("entries", {})) if doc.exists else {}
+    for clock, entry in items:
+        entries[clock] = {"state": entry.get("state"), "value": entry.get("value")}
+    totals = {}
+    for entry in entries.values():
+        totals[entry["state"]] = totals.get(entry["state"], 0) + (entry["value"] or 0)
+    summary = {"date": day, "entries": entries, "count": len(entries), "totals": totals,
+               "compacted_at": firestore.SERVER_TIMESTAMP}
+    if not dry_run:
+        archive_ref.document(day).set(summary)
+
+
+def compact_collection(collection_ref, archive_ref, field, cutoff, archive_fn, deleter):
+    """보존 기간이 지난 문서를 날짜별로 보관한 뒤 삭제 (보관 문서 저장 후에만 원본 삭제)"""
+    days = group_by_day(expired_docs(collection_ref, field, cutoff), field)
+    archived = 0
+    for day in sorted(days):
+        items = days[day]
+        archive_fn(archive_ref, day, [(clock, doc.to_dict()) for clock, doc in items], deleter.dry_run)
+        for _, doc in items:
+            deleter.delete(doc.reference)
+        archived += len(items)
+    deleter.flush()
+    return {"archived": archived, "days": len(days)}
+
+
+def delete_superseded_predictions(predict_ref, deleter):
+    """
+    최신 예측 실행 구간(첫 예측 시각 이후)에 남아 있는 이전 실행의 예측점 삭제
+
+    예측 문서는 예측 시각을 키로 덮어쓰므로, 최신 실행보다 예측 구간이 길었던 이전 실행의 끝부분만 남는다.
+    실행 표시(run_id)가 있는 문서만 실행 단위로 비교한다. run_id가 없는 이전 문서는 예측점마다
+    predicted_at이 달라 실행을 구분할 수 없으므로 삭제하지 않고 보존 기간 압축에 맡긴다.
+    압축 도중 새 예측 실행이 저장될 수 있으므로 읽어 둔 최신 실행보다 이전(run_id <)인 문서만,
+    조회한 뒤 다시 쓰이지 않은 경우에만(update_time 조건) 삭제한다.
+    """
+    latest = next(iter(predict_ref.order_by("run_id", direction=firestore.Query.DESCENDING)
+                       .limit(1).stream()), None)
+    if latest is None:
+        return 0
+    run_id = latest.get("run_id")
+    run_start = min(doc.get("timestamp") for doc in predict_ref.where("run_id", "==", run_id).stream())
+    removed, skipped = 0, deleter.skipped
+    for doc in predict_ref.where("timestamp", ">=", run_start).stream():
+        doc_run_id = (doc.to_dict() or {}).get("run_id")
+        if doc_run_id is not None and doc_run_id < run_id:
+            deleter.delete(doc.reference, doc.update_time)
+            removed += 1
+    deleter.flush()
+    return removed - (deleter.skipped - skipped)
+
+
+def compact_patient(patient_id, dry_run=False, deleter=None):
+    """환자 1명의 예측/상태 기록 압축"""
+    deleter = deleter or RateLimitedDeleter(dry_run=dry_run)
+    started = time.perf_counter()
+    user_ref = db.collection("users").document(patient_id)
+    state_ref = db.collection("state").document(patient_id)
+
+    superseded = delete_superseded_predictions(user_ref.collection("predict"), deleter)
+    predict = compact_collection(user_ref.collection("predict"), user_ref.collection("predict_archive"),
+                                 "timestamp", kst_now_str(-timedelta(hours=PREDICT_RETENTION_HOURS)),
+                                 archive_predictions, deleter)
+    states = compact_collection(state_ref.collection("log"), state_ref.collection("archive"),
+                                "time", kst_now_str(-timedelta(days=STATE_RETENTION_DAYS)),
+                                archive_states, deleter)
+    result = {"patient_id": patient_id, "superseded_deleted": superseded,
+              "predict_archived": predict["archived"], "predict_days": predict["days"],
+              "state_archived": states["archived"], "state_days": states["days"],
+              "elapsed_s": round(time.perf_counter() - started, 2), "dry_run": dry_run}
+    print(f"[compaction] {result}")
+    return result
+
+
+def run_compaction(patient_ids=None, dry_run=False):
+    """전체(또는 지정한) 환자 압축. 워커 스케줄러에서 주기적으로 호출"""
+    if not db:
+        print("[compaction] Firestore 미연결. 압축을 건너뜁니다.")
+        return []
+    if patient_ids is None:
+        ids = {ref.id for ref in db.collection("users").list_documents()}
+        ids |= {ref.id for ref in db.collection("state").list_documents()}
+        patient_ids = sorted(ids)
+    deleter = RateLimitedDeleter(dry_run=dry_run)  # 환자 간에도 초당 삭제 수 제한 공유
+    results = []
+    for patient_id in patient_ids:
+        try:
+            results.append(compact_patient(patient_id, dry_run, deleter))
+        except Exception as e:
+            print(f"[compaction] 환자({patient_id}) 압축 실패: {e}")
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="예측/상태 기록 보존 기간 압축")
+    parser.add_argument("--patient", action="append", help="대상 환자 ID (여러 번 지정 가능, 기본: 전체)")
+    parser.add_argument("--dry-run", action="store_true", help="삭제/보관 없이 대상만 집계")
+    args = parser.parse_args()
+    run_compaction(args.patient, args.dry_run)
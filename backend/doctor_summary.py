@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+의사별 담당 환자 요약 문서 (doctor_summaries/{doctor_id})
+
+의사 대시보드가 환자마다 glulog / predict / alerts 컬렉션을 조회하지 않도록,
+혈당 수집, 예측 저장, 알림 갱신 시점에 환자별 요약 항목을 미리 갱신해 둔다.
+대시보드 조회는 요약 문서 1건 읽기로 끝난다.
+
+    doctor_summaries/{doctor_id} = {
+        "doctor_id": ...,
+        "patients": {
+            patient_id: {
+                "name", "target_glucose_range",
+                "last_glucose", "last_reading_at",
+                "forecast_min", "forecast_max", "forecast_next", "forecast_at",
+                "active_alerts", "alerts": [최근 활성 알림 ...],
+            },
+        },
+        "updated_at": ...,
+    }
+"""
+import os
+from datetime import datetime
+
+import pytz
+from firebase_admin import firestore
+
+from firebase_client import db
+from singleflight import SingleFlight
+
+DOCTOR_SUMMARIES_COLLECTION = "doctor_summaries"
+DEFAULT_DOCTOR_ID = os.environ.get("DEFAULT_DOCTOR_ID")  # users/{id}에 doctor_id가 없는 환자의 담당 의사 (미설정 시 요약 제외)
+PATIENT_CONTEXT_TTL = float(os.environ.get("PATIENT_CONTEXT_TTL", 300))  # 환자 -> 담당 의사 캐시 시간 (초)
+SUMMARY_ALERTS_PER_PATIENT = 10  # 요약 문서에 보관할 환자별 최근 활성 알림 수
+TREND_THRESHOLD = 10  # 다음 예측값과 현재 혈당 차이가 이 이상이면 상승/하강 (mg/dL)
+DEFAULT_TARGET_RANGE = {"min": 70, "max": 180}
+KST = pytz.timezone("Asia/Seoul")
+
+# 환자별 담당 의사/이름/목표 범위 (동시 조회 병합 + TTL 캐시)
+patient_contexts = SingleFlight(ttl=PATIENT_CONTEXT_TTL)
+
+
+def summary_ref(doctor_id):
+    return db.collection(DOCTOR_SUMMARIES_COLLECTION).document(doctor_id)
+
+
+def load_patient_context(patient_id):
+    doc = db.collection("users").document(patient_id).get()
+    data = doc.to_dict() if doc.exists else {}
+    doctor_id = data.get("doctor_id") or DEFAULT_DOCTOR_ID
+    if not doctor_id:
+        return None
+    return {
+        "doctor_id": doctor_id,
+        "name": data.get("name", patient_id),
+        "target_glucose_range": data.get("target_glucose_range", DEFAULT_TARGET_RANGE),
+    }
+
+
+def patient_context(patient_id):
+    """환자의 담당 의사 정보 (캐시, 담당 의사 없으면 None)"""
+    return patient_contexts.do(patient_id, lambda: load_patient_context(patient_id))
+
+
+def kst_iso(timestamp):
+    """glulog 형식(KST 'YYYY-MM-DD HH:MM:SS') 또는 datetime -> 시간대 포함 ISO 문자열"""
+    if isinstance(timestamp, datetime):
+        dt = timestamp
+    else:
+        try:
+            dt = datetime.fromisoformat(str(timestamp))
+        except ValueError:
+            return str(timestamp)
+    if dt.tzinfo is None:
+        dt = KST.localize(dt)
+    return dt.isoformat()
+
+
+def update_patient_entry(patient_id, fields):
+    """
+    담당 의사 요약 문서의 환자 항목 병합 갱신 (쓰기 1회)
+
+    Returns:
+        bool: 갱신 여부 (담당 의사가 없거나 실패하면 False)
+    """
+    try:
+        context = patient_context(patient_id)
+        if context is None:
+            return False
+        entry = {"name": context["name"], "target_glucose_range": context["target_glucose_range"]}
+        entry.update(fields)
+        summary_ref(context["doctor_id"]).set({
+            "doctor_id": context["doctor_id"],
+            "patients": {patient_id: entry},
+            "updated_at": firestore.SERVER_TIMESTAMP,
+        }, merge=True)
+        return True
+    except Exception as e:
+        print(f"[doctor_summary] 환자({patient_id}) 요약 갱신 실패: {e}")
+        return False
+
+
+def record_reading(patient_id, glucose, timestamp):
+    """최신 혈당 측정값 반영"""
+    return update_patient_entry(patient_id, {"last_glucose": glucose, "last_reading_at": kst_iso(timestamp)})
+
+
+def record_forecast(patient_id, points, predicted_at):
+    """예측 결과(points: [{'timestamp', 'value'}, ...]) 반영"""
+    if not points:
+        return False
+    points = sorted(points, key=lambda p: p["timestamp"])
+    values = [p["value"] for p in points]
+    return update_patient_entry(patient_id, {
+        "forecast_min": min(values),
+        "forecast_max": max(values),
+        "forecast_next": values[0],
+        "forecast_at": kst_iso(predicted_at),
+    })
+
+
+def record_alerts(patient_id, active_alerts):
+    """활성 알림 목록(최신순) 반영"""
+    return update_patient_entry(patient_id, {
+        "active_alerts": len(active_alerts),
+        "alerts": list(active_alerts[:SUMMARY_ALERTS_PER_PATIENT]),
+    })
+
+
+def latest_patient_entry(patient_id, context):
+    """요약 문서가 없을 때 환자 1명의 항목을 원본 컬렉션에서 계산"""
+    desc = firestore.Query.DESCENDING
+    user_ref = db.collection("users").document(patient_id)
+    entry = {"name": context["name"], "target_glucose_range": context["target_glucose_range"],
+             "active_alerts": 0, "alerts": []}
+    for doc in user_ref.collection("glulog").order_by("timestamp", direction=desc).limit(1).stream():
+        entry.update(last_glucose=doc.get("glucose"), last_reading_at=kst_iso(doc.get("timestamp")))
+    latest = next(iter(user_ref.collection("predict").order_by("predicted_at", direction=desc).limit(1).stream()), None)
+    if latest is not None:
+        predicted_at = latest.get("predicted_at")
+        points = [{"timestamp": d.get("timestamp"), "value": d.get("value")}
+                  for d in user_ref.collection("predict").where("predicted_at", "==", predicted_at).stream()]
+        values = [p["value"] for p in sorted(points, key=lambda p: p["timestamp"])]
+        entry.update(forecast_min=min(values), forecast_max=max(values), forecast_next=values[0],
+                     forecast_at=kst_iso(predicted_at))
+    alerts_doc = db.collection("alerts").document(patient_id).get()
+    if alerts_doc.exists:
+        active = sorted((alerts_doc.to_dict() or {}).get("active", {}).values(),
+                        key=lambda a: a.get("timestamp") or "", reverse=True)
+        entry.update(active_alerts=len(active), alerts=active[:SUMMARY_ALERTS_PER_PATIENT])
+    return entry
+
+
+def rebuild_summary(doctor_id):
+    """
+    담당 환자 전체를 조회하여 요약 문서 재생성 (요약 문서가 없을 때 1회, 환자 수에 비례한 조회)
+    """
+    patients = {}
+    docs = db.collection("users").where("doctor_id", "==", doctor_id).stream()
+    patient_ids = [doc.id for doc in docs]
+    if doctor_id == DEFAULT_DOCTOR_ID:
+        patient_ids += [doc.id for doc in db.collection("users").stream()
+                        if doc.id not in patient_ids and not (doc.to_dict() or {}).get("doctor_id")]
+    for patient_id in patient_ids:
+        context = patient_context(patient_id)
+        if context is not None and context["doctor_id"] == doctor_id:
+            patients[patient_id] = latest_patient_entry(patient_id, context)
+
+    summary = {"doctor_id": doctor_id, "patients": patients, "updated_at": firestore.SERVER_TIMESTAMP}
+    summary_ref(doctor_id).set(summary)
+    print(f"[doctor_summary] 의사({doctor_id}) 요약 재생성: 환자 {len(patients)}명")
+    return summary
+
+
+def get_summary(doctor_id):
+    """(요약 데이터, 문서 스냅샷) 반환 (문서가 없으면 재생성, 스냅샷은 None)"""
+    doc = summary_ref(doctor_id).get()
+    if doc.exists:
+        return doc.to_dict(), doc
+    return rebuild_summary(doctor_id), None
+
+
+def patient_status(entry):
+    """normal / warning(예측이 목표 범위 이탈) / danger(현재 혈당 범위 이탈 또는 활성 알림)"""
+    target = entry.get("target_glucose_range") or DEFAULT_TARGET_RANGE
+    low, high = target.get("min", 70), target.get("max", 180)
+    glucose = entry.get("last_glucose")
+    if entry.get("active_alerts") or (glucose is not None and not low <= glucose <= high):
+        return "danger"
+    if (entry.get("forecast_min") is not None and entry["forecast_min"] < low) or \
+            (entry.get("forecast_max") is not None and entry["forecast_max"] > high):
+        return "warning"
+    return "normal"
+
+
+def patient_trend(entry):
+    """다음 예측값과 현재 혈당 비교 (up / down / stable)"""
+    glucose, forecast_next = entry.get("last_glucose"), entry.get("forecast_next")
+    if glucose is None or forecast_next is None:
+        return "stable"
+    if forecast_next - glucose >= TREND_THRESHOLD:
+        return "up"
+    if glucose - forecast_next >= TREND_THRESHOLD:
+        return "down"
+    return "stable"
+
+
+def patient_rows(summary):
+    """의사 대시보드 환자 목록 형식 (위험 환자 우선)"""
+    order = {"danger": 0, "warning": 1, "normal": 2}
+    rows = []
+    for patient_id, entry in (summary.get("patients") or {}).items():
+        rows.append({
+            "id": patient_id,
+            "name": entry.get("name", patient_id),
+            "status": patient_status(entry),
+            "lastGlucose": entry.get("last_glucose"),
+            "trend": patient_trend(entry),
+            "lastUpdate": entry.get("last_reading_at"),
+            "forecastMin": entry.get("forecast_min"),
+            "forecastMax": entry.get("forecast_max"),
+            "activeAlerts": entry.get("active_alerts", 0),
+        })
+    rows.sort(key=lambda r: (order[r["status"]], r["name"]))
+    return rows
+
+
+def doctor_alerts(summary, limit=None):
+    """담당 환자 전체의 활성 알림 (최신순)"""
+    alerts = []
+    for patient_id, entry in (summary.get("patients") or {}).items():
+        for alert in entry.get("alerts") or []:
+            alerts.append(dict(alert, patientId=patient_id, patientName=entry.get("name", patient_id),
+                               status=alert.get("status", "active")))
+    alerts.sort(key=lambda a: a.get("timestamp") or "", reverse=True)
+    return alerts[:limit] if limit else alerts
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Firebase / Firestore 클라이언트 공용 모듈
+
+웹(app.py)과 예측 워커(worker.py, bit_maml.py)가 같은 Firebase 앱과 Firestore 클라이언트를 공유한다.
+클라이언트는 import 시점이 아니라 처음 사용할 때 생성된다.
+비동기 서버(asgi_app.py)는 같은 자격 증명으로 만든 Firestore AsyncClient(get_async_db)를 사용한다.
+"""
+import os
+import threading
+
+import firebase_admin
+from firebase_admin import credentials, firestore
+
+# GOOGLE_APPLICATION_CREDENTIALS 환경 변수 또는 이 파일과 같은 폴더의 키 파일 사용 (실행 위치와 무관)
+DEFAULT_SERVICE_ACCOUNT_KEY = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                                           "ccccssss2-bde41-firebase-adminsdk-fbsvc-9438d30e40.json")
+SERVICE_ACCOUNT_KEY_PATH = os.environ.get("GOOGLE_APPLICATION_CREDENTIALS", DEFAULT_SERVICE_ACCOUNT_KEY)
+
+_client = None
+_async_client = None
+_initialized = False
+_lock = threading.Lock()
+
+
+def get_db():
+    """Firestore 클라이언트 반환 (최초 호출 시 초기화, 실패하면 None)"""
+    global _client, _initialized
+    if _initialized:
+        return _client
+    with _lock:
+        if _initialized:
+            return _client
+        try:
+            print(f"서비스 계정 키 파일 경로 확인: {SERVICE_ACCOUNT_KEY_PATH}")
+            if not os.path.exists(SERVICE_ACCOUNT_KEY_PATH):
+                raise FileNotFoundError(f"서비스 계정 키 파일이 존재하지 않습니다: {SERVICE_ACCOUNT_KEY_PATH}")
+            if not os.access(SERVICE_ACCOUNT_KEY_PATH, os.R_OK):
+                raise PermissionError(f"서비스 계정 키 파일 읽기 권한 없음: {SERVICE_ACCOUNT_KEY_PATH}")
+
+            # 앱 중복 초기화 방지
+            if not firebase_admin._apps:
+                firebase_admin.initialize_app(credentials.Certificate(SERVICE_ACCOUNT_KEY_PATH))
+                print("Firebase Admin SDK 초기화 성공")
+            else:
+                print("Firebase Admin SDK 이미 초기화됨")
+            _client = firestore.client()
+            print("Firebase Firestore 클라이언트 생성 및 연결 성공")
+        except Exception as e:
+            print(f"!!! Firebase 초기화 중 심각한 오류 발생: {e} !!!")
+            print("!!! Firestore 기능이 비활성화됩니다. 서비스 계정 키 경로 및 권한, 파일 형식을 확인하세요. !!!")
+            _client = None
+        _initialized = True
+        return _client
+
+
+def get_async_db():
+    """
+    Firestore AsyncClient 반환 (Firebase 앱과 같은 자격 증명/프로젝트, 초기화 실패 시 None)
+
+    AsyncClient는 처음 사용한 이벤트 루프에 묶이므로 ASGI 서버 프로세스 안에서만 사용한다.
+    """
+    global _async_client
+    if _async_client is not None:
+        return _async_client
+    if get_db() is None:
+        return None
+    with _lock:
+        if _async_client is None:
+            app = firebase_admin.get_app()
+            _async_client = firestore.AsyncClient(project=app.project_id,
+                                                  credentials=app.credential.get_credential())
+            print("Firebase Firestore 비동기 클라이언트 생성 성공")
+        return _async_client
+
+
+class LazyFirestore:
+    """
+    기존 `db.collection(...)` / `if not db:` 코드를 그대로 쓰기 위한 지연 초기화 프록시
+
+    속성 접근이나 bool 평가 시점에 get_db()로 실제 클라이언트를 생성한다.
+    """
+
+    def __bool__(self):
+        return get_db() is not None
+
+    def __getattr__(self, name):
+        client = get_db()
+        if client is None:
+            raise RuntimeError("Firestore 클라이언트를 사용할 수 없습니다.")
+        return getattr(client, name)
+
+
+db = LazyFirestore()
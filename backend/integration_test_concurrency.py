@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+"""
+pGluc-Webex 동시성 / 재시도 동작 테스트 스크립트
+
+외부 서비스(Firestore, Webex) 없이 백엔드 모듈의 동시성 관련 동작을 검증합니다.
+테스트 항목:
+1. 혈당 수집 요청 파싱 (중복 / 잘못된 측정값 집계)
+2. Single-flight 요청 병합 (TTL / forget)
+3. 레이트 리미터 429 차단
+4. Webex 발신 보관함 선점 / 묶음 전송 / 재시도 (계정별 재전송 포함)
+5. Webex 토큰 캐시 동시 갱신 병합
+"""
+
+import os
+import sys
+import json
+import time
+import tempfile
+import threading
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import webex_integration
+from singleflight import SingleFlight
+from webex_integration import RateLimiter
+from webex_outbox import WebexOutbox
+from webex_tokens import WebexTokenCache
+
+# 테스트 결과 저장 디렉토리
+TEST_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "test_results")
+os.makedirs(TEST_RESULTS_DIR, exist_ok=True)
+TEST_LOG_PATH = os.path.join(TEST_RESULTS_DIR, "concurrency_test_log.txt")
+
+# 로깅 설정
+def log_test(test_name, status, message=""):
+    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    log_message = f"[{timestamp}] {test_name}: {status}"
+    if message:
+        log_message += f" - {message}"
+    print(log_message)
+
+    # 로그 파일에 기록
+    with open(TEST_LOG_PATH, "a") as f:
+        f.write(log_message + "\n")
+
+    return status == "성공"
+
+def check(test_name, condition, message=""):
+    """조건 결과를 기록하고 그대로 반환"""
+    return log_test(test_name, "성공" if condition else "실패", message)
+
+def save_test_result(test_name, data):
+    """테스트 결과를 JSON 파일로 저장"""
+    file_path = os.path.join(TEST_RESULTS_DIR, f"{test_name}.json")
+    with open(file_path, "w") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    return file_path
+
+class RecordingWebexAPI:
+    """send_message 호출을 기록하는 Webex API 대역 (fail=True면 전송 실패)"""
+    def __init__(self, name):
+        self.name = name
+        self.sent = []
+        self.fail = False
+
+    def send_message(self, **kwargs):
+        if self.fail:
+            raise RuntimeError(f"{self.name} 전송 실패")
+        self.sent.append(kwargs)
+        return {"id": f"{self.name}-{len(self.sent)}"}
+
+# 1. 혈당 수집 요청 파싱
+def test_ingest_parsing():
+    """요청 내 중복 / 잘못된 측정값 집계 테스트"""
+    print("\n===== 혈당 수집 파싱 테스트 =====")
+    try:
+        from app import first_occurrences, parse_glucose_readings
+    except Exception as e:
+        return log_test("app 모듈 임포트", "실패", str(e))
+
+    raw_readings = [
+        {"timestamp": "2024-01-01 08:00:00", "glucose": 120},
+        {"timestamp": "2024-01-01T00:05:00Z", "glucose": "130", "meal": 1},
+        {"timestamp": "2024-01-01 08:00:00", "glucose": 99},  # 요청 내 중복
+        {"glucose": 110},  # timestamp 없음
+        {"timestamp": "2024-01-01 08:10:00", "glucose": "abc"},  # 숫자가 아닌 혈당
+        {"timestamp": "2024-01-01 08:15:00", "glucose": 140, "meal": "abc"},  # 숫자가 아닌 선택 필드
+        "not a reading",
+    ]
+    timestamps, glucose_values, extras, invalid = parse_glucose_readings(raw_readings)
+    first_idx = first_occurrences(timestamps)
+    results = [
+        check("잘못된 측정값 집계", invalid == 4 and len(timestamps) == 3, f"유효 {len(timestamps)}건, 잘못된 값 {invalid}건"),
+        check("요청 내 중복 제거", len(timestamps) - len(first_idx) == 1 and glucose_values[first_idx["2024-01-01 08:00:00"]] == 120,
+              f"고유 시각 {sorted(first_idx)}"),
+        check("선택 필드 변환", extras[1] == {"meal": 1.0}, f"선택 필드: {extras}"),
+    ]
+    return all(results)
+
+# 2. Single-flight
+def test_singleflight():
+    """동시 호출 병합 / TTL 재사용 / forget 테스트"""
+    print("\n===== Single-flight 테스트 =====")
+    results = []
+    flight = SingleFlight(ttl=0.2)
+    calls = []
+
+    def slow_load():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"value": len(calls)}
+
+    outputs = []
+    threads = [threading.Thread(target=lambda: outputs.append(flight.do("patient1", slow_load))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.append(check("동시 호출 병합", len(calls) == 1 and len(outputs) == 8 and all(o is outputs[0] for o in outputs),
+                         f"실제 호출 {len(calls)}회, 결과 {len(outputs)}건"))
+
+    flight.do("patient1", slow_load)
+    results.append(check("TTL 내 재사용", len(calls) == 1, f"실제 호출 {len(calls)}회"))
+
+    flight.forget("patient1")
+    flight.do("patient1", slow_load)
+    results.append(check("forget 후 다시 호출", len(calls) == 2, f"실제 호출 {len(calls)}회"))
+
+    time.sleep(0.3)
+    flight.do("patient1", slow_load)
+    results.append(check("TTL 만료 후 다시 호출", len(calls) == 3, f"실제 호출 {len(calls)}회"))
+
+    def failing_load():
+        calls.append(1)
+        raise ValueError("조회 실패")
+    for _ in range(2):
+        try:
+            flight.do("patient2", failing_load)
+        except ValueError:
+            pass
+    results.append(check("예외는 캐시하지 않음", len(calls) == 5, f"실제 호출 {len(calls)}회"))
+    return all(results)
+
+# 3. 레이트 리미터
+def test_rate_limiter_block():
+    """429 응답 후 그룹 차단 테스트"""
+    print("\n===== 레이트 리미터 429 차단 테스트 =====")
+    results = []
+    limiter = RateLimiter(rate=100, burst=5)
+    limiter.block("messages", 0.3)
+
+    results.append(check("차단 중 즉시 획득 불가", not limiter.try_acquire("messages")))
+    results.append(check("다른 그룹은 영향 없음", limiter.try_acquire("rooms")))
+
+    waited = limiter.acquire("messages")
+    results.append(check("차단 시간 동안 대기", waited >= 0.25, f"대기 시간 {waited:.3f}초"))
+
+    # 차단 후에는 토큰 1개부터 다시 충전되므로 버스트 없이 속도 제한 적용
+    started = time.monotonic()
+    for _ in range(3):
+        limiter.acquire("messages")
+    elapsed = time.monotonic() - started
+    results.append(check("차단 후 버스트 없음", elapsed >= 0.015, f"3건 획득 {elapsed:.3f}초"))
+
+    # 재시도 한도를 넘긴 마지막 429 응답도 그룹을 Retry-After 동안 차단
+    class ThrottledHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            self.send_response(429)
+            self.send_header("Retry-After", "2")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ThrottledHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    saved_retries = webex_integration.WEBEX_MAX_429_RETRIES
+    webex_integration.WEBEX_MAX_429_RETRIES = 0
+    try:
+        limiter = RateLimiter(rate=100, burst=5)
+        api = webex_integration.WebexAPI(access_token="test", rate_limiter=limiter)
+        api.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            api.send_message(room_id="room1", text="test")
+            raised = False
+        except requests.exceptions.HTTPError:
+            raised = True
+        results.append(check("마지막 429 후 그룹 차단", raised and not limiter.try_acquire("messages"),
+                             f"예외 발생: {raised}"))
+    finally:
+        webex_integration.WEBEX_MAX_429_RETRIES = saved_retries
+        server.shutdown()
+    return all(results)
+
+# 4. Webex 발신 보관함
+def test_webex_outbox():
+    """보관함 선점 / 묶음 전송 / 재시도 테스트"""
+    print("\n===== Webex 발신 보관함 테스트 =====")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        service_api = RecordingWebexAPI("service")
+        outbox = WebexOutbox(service_api, path=os.path.join(tmp, "outbox.db"), digest_window=60)
+
+        # 즉시 전송 메시지는 한 번만 선점됨
+        outbox.enqueue({"person_email": "doc@example.com", "text": "긴급"})
+        now = time.time()
+        first = outbox.claim_due(now)
+        second = outbox.claim_due(now)
+        results.append(check("보관함 선점", len(first) == 1 and not second,
+                             f"첫 선점 {len(first)}건, 두 번째 선점 {len(second)}건"))
+        if not first:
+            return False
+        outbox.mark_sent(first[0][0], "sent-1")
+
+        # 묶음 알림은 묶음 시간이 지나면 1건으로 합쳐 전송
+        for i in range(3):
+            outbox.enqueue({"person_email": "patient@example.com", "text": f"알림 {i}"}, digest=True)
+        early = outbox.deliver_due(now + 1)
+        merged = outbox.deliver_due(now + 120)
+        body = service_api.sent[-1].get("markdown", "") if service_api.sent else ""
+        results.append(check("묶음 전송", early["messages"] == 0 and merged == {"messages": 1, "items": 3, "failed": 0}
+                             and "3건" in body, f"묶음 전 {early}, 묶음 후 {merged}"))
+
+        # 전송 실패 시 재시도 대기 후 다시 전송
+        outbox.enqueue({"room_id": "room1", "text": "재시도"})
+        service_api.fail = True
+        failed = outbox.deliver_due(now + 200)
+        retried_too_early = outbox.deliver_due()  # 재시도 대기(WEBEX_OUTBOX_RETRY_BASE초) 전
+        service_api.fail = False
+        retried = outbox.deliver_due(now + 600)
+        counts = outbox.counts()
+        results.append(check("실패 후 재시도", failed["failed"] == 1 and retried_too_early["messages"] == 0
+                             and retried["messages"] == 1 and counts.get("pending", 0) == 0,
+                             f"상태별 메시지 수: {counts}"))
+    return all(results)
+
+def test_webex_outbox_accounts():
+    """의사별 토큰으로 보낸 메시지의 재전송 계정 테스트"""
+    print("\n===== Webex 발신 보관함 계정별 재전송 테스트 =====")
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        service_api = RecordingWebexAPI("service")
+        doctor_api = RecordingWebexAPI("doctor1")
+        outbox = WebexOutbox(service_api, path=os.path.join(tmp, "outbox.db"), digest_window=60,
+                             client_for=lambda account: doctor_api if account == "doctor1" else None)
+
+        # 바로 전송하다 실패한 메시지는 보낸 계정의 클라이언트로 재전송
+        outbox_id = outbox.enqueue({"person_email": "doc@example.com", "text": "긴급"}, claim=True, account="doctor1")
+        outbox.mark_failed([outbox_id], "연결 오류")
+        now = time.time()
+        stats = outbox.deliver_due(now + 3600)
+        results.append(check("계정별 재전송", stats["messages"] == 1 and len(doctor_api.sent) == 1 and not service_api.sent,
+                             f"의사 클라이언트 {len(doctor_api.sent)}건, 서비스 클라이언트 {len(service_api.sent)}건"))
+
+        # 같은 대상이라도 보내는 계정이 다르면 따로 묶음
+        outbox.enqueue({"person_email": "patient@example.com", "text": "서비스 알림"}, digest=True)
+        outbox.enqueue({"person_email": "patient@example.com", "text": "의사 알림"}, digest=True, account="doctor1")
+        merged = outbox.deliver_due(time.time() + 120)
+        results.append(check("계정별 묶음", merged["messages"] == 2 and len(service_api.sent) == 1 and len(doctor_api.sent) == 2,
+                             f"묶음 결과 {merged}"))
+
+        # 토큰이 없는 계정의 메시지는 서비스 계정으로 보내지 않고 실패 처리
+        outbox.enqueue({"person_email": "doc@example.com", "text": "토큰 없음"}, account="doctor2")
+        missing = outbox.deliver_due(time.time())
+        results.append(check("토큰 없는 계정", missing["failed"] == 1 and len(service_api.sent) == 1, f"결과 {missing}"))
+    return all(results)
+
+# 5. Webex 토큰 캐시
+def test_webex_token_cache():
+    """만료된 토큰 동시 조회 시 갱신 1회 테스트"""
+    print("\n===== Webex 토큰 캐시 테스트 =====")
+    results = []
+    refreshes = []
+    expired = {"access_token": "old", "refresh_token": "r1",
+               "expires_at": datetime.now(timezone.utc) - timedelta(minutes=1)}
+
+    def refresh(user_id, record):
+        refreshes.append(user_id)
+        time.sleep(0.1)
+        cache.put(user_id, {"access_token": f"new-{len(refreshes)}", "refresh_token": "r2",
+                            "expires_at": datetime.now(timezone.utc) + timedelta(hours=1)})
+        return f"new-{len(refreshes)}"
+
+    cache = WebexTokenCache(lambda user_id: dict(expired), refresh)
+    rebound = []
+    cache.add_listener(lambda user_id, token: rebound.append(token))
+
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(cache.get("doctor1"))) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.append(check("동시 갱신 병합", len(refreshes) == 1 and set(tokens) == {"new-1"},
+                         f"갱신 {len(refreshes)}회, 토큰 {set(tokens)}"))
+    results.append(check("갱신 후 캐시 사용", cache.get("doctor1") == "new-1" and len(refreshes) == 1
+                         and cache.stats["loads"] == 1, f"통계: {cache.stats}"))
+    results.append(check("토큰 변경 알림", rebound == ["new-1"], f"알림: {rebound}"))
+    return all(results)
+
+def run_concurrency_tests():
+    """모든 동시성 테스트 실행"""
+    print("\n========== pGluc-Webex 동시성 테스트 시작 ==========")
+    print(f"테스트 시작 시간: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print(f"테스트 결과 저장 경로: {TEST_RESULTS_DIR}")
+
+    # 테스트 결과 초기화
+    with open(TEST_LOG_PATH, "w") as f:
+        f.write(f"pGluc-Webex 동시성 테스트 - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
+
+    # 각 테스트 실행
+    outcomes = {
+        "ingest_parsing_test": test_ingest_parsing(),
+        "singleflight_test": test_singleflight(),
+        "rate_limiter_test": test_rate_limiter_block(),
+        "webex_outbox_test": test_webex_outbox(),
+        "webex_outbox_accounts_test": test_webex_outbox_accounts(),
+        "webex_token_cache_test": test_webex_token_cache(),
+    }
+
+    # 종합 결과
+    print("\n========== 동시성 테스트 결과 요약 ==========")
+    for i, (name, result) in enumerate(outcomes.items(), 1):
+        print(f"{i}. {name}: {'성공' if result else '실패'}")
+
+    overall_result = all(outcomes.values())
+    print(f"\n전체 테스트 결과: {'성공' if overall_result else '실패'}")
+    print(f"테스트 종료 시간: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+
+    # 결과 저장
+    summary = dict(outcomes, test_date=datetime.now().isoformat(), overall_result=overall_result)
+    summary_path = save_test_result("concurrency_test_summary", summary)
+    print(f"테스트 요약 저장 경로: {summary_path}")
+
+    return overall_result
+
+if __name__ == "__main__":
+    sys.exit(0 if run_concurrency_tests() else 1)
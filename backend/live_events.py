@@ -0,0 +1,222 @@
+# -*- coding: utf-8 -*-
+"""
+환자별 실시간 이벤트 허브 (SSE 스트림용)
+
+- 백엔드 자체 쓰기(혈당 수집, 상태 기록, 예측 저장)와 Firestore 리스너가 이벤트를 발행
+- 같은 환자를 구독하는 모든 클라이언트가 하나의 Firestore 리스너를 공유
+- 구독자별 큐는 크기가 제한되며, 느린 클라이언트는 오래된 이벤트부터 버림
+- ASGI 서버는 AsyncSubscription(asyncio.Queue)으로 구독하여 연결마다 스레드를 점유하지 않음
+"""
+import asyncio
+import hashlib
+import json
+import queue
+import threading
+import time
+from collections import OrderedDict
+
+SUBSCRIBER_QUEUE_SIZE = 100  # 구독자별 최대 대기 이벤트 수
+RECENT_EVENT_CACHE_SIZE = 256  # 중복 발행 감지용 최근 이벤트 지문 수 (환자별)
+HEARTBEAT_SECONDS = 15  # SSE keep-alive 주석 전송 주기
+
+
+class Subscription:
+    """단일 SSE 연결의 이벤트 큐"""
+
+    def __init__(self, patient_id, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.patient_id = patient_id
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event):
+        while True:
+            try:
+                self.queue.put_nowait(event)
+                return
+            except queue.Full:
+                # 느린 구독자: 가장 오래된 이벤트를 버리고 최신 이벤트 유지
+                try:
+                    self.queue.get_nowait()
+                    self.dropped += 1
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout=HEARTBEAT_SECONDS):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class AsyncSubscription(Subscription):
+    """
+    비동기 SSE 연결의 이벤트 큐 (asyncio.Queue)
+
+    이벤트는 Firestore 리스너 / 요청 처리 스레드에서 발행되므로 call_soon_threadsafe로
+    구독한 이벤트 루프에 넘긴다.
+    """
+
+    def __init__(self, patient_id, loop=None, maxsize=SUBSCRIBER_QUEUE_SIZE):
+        self.patient_id = patient_id
+        self.loop = loop or asyncio.get_running_loop()
+        self.queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def put(self, event):
+        try:
+            self.loop.call_soon_threadsafe(self._put_nowait, event)
+        except RuntimeError:
+            pass  # 이벤트 루프 종료 후 발행된 이벤트는 버림
+
+    def _put_nowait(self, event):
+        if self.queue.full():
+            # 느린 구독자: 가장 오래된 이벤트를 버리고 최신 이벤트 유지
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=HEARTBEAT_SECONDS):
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class _PatientChannel:
+    def __init__(self):
+        self.subscribers = set()
+        self.listeners = []
+        self.recent = OrderedDict()
+
+
+class PatientEventHub:
+    """
+    환자별 이벤트 발행/구독 허브
+
+    listener_factory(patient_id, publish)가 설정되어 있으면 첫 구독자가 생길 때 한 번 호출되어
+    Firestore 리스너 목록(unsubscribe() 지원 객체)을 반환하고, 마지막 구독자가 떠나면 해제된다.
+    """
+
+    def __init__(self, listener_factory=None):
+        self.listener_factory = listener_factory
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._event_seq = 0
+
+    def subscribe(self, patient_id, subscription=None):
+        """구독 시작 (subscription: 미리 만든 AsyncSubscription 등, 기본: 스레드용 Subscription)"""
+        subscription = subscription or Subscription(patient_id)
+        start_listeners = False
+        with self._lock:
+            channel = self._channels.get(patient_id)
+            if channel is None:
+                channel = self._channels[patient_id] = _PatientChannel()
+                start_listeners = True
+            channel.subscribers.add(subscription)
+
+        if start_listeners and self.listener_factory:
+            try:
+                listeners = self.listener_factory(patient_id, lambda event_type, data, key=None: self.publish(patient_id, event_type, data, key))
+            except Exception as e:
+                print(f"[live_events] 환자({patient_id}) Firestore 리스너 시작 실패: {e}")
+                listeners = []
+            with self._lock:
+                if self._channels.get(patient_id) is channel:
+                    channel.listeners = listeners
+                    listeners = []
+            # 시작 도중 모든 구독자가 떠난 경우 바로 해제
+            self._stop_listeners(listeners)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        listeners = []
+        with self._lock:
+            channel = self._channels.get(subscription.patient_id)
+            if channel is None:
+                return
+            channel.subscribers.discard(subscription)
+            if not channel.subscribers:
+                listeners = channel.listeners
+                del self._channels[subscription.patient_id]
+        self._stop_listeners(listeners)
+
+    def has_subscribers(self, patient_id):
+        return patient_id in self._channels
+
+    def subscriber_count(self, patient_id=None):
+        with self._lock:
+            if patient_id is not None:
+                channel = self._channels.get(patient_id)
+                return len(channel.subscribers) if channel else 0
+            return sum(len(c.subscribers) for c in self._channels.values())
+
+    def publish(self, patient_id, event_type, data, key=None):
+        """
+        이벤트 발행
+
+        Args:
+            patient_id: 환자 ID
+            event_type: 이벤트 종류 ('reading', 'state', 'forecast' 등)
+            data: JSON 직렬화 가능한 이벤트 데이터
+            key: 중복 판별 키 (예: 문서 ID). 같은 키와 같은 내용의 이벤트는 한 번만 전달
+        """
+        with self._lock:
+            channel = self._channels.get(patient_id)
+            if channel is None:
+                return False
+            fingerprint = hashlib.sha1(
+                json.dumps([event_type, key, data], sort_keys=True, default=str).encode("utf-8")).hexdigest()
+            if fingerprint in channel.recent:
+                return False
+            channel.recent[fingerprint] = True
+            if len(channel.recent) > RECENT_EVENT_CACHE_SIZE:
+                channel.recent.popitem(last=False)
+            self._event_seq += 1
+            event = {"id": self._event_seq, "type": event_type, "data": data, "ts": time.time()}
+            subscribers = list(channel.subscribers)
+
+        for subscription in subscribers:
+            subscription.put(event)
+        return True
+
+    def stream(self, subscription, heartbeat=HEARTBEAT_SECONDS):
+        """SSE 형식 문자열 제너레이터 (연결 종료 시 구독 해제)"""
+        try:
+            yield sse_preamble(subscription)
+            while True:
+                yield sse_format(subscription.get(timeout=heartbeat))
+        finally:
+            self.unsubscribe(subscription)
+
+    async def astream(self, subscription, heartbeat=HEARTBEAT_SECONDS):
+        """AsyncSubscription용 SSE 비동기 제너레이터 (연결 종료 시 구독 해제)"""
+        try:
+            yield sse_preamble(subscription)
+            while True:
+                yield sse_format(await subscription.get(timeout=heartbeat))
+        finally:
+            self.unsubscribe(subscription)
+
+    @staticmethod
+    def _stop_listeners(listeners):
+        for listener in listeners:
+            try:
+                listener.unsubscribe()
+            except Exception as e:
+                print(f"[live_events] 리스너 해제 실패: {e}")
+
+
+def sse_preamble(subscription):
+    return f"retry: 5000\n: subscribed {subscription.patient_id}\n\n"
+
+
+def sse_format(event):
+    """이벤트 -> SSE 메시지 (None이면 keep-alive 주석)"""
+    if event is None:
+        return ": keep-alive\n\n"
+    payload = json.dumps(event["data"], ensure_ascii=False, default=str)
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {payload}\n\n"
+
+
+# 프로세스 단위 공용 허브
+hub = PatientEventHub()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+pGluc-Webex 백엔드 부하 테스트 스크립트
+
+동시에 같은 API를 호출하는 클라이언트를 흉내 내어 지연 시간 분포와 처리량을 측정합니다.
+예) 100개 동시 리더가 같은 환자의 혈당 데이터를 조회:
+    python load_test.py --url http://localhost:5000/api/patients/kimjaehoug/glucose --concurrency 100 --requests 1000
+
+Flask 스레드 서버(app.py)와 ASGI 서버(asgi_app.py)를 동시 연결 수를 늘려가며 비교:
+    python load_test.py --url http://localhost:5000/api/patients/kimjaehoug/glucose \
+        --url http://localhost:8000/api/patients/kimjaehoug/glucose --levels 50,200,500,1000
+served_in_flight(처리량 x 최소 지연)는 서버가 실제로 동시에 처리 중이던 요청 수의 추정치입니다.
+"""
+
+import argparse
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def run_load_test(url, concurrency=100, total_requests=1000, timeout=30.0, headers=None):
+    """
+    url에 concurrency개의 동시 요청을 total_requests번 보내고 결과 요약 반환
+
+    모든 작업 스레드가 준비된 뒤 동시에 시작하여 같은 순간 몰리는 요청을 재현합니다.
+    """
+    local = threading.local()
+    barrier = threading.Barrier(concurrency)
+    latencies, statuses, lock = [], Counter(), threading.Lock()
+
+    def session():
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+            barrier.wait()
+        return local.session
+
+    def one_request(_):
+        s = session()
+        started = time.perf_counter()
+        try:
+            status = s.get(url, headers=headers, timeout=timeout).status_code
+        except requests.exceptions.RequestException as e:
+            status = type(e).__name__
+        elapsed = time.perf_counter() - started
+        with lock:
+            latencies.append(elapsed)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one_request, range(max(total_requests, concurrency))))
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "wall_seconds": round(wall, 3),
+        "requests_per_second": round(len(latencies) / wall, 1) if wall > 0 else None,
+        # Little의 법칙: 처리량 x 대기 없는 처리 시간 = 서버에서 동시에 처리 중인 요청 수
+        "served_in_flight": round(len(latencies) / wall * latencies[0], 1) if wall > 0 and latencies else 0.0,
+        "latency_ms": {
+            "min": round(latencies[0] * 1000, 1) if latencies else 0.0,
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p95": round(percentile(latencies, 95) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        "status_codes": dict(statuses),
+    }
+
+
+def run_concurrency_sweep(urls, levels, requests_per_level=None, timeout=30.0):
+    """동시 연결 수(levels)를 늘려가며 여러 서버(urls)를 같은 조건으로 측정"""
+    results = []
+    for level in levels:
+        for url in urls:
+            results.append(run_load_test(url, level, requests_per_level or level * 3, timeout))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="pGluc-Webex 백엔드 부하 테스트")
+    parser.add_argument("--url", action="append",
+                        help="측정할 URL (여러 번 지정 시 서버 비교, 기본: 로컬 혈당 API)")
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--levels", help="동시 연결 수 목록 (쉼표 구분, 지정 시 --concurrency 대신 단계별 측정)")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    args = parser.parse_args()
+    urls = args.url or ["http://localhost:5000/api/patients/kimjaehoug/glucose"]
+
+    if args.levels:
+        levels = [int(level) for level in args.levels.split(",")]
+        print("\n===== 동시 연결 수별 비교 =====")
+        print(f"{'concurrency':>11}  {'rps':>8}  {'in_flight':>9}  {'p50_ms':>8}  {'p99_ms':>8}  url")
+        for result in run_concurrency_sweep(urls, levels, timeout=args.timeout):
+            print(f"{result['concurrency']:>11}  {result['requests_per_second']:>8}  {result['served_in_flight']:>9}  "
+                  f"{result['latency_ms']['p50']:>8}  {result['latency_ms']['p99']:>8}  {result['url']}  {result['status_codes']}")
+    else:
+        for url in urls:
+            result = run_load_test(url, args.concurrency, args.requests, args.timeout)
+            print("\n===== 부하 테스트 결과 =====")
+            for key, value in result.items():
+                print(f"{key}: {value}")
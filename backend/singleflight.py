@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+"""
+Single-flight (요청 병합) 유틸리티
+
+같은 키로 동시에 들어온 호출은 하나의 실제 호출 결과를 공유한다.
+ttl을 주면 완료된 결과를 짧은 시간 동안 재사용한다 (예외는 캐시하지 않음).
+AsyncSingleFlight는 같은 이벤트 루프 안의 코루틴끼리 진행 중인 호출을 공유한다.
+"""
+import asyncio
+import threading
+import time
+
+
+class _Call:
+    __slots__ = ("event", "result", "error", "finished_at")
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.finished_at = None
+
+
+class SingleFlight:
+    def __init__(self, ttl=0.0, max_entries=1024):
+        """
+        Args:
+            ttl: 완료된 결과 재사용 시간 (초, 0이면 진행 중인 호출만 공유)
+            max_entries: 보관할 완료 결과 최대 개수
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "shared": 0}
+
+    def do(self, key, fn, ttl=None):
+        """key에 대한 fn() 결과 반환 (동시 호출/TTL 내 호출은 결과 공유)"""
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.finished_at is not None and \
+                    (call.error is not None or time.monotonic() - call.finished_at > ttl):
+                call = None
+            if call is not None:
+                self.stats["shared"] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.stats["calls"] += 1
+                leader = True
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                call.finished_at = time.monotonic()
+                if call.error is not None or ttl <= 0:
+                    if self._calls.get(key) is call:
+                        del self._calls[key]
+                elif len(self._calls) > self.max_entries:
+                    self._evict_expired(ttl)
+            call.event.set()
+        return call.result
+
+    def forget(self, key):
+        """캐시된 결과 무효화 (진행 중인 호출에는 영향 없음)"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None and call.finished_at is not None:
+                del self._calls[key]
+
+    def forget_if(self, predicate):
+        """predicate(key)가 참인 완료 결과를 모두 무효화"""
+        with self._lock:
+            for key in [k for k, c in self._calls.items() if c.finished_at is not None and predicate(k)]:
+                del self._calls[key]
+
+    def _evict_expired(self, ttl):
+        now = time.monotonic()
+        for key in [k for k, c in self._calls.items()
+                    if c.finished_at is not None and now - c.finished_at > ttl]:
+            del self._calls[key]
+        # 모두 유효한 경우 오래된 것부터 제거
+        while len(self._calls) > self.max_entries:
+            oldest = min((k for k, c in self._calls.items() if c.finished_at is not None),
+                         key=lambda k: self._calls[k].finished_at, default=None)
+            if oldest is None:
+                break
+            del self._calls[oldest]
+
+
+class AsyncSingleFlight:
+    """asyncio용 single-flight (진행 중인 호출만 공유, 결과는 보관하지 않음)"""
+
+    def __init__(self):
+        self._tasks = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    async def do(self, key, coro_fn):
+        """key에 대한 await coro_fn() 결과 반환 (동시에 대기 중인 코루틴은 결과 공유)"""
+        task = self._tasks.get(key)
+        if task is not None:
+            self.stats["shared"] += 1
+        else:
+            task = self._tasks[key] = asyncio.ensure_future(coro_fn())
+            task.add_done_callback(lambda t: self._finish(key, t))
+            self.stats["calls"] += 1
+        # 대기 중인 요청 하나가 취소되어도(클라이언트 연결 종료) 공유 작업은 계속 진행
+        return await asyncio.shield(task)
+
+    def _finish(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled():
+            task.exception()  # 모든 대기자가 떠난 경우의 미회수 예외 경고 방지
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""
+프론트엔드 정적 파일 파이프라인
+
+- 빌드: static/ 파일명에 내용 해시를 붙이고 gzip/brotli로 미리 압축, index.html의 /static/ 참조를 해시 경로로 교체
+    python static_assets.py            # ../frontend -> ../frontend/dist
+- 서버: 시작 시 한 번 빌드 결과(dist/manifest.json, 없으면 원본 폴더를 메모리에서 빌드)를 모두 메모리에 적재
+  요청 처리 중에는 파일 시스템에 접근하지 않음
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+FRONTEND_DIR = os.path.join(BACKEND_DIR, "..", "frontend")
+DIST_DIR_NAME = "dist"
+MANIFEST_NAME = "manifest.json"
+INDEX_NAME = "index.html"
+STATIC_PREFIX = "/static/"
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"  # 해시 경로: 내용이 바뀌면 경로도 바뀜
+REVALIDATE_CACHE_CONTROL = "no-cache"  # index.html 및 해시 없는 경로: 매번 ETag 재검증
+PRECOMPRESS_MIN_SIZE = 256  # 이보다 작은 파일은 압축본을 만들지 않음
+# 이미 압축된 형식은 다시 압축하지 않음
+INCOMPRESSIBLE_TYPES = ("image/png", "image/jpeg", "image/gif", "image/webp", "font/woff", "font/woff2")
+
+
+class StaticAsset:
+    """메모리에 적재된 정적 파일 1개 (인코딩별 본문)"""
+    __slots__ = ("bodies", "mimetype", "etag", "cache_control")
+
+    def __init__(self, bodies, mimetype, etag, cache_control):
+        self.bodies = bodies  # {"identity": bytes, "gzip": bytes, "br": bytes}
+        self.mimetype = mimetype
+        self.etag = etag
+        self.cache_control = cache_control
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:12]
+
+
+def hashed_name(rel_path, digest):
+    root, ext = os.path.splitext(rel_path)
+    return f"{root}.{digest}{ext}"
+
+
+def guess_mimetype(path):
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+
+def precompress(data, mimetype):
+    """압축 효과가 있는 인코딩만 포함한 {encoding: bytes}"""
+    bodies = {"identity": data}
+    if len(data) < PRECOMPRESS_MIN_SIZE or mimetype in INCOMPRESSIBLE_TYPES:
+        return bodies
+    compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(compressed) < len(data):
+        bodies["gzip"] = compressed
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            bodies["br"] = compressed
+    return bodies
+
+
+def rewrite_static_refs(html, hashed_paths):
+    """index.html 안의 /static/<파일> 참조를 해시 경로로 교체"""
+    def replace(match):
+        return STATIC_PREFIX + hashed_paths.get(match.group(1), match.group(1))
+    return re.sub(r"/static/([\w./-]+)", replace, html)
+
+
+def build(source_dir=FRONTEND_DIR):
+    """
+    원본 폴더를 빌드하여 (files, manifest) 반환
+
+    files: {dist 상대 경로: bytes}, manifest: {"index": ..., "static": {원래 경로: 해시 경로}}
+    """
+    files, hashed_paths = {}, {}
+    static_dir = os.path.join(source_dir, "static")
+    for root, _, names in os.walk(static_dir):
+        for name in sorted(names):
+            full_path = os.path.join(root, name)
+            rel_path = os.path.relpath(full_path, static_dir).replace(os.sep, "/")
+            with open(full_path, "rb") as f:
+                data = f.read()
+            hashed_paths[rel_path] = hashed_name(rel_path, content_hash(data))
+            files["static/" + hashed_paths[rel_path]] = data
+
+    with open(os.path.join(source_dir, INDEX_NAME), "r", encoding="utf-8") as f:
+        files[INDEX_NAME] = rewrite_static_refs(f.read(), hashed_paths).encode("utf-8")
+    return files, {"index": INDEX_NAME, "static": hashed_paths}
+
+
+def write_build(source_dir=FRONTEND_DIR, out_dir=None):
+    """빌드 결과와 미리 압축한 .gz/.br 파일, manifest.json을 out_dir에 기록"""
+    out_dir = out_dir or os.path.join(source_dir, DIST_DIR_NAME)
+    files, manifest = build(source_dir)
+    for rel_path, data in files.items():
+        target = os.path.join(out_dir, rel_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        bodies = precompress(data, guess_mimetype(rel_path))
+        for encoding, body in bodies.items():
+            suffix = {"identity": "", "gzip": ".gz", "br": ".br"}[encoding]
+            with open(target + suffix, "wb") as f:
+                f.write(body)
+    with open(os.path.join(out_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return out_dir, manifest
+
+
+def load_build(dist_dir):
+    """write_build 결과 폴더를 (files, manifest, 미리 압축된 본문)으로 읽기"""
+    with open(os.path.join(dist_dir, MANIFEST_NAME), "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    files, encoded = {}, {}
+    rel_paths = [manifest["index"]] + ["static/" + p for p in manifest["static"].values()]
+    for rel_path in rel_paths:
+        target = os.path.join(dist_dir, rel_path)
+        with open(target, "rb") as f:
+            files[rel_path] = f.read()
+        encoded[rel_path] = {}
+        for encoding, suffix in (("gzip", ".gz"), ("br", ".br")):
+            if os.path.exists(target + suffix):
+                with open(target + suffix, "rb") as f:
+                    encoded[rel_path][encoding] = f.read()
+    return files, manifest, encoded
+
+
+class StaticAssetIndex:
+    """URL 경로 -> StaticAsset 메모리 색인"""
+
+    def __init__(self, assets=None):
+        self.assets = assets or {}
+
+    @classmethod
+    def load(cls, source_dir=FRONTEND_DIR):
+        """dist 빌드가 있으면 사용하고, 없으면 원본 폴더를 메모리에서 빌드"""
+        dist_dir = os.path.join(source_dir, DIST_DIR_NAME)
+        if os.path.exists(os.path.join(dist_dir, MANIFEST_NAME)):
+            files, manifest, encoded = load_build(dist_dir)
+            origin = dist_dir
+        else:
+            files, manifest = build(source_dir)
+            encoded, origin = {}, source_dir
+
+        assets = {}
+        for rel_path, data in files.items():
+            mimetype = guess_mimetype(rel_path)
+            bodies = dict(encoded.get(rel_path) or precompress(data, mimetype), identity=data)
+            immutable = rel_path != manifest["index"]
+            assets["/" + rel_path] = StaticAsset(
+                bodies, mimetype, content_hash(data),
+                IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL)
+        # 해시 없는 기존 경로(/static/logo.png)도 제공하되 캐시는 재검증
+        for rel_path, hashed_path in manifest["static"].items():
+            asset = assets[STATIC_PREFIX + hashed_path]
+            assets[STATIC_PREFIX + rel_path] = StaticAsset(
+                asset.bodies, asset.mimetype, asset.etag, REVALIDATE_CACHE_CONTROL)
+        assets["/"] = assets["/" + manifest["index"]]
+
+        total = sum(len(b) for a in {id(a): a for a in assets.values()}.values() for b in a.bodies.values())
+        print(f"[static] 정적 파일 {len(files)}개 메모리 적재 ({origin}, {total / 1024:.1f}KB)")
+        return cls(assets)
+
+    def get(self, path):
+        return self.assets.get(path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="프론트엔드 정적 파일 빌드 (해시 파일명 + gzip/brotli 사전 압축)")
+    parser.add_argument("--source", default=FRONTEND_DIR)
+    parser.add_argument("--out", default=None, help="출력 폴더 (기본: <source>/dist)")
+    args = parser.parse_args()
+
+    out_dir, manifest = write_build(args.source, args.out)
+    print(f"빌드 완료: {out_dir}")
+    for rel_path, hashed_path in manifest["static"].items():
+        print(f"  /static/{rel_path} -> /static/{hashed_path}")
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+비동기 Webex API 클라이언트 (httpx.AsyncClient)
+
+WebexAPI / MedicalWebexIntegration과 같은 메서드를 await로 호출한다.
+목록 순회(iter_pages, iter_items, iter_messages, iter_rooms, ...)는 async for로 사용한다.
+- 연결 풀: 이벤트 루프별 공유 httpx.AsyncClient (또는 client=로 전달한 클라이언트)
+- 동시 요청 수 제한: 이벤트 루프별 공유 세마포어 (WEBEX_ASYNC_MAX_CONCURRENCY)
+- 레이트 리밋 / 429 / 5xx 재시도는 동기 클라이언트와 같은 규칙 (리미터도 공유)
+  토큰 대기는 스레드 대신 asyncio.sleep 폴링 (동기 대기열의 우선순위 요청이 먼저 토큰을 받음)
+
+    api = AsyncWebexAPI(access_token=token)
+    results = await AsyncMedicalWebexIntegration(api).send_notifications(
+        {email: {"person_email": email, "markdown": text} for email in doctor_emails})
+"""
+import asyncio
+import os
+import time
+import weakref
+
+import httpx
+
+from webex_integration import (
+    IDEMPOTENT_METHODS, PRIORITY_EMERGENCY, PRIORITY_ROUTINE, RETRY_STATUS_CODES, URGENT_ALERT_TYPES,
+    WEBEX_CONNECT_TIMEOUT, WEBEX_MAX_429_RETRIES, WEBEX_MAX_RETRIES, WEBEX_NOTIFY_TIMEOUT, WEBEX_POOL_MAXSIZE,
+    WEBEX_READ_TIMEOUT, WEBEX_RETRY_BACKOFF, MedicalWebexIntegration, WebexAPI, current_priority, endpoint_family,
+    parse_retry_after, request_priority, with_priority,
+)
+
+WEBEX_ASYNC_MAX_CONCURRENCY = int(os.environ.get("WEBEX_ASYNC_MAX_CONCURRENCY", 10))  # 이벤트 루프당 동시 Webex 요청 수
+WEBEX_ASYNC_LIMIT_POLL = 0.01  # 레이트 리밋 토큰 재확인 최소 간격 (초, 동기 요청이 대기 중일 때)
+
+_loop_clients = weakref.WeakKeyDictionary()
+_loop_semaphores = weakref.WeakKeyDictionary()
+
+
+def shared_async_client():
+    """현재 이벤트 루프에서 공유하는 httpx.AsyncClient (keep-alive 연결 재사용)"""
+    loop = asyncio.get_running_loop()
+    client = _loop_clients.get(loop)
+    if client is None or client.is_closed:
+        client = _loop_clients[loop] = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=WEBEX_POOL_MAXSIZE, max_keepalive_connections=WEBEX_POOL_MAXSIZE),
+            timeout=httpx.Timeout(WEBEX_READ_TIMEOUT, connect=WEBEX_CONNECT_TIMEOUT),
+            transport=httpx.AsyncHTTPTransport(retries=WEBEX_MAX_RETRIES),  # 연결 실패 재시도
+        )
+    return client
+
+
+def shared_semaphore():
+    """현재 이벤트 루프에서 공유하는 동시 요청 수 제한"""
+    loop = asyncio.get_running_loop()
+    semaphore = _loop_semaphores.get(loop)
+    if semaphore is None:
+        semaphore = _loop_semaphores[loop] = asyncio.Semaphore(WEBEX_ASYNC_MAX_CONCURRENCY)
+    return semaphore
+
+
+class AsyncWebexAPI(WebexAPI):
+    """
+    비동기 Webex API 클라이언트
+
+    WebexAPI의 메서드(send_message, create_meeting, create_instant_connect_session, add_member_to_room, ...)는
+    요청 데이터를 만든 뒤 _make_request 결과를 반환하므로, _make_request를 코루틴으로 바꾼 이 클래스에서는
+    같은 메서드를 그대로 await 할 수 있다.
+        await api.send_message(room_id=room_id, text="...")
+    목록 순회는 iter_pages / iter_items를 비동기 제너레이터로 바꿨으므로 iter_messages, iter_rooms 등도 async for로 사용.
+        async for room in api.iter_rooms(team_id=team_id): ...
+    동기 세션(requests)과 페이지 미리 받기 스레드는 사용하지 않는다.
+    """
+
+    def __init__(self, access_token=None, client_id=None, client_secret=None, client=None,
+                 timeout=(WEBEX_CONNECT_TIMEOUT, WEBEX_READ_TIMEOUT), rate_limiter=None, semaphore=None):
+        """
+        Args:
+            access_token: Webex API 액세스 토큰 (선택적)
+            client_id: OAuth 클라이언트 ID (선택적)
+            client_secret: OAuth 클라이언트 시크릿 (선택적)
+            client: 사용할 httpx.AsyncClient (선택적, 기본: 이벤트 루프 공유 클라이언트)
+            timeout: (연결, 응답) 타임아웃 초 (선택적)
+            rate_limiter: 요청 레이트 리미터 (선택적, 기본: 동기 클라이언트와 공유하는 리미터)
+            semaphore: 동시 요청 수 제한 (선택적, 기본: 이벤트 루프 공유 세마포어)
+        """
+        super().__init__(access_token, client_id, client_secret, timeout=timeout, rate_limiter=rate_limiter)
+        self.client = client
+        self.semaphore = semaphore
+        self.http_timeout = httpx.Timeout(timeout[1], connect=timeout[0])
+
+    def _default_session(self):
+        return None  # httpx 클라이언트만 사용 (동기 공유 세션을 만들지 않음)
+
+    async def _acquire(self, family, priority):
+        # 스레드를 점유하지 않고 다음 토큰 시각까지 asyncio.sleep 후 다시 시도
+        # (대기열에 들어가지 않으므로 wait_for 등으로 취소되어도 토큰을 가져가지 않음)
+        while not self.rate_limiter.try_acquire(family):
+            await asyncio.sleep(max(self.rate_limiter.delay(family), WEBEX_ASYNC_LIMIT_POLL))
+
+    async def _make_request(self, method, endpoint, data=None, params=None, files=None):
+        """
+        Webex API 요청 수행 (비동기)
+
+        Args:
+            method: HTTP 메서드 (GET, POST, PUT, DELETE)
+            endpoint: API 엔드포인트 경로
+            data: 요청 바디 데이터 (선택적)
+            params: 쿼리 파라미터 (선택적)
+            files: 파일 업로드 (선택적)
+
+        Returns:
+            response: API 응답 데이터
+        """
+        return await self._send_request(method, endpoint, data, params, files)
+
+    async def _send_request(self, method, endpoint, data=None, params=None, files=None, url=None, next_link=False):
+        """
+        레이트 리밋 + 429 / 5xx 재시도를 거쳐 실제 요청 전송 (WebexAPI._send_request와 같은 인자)
+
+        url을 주면 endpoint 대신 그 주소로 요청 (Link 헤더의 다음 페이지 주소, endpoint는 레이트 리밋 그룹용)
+        next_link=True면 (응답 데이터, 다음 페이지 주소 또는 None) 반환
+        """
+        if method not in ("GET", "POST", "PUT", "DELETE"):
+            raise ValueError(f"지원되지 않는 HTTP 메서드: {method}")
+        url = url or f"{self.base_url}/{endpoint}"
+        headers = self._get_headers()
+        if files:
+            # 파일 업로드 시 Content-Type 헤더 제거
+            headers.pop("Content-Type", None)
+            body = {"data": data, "files": files}
+        else:
+            body = {"json": data}
+        family = endpoint_family(endpoint)
+        priority = current_priority()
+        client = self.client or shared_async_client()
+        semaphore = self.semaphore or shared_semaphore()
+        retries = throttled = 0
+
+        try:
+            while True:
+                await self._acquire(family, priority)
+                async with semaphore:
+                    try:
+                        response = await client.request(method, url, headers=headers, params=params,
+                                                        timeout=self.http_timeout, **body)
+                    except (httpx.ReadError, httpx.RemoteProtocolError):
+                        # 응답 수신 중 연결 끊김: 같은 결과가 보장되는 메서드만 재시도
+                        if method not in IDEMPOTENT_METHODS or retries >= WEBEX_MAX_RETRIES:
+                            raise
+                        response = None
+                if response is not None and response.status_code == 429:
+                    # 마지막 시도여도 그룹을 멈춰서 다음 요청이 Retry-After 전에 나가지 않도록 함
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                    self.rate_limiter.block(family, retry_after)
+                    if throttled >= WEBEX_MAX_429_RETRIES:
+                        break
+                    throttled += 1
+                    print(f"Webex 요청 제한(429): {family} {retry_after:.1f}초 대기 후 재시도 ({throttled}/{WEBEX_MAX_429_RETRIES})")
+                    continue
+                if response is None or (response.status_code in RETRY_STATUS_CODES and
+                                        method in IDEMPOTENT_METHODS and retries < WEBEX_MAX_RETRIES):
+                    await asyncio.sleep(WEBEX_RETRY_BACKOFF * (2 ** retries))
+                    retries += 1
+                    continue
+                break
+
+            response.raise_for_status()
+
+            if response.status_code == 204:  # No Content
+                return {"status": "success"}
+
+            if next_link:
+                return response.json(), response.links.get("next", {}).get("url")
+            return response.json()
+
+        except httpx.HTTPError as e:
+            print(f"API 요청 오류: {e}")
+            if isinstance(e, httpx.HTTPStatusError):
+                print(f"응답 상태 코드: {e.response.status_code}")
+                print(f"응답 내용: {e.response.text}")
+            raise
+
+    async def iter_pages(self, endpoint, params=None, prefetch=False):
+        """
+        목록 엔드포인트를 페이지 단위로 비동기 순회 (Link: rel="next"를 따라 필요할 때만 다음 페이지 요청)
+
+        Args:
+            endpoint: 목록 엔드포인트 (messages, memberships, rooms, meetings 등)
+            params: 첫 페이지 쿼리 파라미터 (다음 페이지는 Link 주소에 포함됨)
+            prefetch: True면 현재 페이지를 처리하는 동안 다음 페이지를 태스크로 받음
+
+        Yields:
+            items: 페이지의 항목 리스트
+        """
+        def fetch(url):
+            return self._send_request("GET", endpoint, params=None if url else params, url=url, next_link=True)
+
+        pending = None
+        try:
+            body, next_url = await fetch(None)
+            while True:
+                if prefetch and next_url:
+                    pending = asyncio.ensure_future(fetch(next_url))  # 태스크는 현재 컨텍스트(우선순위)를 복사
+                yield body.get("items", [])
+                if not next_url:
+                    return
+                if pending is not None:
+                    body, next_url = await pending
+                    pending = None
+                else:
+                    body, next_url = await fetch(next_url)
+        finally:
+            if pending is not None:
+                pending.cancel()  # 순회를 중간에 멈추면 받지 않은 다음 페이지는 버림
+
+    async def iter_items(self, endpoint, params=None, prefetch=False):
+        """목록 엔드포인트의 항목을 하나씩 비동기 순회 (iter_pages 참고)"""
+        async for items in self.iter_pages(endpoint, params, prefetch):
+            for item in items:
+                yield item
+
+
+class AsyncMedicalWebexIntegration(MedicalWebexIntegration):
+    """
+    MedicalWebexIntegration의 비동기 버전 (AsyncWebexAPI 사용)
+
+    메시지 내용은 MedicalWebexIntegration과 같고, 여러 건의 전송은 asyncio.gather로 동시에 처리한다.
+    """
+
+    async def setup_emergency_team(self, team_name="의료 긴급 대응팀", description="1형 당뇨 환자 긴급 대응을 위한 의료진 팀"):
+        if self.emergency_team_id and self.emergency_room_id:
+            return {"id": self.emergency_team_id}
+        team_info = await self.webex_api.create_team(team_name, description)
+        self.emergency_team_id = team_info["id"]
+
+        # 긴급 대응 룸 생성
+        room_info = await self.webex_api.create_room("긴급 대응 공간", self.emergency_team_id)
+        self.emergency_room_id = room_info["id"]
+
+        return team_info
+
+    @with_priority(PRIORITY_ROUTINE)
+    async def add_healthcare_provider(self, email, name=None, role=None):
+        if not self.emergency_room_id:
+            raise ValueError("긴급 대응 팀이 설정되지 않았습니다. setup_emergency_team()을 먼저 호출하세요.")
+
+        membership_info = await self.webex_api.add_member_to_room(self.emergency_room_id, person_email=email)
+        await self.webex_api.send_message(room_id=self.emergency_room_id, text=self.welcome_message(name, role))
+        return membership_info
+
+    @with_priority(PRIORITY_EMERGENCY)
+    async def create_emergency_session(self, patient_email, patient_name, glucose_value, prediction, doctor_email=None):
+        """긴급 원격 진료 세션 생성 후 대응 룸 / 담당 의사에게 동시에 알림 (결과는 동기 버전과 같은 형식)"""
+        subject = f"긴급 원격 진료: {patient_name} - 혈당 {glucose_value}mg/dL (예측: {prediction}mg/dL)"
+        session_info = await self.webex_api.create_instant_connect_session(
+            destination_type="email",
+            destination_address=patient_email,
+            subject=subject
+        )
+        messages = self.emergency_messages(patient_name, glucose_value, prediction,
+                                           session_info.get('joinUrl', '링크 없음'), doctor_email)
+        session_info["notifications"] = await self.send_notifications(messages)
+        return session_info
+
+    async def send_notifications(self, messages, timeout=WEBEX_NOTIFY_TIMEOUT):
+        """
+        메시지 여러 건을 동시에 전송하고 건별 결과 반환 (일부 실패해도 예외를 던지지 않음)
+
+        Args:
+            messages: {이름: send_message 인자}
+            timeout: 메시지 1건당 대기 한도 (초)
+
+        Returns:
+            results: {이름: {"status": "sent" | "failed" | "timeout", "message_id" | "error", "elapsed_ms"}}
+        """
+        priority = current_priority()
+        started = time.perf_counter()
+        # 보관함 기록은 로컬 SQLite 쓰기라 이벤트 루프에서 바로 처리
+        outbox_ids = {name: self.outbox.enqueue(kwargs, priority, claim=True, account=self.account)
+                      for name, kwargs in messages.items()} if self.outbox else {}
+
+        async def send(name, kwargs):
+            try:
+                with request_priority(priority):
+                    message = await asyncio.wait_for(self.webex_api.send_message(**kwargs), timeout)
+            except BaseException as e:
+                if name in outbox_ids:
+                    self.outbox.mark_failed([outbox_ids[name]], e if str(e) else "시간 초과")
+                raise
+            if name in outbox_ids:
+                self.outbox.mark_sent([outbox_ids[name]], message.get("id"))
+            return {"status": "sent", "message_id": message.get("id"),
+                    "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)}
+
+        outcomes = await asyncio.gather(*(send(name, kwargs) for name, kwargs in messages.items()),
+                                        return_exceptions=True)
+        results = {}
+        for name, outcome in zip(messages, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                results[name] = {"status": "timeout", "error": f"{timeout}초 내 응답 없음"}
+            elif isinstance(outcome, BaseException):
+                results[name] = {"status": "failed", "error": str(outcome)}
+            else:
+                results[name] = outcome
+            if name in outbox_ids:
+                results[name]["outbox_id"] = outbox_ids[name]
+        failed = [name for name, result in results.items() if result["status"] != "sent"]
+        if failed:
+            print(f"알림 일부 전송 실패: {failed} ({ {name: results[name] for name in failed} })")
+        return results
+
+    @with_priority(PRIORITY_ROUTINE)
+    async def send_glucose_alert(self, patient_email, patient_name, glucose_value, prediction,
+                                 alert_type="warning", recommendation=None):
+        """혈당 알림 전송 (보관함 사용 시 기록만 하고 반환, 결과 형식은 동기 버전과 같음)"""
+        messages = self.glucose_alert_messages(patient_email, patient_name, glucose_value, prediction,
+                                               alert_type, recommendation)
+        if self.outbox:
+            digest = alert_type not in URGENT_ALERT_TYPES
+            priority = current_priority()
+            return {name: {"status": "queued",
+                           "outbox_id": self.outbox.enqueue(kwargs, priority, digest, account=self.account)}
+                    for name, kwargs in messages.items()}
+        sent = await asyncio.gather(*(self.webex_api.send_message(**kwargs) for kwargs in messages.values()))
+        return dict(zip(messages, sent))
+
+    async def schedule_regular_checkup(self, patient_email, patient_name, doctor_email, doctor_name,
+                                       start_time, duration_minutes=30, notes=None):
+        return await self.webex_api.create_meeting(**self.checkup_meeting(
+            patient_email, patient_name, doctor_email, doctor_name, start_time, duration_minutes, notes))
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+"""
+Webex 긴급 연결 흐름(create_emergency_session) 지연 시간 벤치마크
+
+실제 webexapis.com 대신 로컬 대체 서버를 띄우고, 네트워크 왕복 시간(RTT)과
+새 연결마다 드는 TCP+TLS 핸드셰이크 비용을 지연으로 흉내 낸다.
+- per-call: 호출마다 새 연결 (기존 requests.get/post 방식)
+- pooled:   공유 keep-alive 세션 (WebexAPI 기본값)
+세션 생성 후 대응 룸 / 담당 의사 메시지는 동시에 전송되므로 흐름 지연은 약 2 RTT (+ 새 연결 비용)
+
+    python webex_benchmark.py --rtt 40 --flows 30
+
+--recipients N: 의사/환자 N명에게 메시지 1건씩 보내는 알림 전파 지연 (동기 순차 vs AsyncWebexAPI 동시 전송)
+    python webex_benchmark.py --rtt 40 --recipients 50
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from webex_async import AsyncMedicalWebexIntegration, AsyncWebexAPI
+from webex_integration import WebexAPI, MedicalWebexIntegration, RateLimiter, build_session
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def start_stand_in_server(rtt, handshake_rtts=2):
+    """
+    Webex API 대체 서버 시작 (백그라운드 스레드)
+
+    새 연결마다 handshake_rtts x rtt (TCP 1 + TLS 1.3 1 왕복), 요청마다 rtt 만큼 지연.
+    Returns:
+        (server, 연결 수 카운터 dict)
+    """
+    stats = {"connections": 0, "requests": 0}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive 허용
+        disable_nagle_algorithm = True  # 헤더/본문 분할 전송 시 지연 ACK 대기 방지 (실제 서버와 동일)
+
+        def setup(self):
+            super().setup()
+            with lock:
+                stats["connections"] += 1
+            time.sleep(handshake_rtts * rtt)
+
+        def log_message(self, format, *args):
+            pass
+
+        def respond(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            with lock:
+                stats["requests"] += 1
+            time.sleep(rtt)
+            body = json.dumps({"id": uuid.uuid4().hex, "joinUrl": "https://instant.webex.com/visit/stand-in"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PUT = do_DELETE = respond
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats
+
+
+def run_emergency_flows(base_url, session, flows):
+    """긴급 연결 흐름(세션 생성 + 대응 룸 알림 + 담당 의사 메시지, API 3회)을 flows번 실행한 지연 시간 목록"""
+    latencies = []
+    rate_limiter = RateLimiter(rate=10000, burst=10000)  # 네트워크 지연만 측정 (클라이언트 레이트 리밋 제외)
+    for i in range(flows):
+        # 요청마다 클라이언트를 새로 만드는 app.py와 동일
+        api = WebexAPI(access_token="benchmark", session=session, rate_limiter=rate_limiter)
+        api.base_url = base_url
+        medical = MedicalWebexIntegration(api)
+        medical.emergency_room_id = "emergency-room"
+        started = time.perf_counter()
+        medical.create_emergency_session("patient@example.com", f"환자{i}", 55, 48, doctor_email="doctor@example.com")
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def summarize(name, latencies, connections):
+    ordered = sorted(latencies)
+    return {
+        "mode": name,
+        "flows": len(ordered),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 1),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 1),
+        "p95_ms": round(percentile(ordered, 95) * 1000, 1),
+        "connections": connections,
+    }
+
+
+def run_benchmark(rtt_ms=40, flows=30):
+    rtt = rtt_ms / 1000
+    results = []
+    # requests 모듈 자체를 세션으로 넘기면 requests.request()가 호출마다 새 연결을 연다 (기존 방식)
+    for name, session in (("per-call", requests), ("pooled", build_session())):
+        server, stats = start_stand_in_server(rtt)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        try:
+            latencies = run_emergency_flows(base_url, session, flows)
+        finally:
+            server.shutdown()
+        results.append(summarize(name, latencies, stats["connections"]))
+    return results
+
+
+def run_fanout_benchmark(rtt_ms=40, recipients=50):
+    """recipients명에게 메시지 1건씩 전송: 동기 클라이언트 순차 전송 vs 비동기 클라이언트 동시 전송"""
+    rtt = rtt_ms / 1000
+    messages = {f"user{i}@example.com": {"person_email": f"user{i}@example.com", "markdown": "혈당 알림"}
+                for i in range(recipients)}
+    results = []
+
+    server, stats = start_stand_in_server(rtt)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        api = WebexAPI(access_token="benchmark", session=build_session(),
+                       rate_limiter=RateLimiter(rate=10000, burst=10000))
+        api.base_url = base_url
+        started = time.perf_counter()
+        for kwargs in messages.values():
+            api.send_message(**kwargs)
+        results.append({"mode": "sync-serial", "recipients": recipients,
+                        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+                        "connections": stats["connections"]})
+    finally:
+        server.shutdown()
+
+    async def send_all():
+        api = AsyncWebexAPI(access_token="benchmark", rate_limiter=RateLimiter(rate=10000, burst=10000))
+        api.base_url = base_url
+        started = time.perf_counter()
+        sent = await AsyncMedicalWebexIntegration(api).send_notifications(messages)
+        return time.perf_counter() - started, sum(r["status"] == "sent" for r in sent.values())
+
+    server, stats = start_stand_in_server(rtt)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+    try:
+        elapsed, sent = asyncio.run(send_all())
+        results.append({"mode": "async-gather", "recipients": recipients, "sent": sent,
+                        "total_ms": round(elapsed * 1000, 1), "connections": stats["connections"]})
+    finally:
+        server.shutdown()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Webex 긴급 연결 흐름 지연 시간 벤치마크 (로컬 대체 서버)")
+    parser.add_argument("--rtt", type=float, default=40, help="왕복 시간 (ms)")
+    parser.add_argument("--flows", type=int, default=30, help="긴급 연결 흐름 실행 횟수")
+    parser.add_argument("--recipients", type=int, default=0, help="알림 전파 벤치마크 수신자 수 (0이면 생략)")
+    args = parser.parse_args()
+
+    if args.recipients:
+        print(f"RTT {args.rtt}ms, 수신자 {args.recipients}명 알림 전파")
+        for result in run_fanout_benchmark(args.rtt, args.recipients):
+            print(result)
+        raise SystemExit
+
+    print(f"RTT {args.rtt}ms, 흐름당 API 3회, 새 연결마다 핸드셰이크 2 RTT")
+    for result in run_benchmark(args.rtt, args.flows):
+        print(result)
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+긴급 대응 팀 / 룸 준비 (계정당 한 번, Firestore에 기록)
+
+Webex 계정(서비스 토큰 또는 의사별 토큰)마다 긴급 대응 팀과 룸을 한 번만 만들고
+ID를 webex_resources/{account}에 저장한다. 프로세스 안에서는 메모리에 보관하므로
+긴급 연결 요청은 룸을 다시 만들거나 찾지 않는다.
+- 여러 프로세스 / 서버가 동시에 준비해도 잠금 문서(create)로 한 곳에서만 생성
+- 팀 생성 후 룸 생성 전에 종료되어도 다음 실행에서 기록된 팀을 이어서 사용
+  (ID를 기록하기 전에 종료된 경우에는 같은 이름의 팀 / 룸을 찾아서 사용)
+
+    team = ensure_emergency_team(webex_api, account=user_id)
+    medical_webex = MedicalWebexIntegration(webex_api, team=team)
+"""
+import os
+import socket
+import time
+
+from google.api_core import exceptions as google_exceptions
+
+from firebase_client import db
+from singleflight import SingleFlight
+
+WEBEX_RESOURCES_COLLECTION = "webex_resources"
+EMERGENCY_TEAM_NAME = "의료 긴급 대응팀"
+EMERGENCY_TEAM_DESCRIPTION = "1형 당뇨 환자 긴급 대응을 위한 의료진 팀"
+EMERGENCY_ROOM_TITLE = "긴급 대응 공간"
+BOOTSTRAP_LEASE_SECONDS = 60  # 준비 중인 프로세스가 이보다 오래 잠금을 잡고 있으면 종료된 것으로 보고 다시 시도
+BOOTSTRAP_WAIT_SECONDS = float(os.environ.get("WEBEX_BOOTSTRAP_WAIT", 30))  # 다른 프로세스의 준비 완료를 기다리는 최대 시간
+BOOTSTRAP_POLL_INTERVAL = 0.5
+
+_teams = {}  # {account: {"team_id", "room_id"}}
+_bootstrap = SingleFlight()  # 계정별 준비는 프로세스 안에서 1건만 진행
+_owner = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def cached_emergency_team(account):
+    """메모리에 있는 긴급 대응 팀 / 룸 ID (없으면 None, Firestore / Webex 조회 없음)"""
+    return _teams.get(account)
+
+
+def forget_emergency_team(account, delete_record=False):
+    """메모리 캐시 삭제 (delete_record=True면 Firestore 기록도 삭제하여 다음 준비 시 새로 생성)"""
+    _teams.pop(account, None)
+    if delete_record and db:
+        db.collection(WEBEX_RESOURCES_COLLECTION).document(account).delete()
+
+
+def find_team(webex_api, name):
+    for team in webex_api.iter_items("teams", {"max": 100}):
+        if team.get("name") == name:
+            return team["id"]
+    return None
+
+
+def find_room(webex_api, team_id, title):
+    for room in webex_api.iter_rooms(team_id=team_id):
+        if room.get("title") == title:
+            return room["id"]
+    return None
+
+
+def _read_record(account):
+    if not db:
+        return None
+    snap = db.collection(WEBEX_RESOURCES_COLLECTION).document(account).get()
+    data = snap.to_dict() if snap.exists else None
+    if data and data.get("emergency_room_id"):
+        return {"team_id": data.get("emergency_team_id"), "room_id": data["emergency_room_id"]}
+    return None
+
+
+def _create(webex_api, account, team_name, description, room_title):
+    """팀 / 룸 생성 (기록된 팀 ID, 같은 이름의 기존 팀 / 룸이 있으면 재사용). 단계마다 Firestore에 기록"""
+    ref = db.collection(WEBEX_RESOURCES_COLLECTION).document(account) if db else None
+    snap = ref.get() if ref else None
+    data = (snap.to_dict() if snap is not None and snap.exists else None) or {}
+    if data.get("emergency_room_id"):
+        return {"team_id": data.get("emergency_team_id"), "room_id": data["emergency_room_id"]}
+
+    team_id = data.get("emergency_team_id") or find_team(webex_api, team_name)
+    if not team_id:
+        team_id = webex_api.create_team(team_name, description)["id"]
+        print(f"[webex_bootstrap] 긴급 대응 팀 생성: 계정={account}, 팀={team_id}")
+    if ref:
+        ref.set({"emergency_team_id": team_id, "team_name": team_name}, merge=True)
+
+    room_id = find_room(webex_api, team_id, room_title)
+    if not room_id:
+        room_id = webex_api.create_room(room_title, team_id)["id"]
+        print(f"[webex_bootstrap] 긴급 대응 룸 생성: 계정={account}, 룸={room_id}")
+    if ref:
+        ref.set({"emergency_room_id": room_id, "room_title": room_title, "created_by": _owner,
+                 "updated_at": time.time()}, merge=True)
+    return {"team_id": team_id, "room_id": room_id}
+
+
+def _bootstrap_account(webex_api, account, team_name, description, room_title):
+    record = _read_record(account)
+    if record or not db:
+        return record or _create(webex_api, account, team_name, description, room_title)
+
+    lock_ref = db.collection(WEBEX_RESOURCES_COLLECTION).document(f"{account}.lock")
+    deadline = time.monotonic() + BOOTSTRAP_WAIT_SECONDS
+    while True:
+        try:
+            lock_ref.create({"owner": _owner, "claimed_at": time.time()})
+        except google_exceptions.AlreadyExists:
+            # 다른 프로세스가 준비 중: 완료되면 기록을 사용, 잠금이 오래되면 제거 후 다시 시도
+            record = _read_record(account)
+            if record:
+                return record
+            lock = lock_ref.get()
+            claimed_at = (lock.to_dict() or {}).get("claimed_at", 0) if lock.exists else 0
+            if time.time() - claimed_at > BOOTSTRAP_LEASE_SECONDS:
+                print(f"[webex_bootstrap] 오래된 준비 잠금 제거: 계정={account}")
+                lock_ref.delete()
+                continue
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"긴급 대응 팀 준비 대기 시간 초과: 계정={account}")
+            time.sleep(BOOTSTRAP_POLL_INTERVAL)
+            continue
+        try:
+            return _create(webex_api, account, team_name, description, room_title)
+        finally:
+            lock_ref.delete()
+
+
+def ensure_emergency_team(webex_api, account="service", team_name=EMERGENCY_TEAM_NAME,
+                          description=EMERGENCY_TEAM_DESCRIPTION, room_title=EMERGENCY_ROOM_TITLE):
+    """
+    계정의 긴급 대응 팀 / 룸 ID 반환 (메모리 -> Firestore 기록 -> 생성 순, 여러 번 호출해도 한 번만 생성)
+
+    Args:
+        webex_api: 팀 / 룸을 소유할 계정의 WebexAPI
+        account: 기록 키 (서비스 토큰은 "service", 의사별 토큰은 사용자 ID)
+
+    Returns:
+        {"team_id", "room_id"}
+    """
+    team = _teams.get(account)
+    if team is not None:
+        return team
+
+    def load():
+        team = _bootstrap_account(webex_api, account, team_name, description, room_title)
+        _teams[account] = team
+        return team
+    return _bootstrap.do(account, load)
@@ -1,9 +1,260 @@
 import requests
+import asyncio
+import contextvars
+import copy
+import functools
+import heapq
+import itertools
 import json
 import os
-from datetime import datetime
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait as wait_futures
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from email.utils import parsedate_to_datetime
 import time
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from singleflight import SingleFlight
+
+WEBEX_API_BASE_URL = os.environ.get("WEBEX_API_BASE_URL", "https://webexapis.com/v1")  # 테스트 시 로컬 대체 서버 지정
+WEBEX_POOL_MAXSIZE = int(os.environ.get("WEBEX_POOL_MAXSIZE", 20))  # 호스트당 유지할 keep-alive 연결 수
+WEBEX_CONNECT_TIMEOUT = float(os.environ.get("WEBEX_CONNECT_TIMEOUT", 3.05))  # 연결 타임아웃 (초)
+WEBEX_READ_TIMEOUT = float(os.environ.get("WEBEX_READ_TIMEOUT", 10))  # 응답 대기 타임아웃 (초)
+WEBEX_MAX_RETRIES = int(os.environ.get("WEBEX_MAX_RETRIES", 3))  # 일시적 오류 재시도 횟수
+WEBEX_RETRY_BACKOFF = float(os.environ.get("WEBEX_RETRY_BACKOFF", 0.3))  # 재시도 대기: 0.3s, 0.6s, 1.2s ...
+RETRY_STATUS_CODES = (500, 502, 503, 504)
+# 응답 오류(5xx, 읽기 중 연결 끊김)는 여러 번 보내도 결과가 같은 메서드만 재시도
+# (POST는 요청이 서버에 도달하기 전의 연결 실패만 재시도)
+IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+
+WEBEX_RATE_LIMIT_PER_SEC = float(os.environ.get("WEBEX_RATE_LIMIT_PER_SEC", 5))  # 엔드포인트 그룹별 초당 요청 수
+WEBEX_RATE_LIMIT_BURST = int(os.environ.get("WEBEX_RATE_LIMIT_BURST", 10))  # 엔드포인트 그룹별 순간 허용 요청 수
+WEBEX_MAX_429_RETRIES = int(os.environ.get("WEBEX_MAX_429_RETRIES", 3))  # 429 응답 후 재시도 횟수
+DEFAULT_RETRY_AFTER = 2.0  # 429 응답에 Retry-After가 없을 때 대기 시간 (초)
+WEBEX_NOTIFY_TIMEOUT = float(os.environ.get("WEBEX_NOTIFY_TIMEOUT", 5))  # 긴급 알림 메시지 1건당 대기 한도 (초)
+WEBEX_NOTIFY_WORKERS = int(os.environ.get("WEBEX_NOTIFY_WORKERS", 8))  # 긴급 알림 동시 전송 스레드 수
+
+# 조회 응답 캐시 (response_cache=True인 클라이언트만): 엔드포인트 그룹별 재사용 시간 (초, 없는 그룹은 캐시하지 않음)
+WEBEX_GET_CACHE_TTLS = {
+    "people": float(os.environ.get("WEBEX_PEOPLE_CACHE_TTL", 300)),  # people/me 등 사용자 정보
+    "meetings": float(os.environ.get("WEBEX_MEETING_CACHE_TTL", 30)),  # 미팅 정보
+    "instantconnect": float(os.environ.get("WEBEX_SESSION_CACHE_TTL", 10)),  # Instant Connect 세션 상태
+}
+WEBEX_GET_CACHE_MAX_ENTRIES = 256  # 클라이언트별 보관할 조회 응답 수
+WEBEX_PAGE_SIZE = int(os.environ.get("WEBEX_PAGE_SIZE", 100))  # 목록 조회 페이지당 항목 수
+WEBEX_PAGE_PREFETCH_WORKERS = int(os.environ.get("WEBEX_PAGE_PREFETCH_WORKERS", 4))  # 다음 페이지 미리 받기 스레드 수
+
+GLUCOSE_ALERT_LABELS = {"info": "ℹ️ 혈당 안내", "warning": "⚠️ 혈당 주의", "danger": "🚨 혈당 위험"}
+URGENT_ALERT_TYPES = ("danger",)  # 묶음 전송하지 않고 바로 보내는 알림 수준
+
+# 요청 우선순위 (작을수록 먼저). 같은 엔드포인트 그룹에서 대기 중이면 우선순위가 높은 요청부터 토큰을 받는다.
+PRIORITY_EMERGENCY = 0  # 긴급 원격 진료 세션
+PRIORITY_NORMAL = 1
+PRIORITY_ROUTINE = 2  # 혈당 알림, 의료진 환영 메시지 등
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+_shared_rate_limiter = None
+_request_priority = contextvars.ContextVar("webex_request_priority", default=PRIORITY_NORMAL)  # 스레드 / asyncio 태스크별
+
+# 긴급 세션 생성 후 대응 룸 / 담당 의사 메시지 동시 전송
+notification_executor = ThreadPoolExecutor(max_workers=WEBEX_NOTIFY_WORKERS, thread_name_prefix="webex-notify")
+# 목록 조회 시 다음 페이지 미리 받기 (알림 전송 스레드와 분리)
+page_executor = ThreadPoolExecutor(max_workers=WEBEX_PAGE_PREFETCH_WORKERS, thread_name_prefix="webex-page")
+
+
+class WebexRetry(Retry):
+    """urllib3 재시도에서 429 제외 (Retry-After가 있어도). 429는 _send_request가 엔드포인트 그룹 전체를 멈춘 뒤 재시도"""
+
+    def is_retry(self, method, status_code, has_retry_after=False):
+        if status_code == 429:
+            return False
+        return super().is_retry(method, status_code, has_retry_after)
+
+
+def build_session(pool_maxsize=WEBEX_POOL_MAXSIZE, max_retries=WEBEX_MAX_RETRIES, backoff_factor=WEBEX_RETRY_BACKOFF):
+    """
+    연결 풀 + 재시도 설정이 적용된 requests 세션 생성
+
+    같은 세션을 쓰는 요청은 webexapis.com과의 TCP/TLS 연결을 재사용한다.
+    """
+    retry = WebexRetry(
+        total=max_retries,
+        connect=max_retries,
+        read=max_retries,
+        status=max_retries,
+        backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUS_CODES,
+        allowed_methods=IDEMPOTENT_METHODS,
+        respect_retry_after_header=True,
+        raise_on_status=False,  # 재시도 후에도 실패하면 마지막 응답을 그대로 반환 (raise_for_status에서 처리)
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def shared_session():
+    """프로세스 전체에서 공유하는 Webex API 세션 (요청마다 WebexAPI를 새로 만들어도 연결은 재사용)"""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = build_session()
+    return _shared_session
+
+
+def endpoint_family(endpoint):
+    """레이트 리밋 단위: 엔드포인트 첫 경로 (messages, instantconnect, memberships, ...)"""
+    return endpoint.split("?", 1)[0].split("/", 1)[0]
+
+
+def current_priority():
+    return _request_priority.get()
+
+
+@contextmanager
+def request_priority(priority):
+    """이 블록 안에서 현재 스레드(또는 asyncio 태스크)가 보내는 Webex 요청의 우선순위 지정"""
+    token = _request_priority.set(priority)
+    try:
+        yield
+    finally:
+        _request_priority.reset(token)
+
+
+def with_priority(priority):
+    """메서드 안의 Webex 요청 전체에 우선순위를 지정하는 데코레이터 (async 메서드 포함)"""
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with request_priority(priority):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with request_priority(priority):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def parse_retry_after(value, default=DEFAULT_RETRY_AFTER):
+    """Retry-After 헤더(초 또는 HTTP 날짜) -> 대기 초"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return default
+
+
+class RateLimiter:
+    """
+    엔드포인트 그룹별 토큰 버킷 + 우선순위 대기열
+
+    - 그룹마다 초당 rate개, 최대 burst개의 토큰
+    - 대기 중인 요청은 (우선순위, 도착 순서) 순으로 토큰을 받음
+    - 429 응답을 받으면 block()으로 Retry-After 동안 해당 그룹 전체를 멈춤
+    """
+
+    def __init__(self, rate=WEBEX_RATE_LIMIT_PER_SEC, burst=WEBEX_RATE_LIMIT_BURST, limits=None):
+        self.default_limit = (rate, burst)
+        self.limits = limits or {}  # {그룹: (rate, burst)}
+        self._cond = threading.Condition()
+        self._buckets = {}  # {그룹: [토큰 수, 마지막 충전 시각]}
+        self._blocked_until = {}
+        self._queues = {}  # {그룹: [(우선순위, 순번), ...] 힙}
+        self._sequence = itertools.count()
+
+    def _refill(self, family, now):
+        rate, burst = self.limits.get(family, self.default_limit)
+        bucket = self._buckets.setdefault(family, [float(burst), now])
+        if now > bucket[1]:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+        return bucket, rate
+
+    def acquire(self, family, priority=PRIORITY_NORMAL):
+        """토큰 1개를 받을 때까지 대기. 대기한 시간(초) 반환"""
+        started = time.monotonic()
+        with self._cond:
+            entry = (priority, next(self._sequence))
+            queue = self._queues.setdefault(family, [])
+            heapq.heappush(queue, entry)
+            try:
+                while True:
+                    now = time.monotonic()
+                    wait = self._blocked_until.get(family, 0) - now
+                    if wait <= 0:
+                        if queue[0] != entry:
+                            wait = None  # 앞선 요청이 토큰을 받으면 notify
+                        else:
+                            bucket, rate = self._refill(family, now)
+                            if bucket[0] >= 1:
+                                bucket[0] -= 1
+                                return now - started
+                            wait = (1 - bucket[0]) / rate
+                    self._cond.wait(wait)
+            finally:
+                queue.remove(entry)
+                heapq.heapify(queue)
+                self._cond.notify_all()
+
+    def try_acquire(self, family):
+        """대기 중인 요청이 없고 토큰이 있으면 즉시 1개를 받고 True (대기하지 않음)"""
+        with self._cond:
+            now = time.monotonic()
+            if self._queues.get(family) or self._blocked_until.get(family, 0) > now:
+                return False
+            bucket, _ = self._refill(family, now)
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True
+            return False
+
+    def delay(self, family):
+        """다음 토큰을 받을 수 있을 때까지의 예상 시간 (초, 차단 중이면 남은 차단 시간)"""
+        with self._cond:
+            now = time.monotonic()
+            blocked = self._blocked_until.get(family, 0) - now
+            if blocked > 0:
+                return blocked
+            bucket, rate = self._refill(family, now)
+            return max(0.0, (1 - bucket[0]) / rate)
+
+    def block(self, family, seconds):
+        """429 응답: seconds 동안 그룹의 모든 요청 중단, 이후 토큰 1개부터 다시 충전"""
+        with self._cond:
+            now = time.monotonic()
+            self._blocked_until[family] = max(self._blocked_until.get(family, 0), now + seconds)
+            bucket, _ = self._refill(family, now)
+            bucket[0] = 0.0
+            bucket[1] = self._blocked_until[family]
+            self._cond.notify_all()
+
+
+def shared_rate_limiter():
+    """프로세스 전체에서 공유하는 레이트 리미터 (여러 WebexAPI 인스턴스의 요청을 함께 제한)"""
+    global _shared_rate_limiter
+    if _shared_rate_limiter is None:
+        with _shared_session_lock:
+            if _shared_rate_limiter is None:
+                _shared_rate_limiter = RateLimiter()
+    return _shared_rate_limiter
+
+
 class WebexAPI:
     """
     Cisco Webex API 통합 클래스
@@ -16,7 +267,9 @@ class WebexAPI:
     - 팀 및 공간 관리
     """
     
-    def __init__(self, access_token=None, client_id=None, client_secret=None):
+    def __init__(self, access_token=None, client_id=None, client_secret=None, session=None,
+                 timeout=(WEBEX_CONNECT_TIMEOUT, WEBEX_READ_TIMEOUT), rate_limiter=None,
+                 response_cache=False, cache_ttls=None):
         """
         Webex API 클라이언트 초기화
         
@@ -24,17 +277,32 @@ class WebexAPI:
             access_token: Webex API 액세스 토큰 (선택적)
             client_id: OAuth 클라이언트 ID (선택적)
             client_secret: OAuth 클라이언트 시크릿 (선택적)
+            session: 요청에 사용할 세션 (선택적, 기본: 프로세스 공유 세션)
+            timeout: (연결, 응답) 타임아웃 초 (선택적)
+            rate_limiter: 요청 레이트 리미터 (선택적, 기본: 프로세스 공유 리미터)
+            response_cache: True면 GET 응답을 엔드포인트 그룹별 TTL 동안 재사용 (선택적)
+                같은 클라이언트로 POST/PUT/DELETE를 보내면 해당 그룹의 캐시를 비운다.
+            cache_ttls: {엔드포인트 그룹: 초} (선택적, 기본: WEBEX_GET_CACHE_TTLS)
         """
-        self.base_url = "https://webexapis.com/v1"
+        self.base_url = WEBEX_API_BASE_URL
+        self.session = session or self._default_session()
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter or shared_rate_limiter()
         self.access_token = access_token
         self.client_id = client_id
         self.client_secret = client_secret
         self.token_expiry = None
+        self.cache_ttls = WEBEX_GET_CACHE_TTLS if cache_ttls is None else cache_ttls
+        self.response_cache = SingleFlight(max_entries=WEBEX_GET_CACHE_MAX_ENTRIES) if response_cache else None
         
         # 환경 변수에서 토큰 로드 (개발 환경용)
         if not self.access_token and "WEBEX_ACCESS_TOKEN" in os.environ:
             self.access_token = os.environ["WEBEX_ACCESS_TOKEN"]
     
+    def _default_session(self):
+        """session을 지정하지 않았을 때 사용할 세션 (프로세스 공유 세션)"""
+        return shared_session()
+    
     def _get_headers(self):
         """
         API 요청에 필요한 헤더 생성
@@ -54,6 +322,10 @@ class WebexAPI:
         """
         Webex API 요청 수행
         
+        엔드포인트 그룹별 레이트 리밋을 거쳐 전송하고(현재 스레드의 request_priority 순서),
+        429 응답은 Retry-After 동안 그룹 전체를 멈춘 뒤 다시 시도한다.
+        응답 캐시를 켠 클라이언트는 GET 응답을 재사용하고, 변경 요청 후에는 같은 그룹의 캐시를 비운다.
+        
         Args:
             method: HTTP 메서드 (GET, POST, PUT, DELETE)
             endpoint: API 엔드포인트 경로
@@ -64,31 +336,66 @@ class WebexAPI:
         Returns:
             response: API 응답 데이터
         """
-        url = f"{self.base_url}/{endpoint}"
+        if self.response_cache is None:
+            return self._send_request(method, endpoint, data, params, files)
+        family = endpoint_family(endpoint)
+        if method != "GET":
+            try:
+                return self._send_request(method, endpoint, data, params, files)
+            finally:
+                # 실패해도 서버 상태가 바뀌었을 수 있으므로 비움
+                self.response_cache.forget_if(lambda key: key[0] == family)
+        ttl = self.cache_ttls.get(family, 0)
+        if ttl <= 0:
+            return self._send_request(method, endpoint, data, params, files)
+        key = (family, endpoint, tuple(sorted((params or {}).items())))
+        result = self.response_cache.do(key, lambda: self._send_request(method, endpoint, data, params, files), ttl=ttl)
+        return copy.deepcopy(result)  # 호출한 쪽이 수정해도 캐시된 응답은 그대로
+    
+    def _send_request(self, method, endpoint, data=None, params=None, files=None, url=None, next_link=False):
+        """
+        레이트 리밋 + 429 재시도를 거쳐 실제 요청 전송 (_make_request 참고)
+        
+        url을 주면 endpoint 대신 그 주소로 요청 (Link 헤더의 다음 페이지 주소, endpoint는 레이트 리밋 그룹용)
+        next_link=True면 (응답 데이터, 다음 페이지 주소 또는 None) 반환
+        """
+        url = url or f"{self.base_url}/{endpoint}"
         headers = self._get_headers()
         
+        family = endpoint_family(endpoint)
+        priority = current_priority()
+        
         try:
-            if method == "GET":
-                response = requests.get(url, headers=headers, params=params)
-            elif method == "POST":
+            if method not in ("GET", "POST", "PUT", "DELETE"):
+                raise ValueError(f"지원되지 않는 HTTP 메서드: {method}")
+            if files:
+                # 파일 업로드 시 Content-Type 헤더 제거
+                headers.pop("Content-Type", None)
+            for attempt in range(WEBEX_MAX_429_RETRIES + 1):
+                self.rate_limiter.acquire(family, priority)
                 if files:
-                    # 파일 업로드 시 Content-Type 헤더 제거
-                    headers.pop("Content-Type", None)
-                    response = requests.post(url, headers=headers, data=data, files=files)
+                    response = self.session.request(method, url, headers=headers, data=data, files=files,
+                                                    params=params, timeout=self.timeout)
                 else:
-                    response = requests.post(url, headers=headers, json=data, params=params)
-            elif method == "PUT":
-                response = requests.put(url, headers=headers, json=data)
-            elif method == "DELETE":
-                response = requests.delete(url, headers=headers)
-            else:
-                raise ValueError(f"지원되지 않는 HTTP 메서드: {method}")
+                    response = self.session.request(method, url, headers=headers, json=data, params=params,
+                                                    timeout=self.timeout)
+                if response.status_code != 429:
+                    break
+                # 마지막 시도여도 그룹을 멈춰서 다음 요청이 Retry-After 전에 나가지 않도록 함
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                self.rate_limiter.block(family, retry_after)
+                if attempt == WEBEX_MAX_429_RETRIES:
+                    break
+                # 429는 요청이 처리되지 않은 것이므로 POST도 재시도
+                print(f"Webex 요청 제한(429): {family} {retry_after:.1f}초 대기 후 재시도 ({attempt + 1}/{WEBEX_MAX_429_RETRIES})")
             
             response.raise_for_status()
             
             if response.status_code == 204:  # No Content
                 return {"status": "success"}
             
+            if next_link:
+                return response.json(), response.links.get("next", {}).get("url")
             return response.json()
         
         except requests.exceptions.RequestException as e:
@@ -107,6 +414,91 @@ class WebexAPI:
         """
         return self._make_request("GET", "people/me")
     
+    # 목록 조회 (페이지 단위)
+    
+    def iter_pages(self, endpoint, params=None, prefetch=False):
+        """
+        목록 엔드포인트를 페이지 단위로 순회 (Link: rel="next"를 따라 필요할 때만 다음 페이지 요청)
+        
+        메모리에는 현재 페이지(prefetch=True면 다음 페이지까지)만 유지한다.
+        
+        Args:
+            endpoint: 목록 엔드포인트 (messages, memberships, rooms, meetings 등)
+            params: 첫 페이지 쿼리 파라미터 (다음 페이지는 Link 주소에 포함됨)
+            prefetch: True면 현재 페이지를 처리하는 동안 다음 페이지를 백그라운드에서 받음
+            
+        Yields:
+            items: 페이지의 항목 리스트
+        """
+        def fetch(url):
+            return self._send_request("GET", endpoint, params=None if url else params, url=url, next_link=True)
+        
+        pending = None
+        try:
+            body, next_url = fetch(None)
+            while True:
+                if prefetch and next_url:
+                    # 우선순위 등 현재 컨텍스트를 그대로 가져가서 요청
+                    pending = page_executor.submit(contextvars.copy_context().run, fetch, next_url)
+                yield body.get("items", [])
+                if not next_url:
+                    return
+                if pending is not None:
+                    body, next_url = pending.result()
+                    pending = None
+                else:
+                    body, next_url = fetch(next_url)
+        finally:
+            if pending is not None:
+                pending.cancel()  # 순회를 중간에 멈추면 받지 않은 다음 페이지는 버림
+    
+    def iter_items(self, endpoint, params=None, prefetch=False):
+        """목록 엔드포인트의 항목을 하나씩 순회 (iter_pages 참고)"""
+        for items in self.iter_pages(endpoint, params, prefetch):
+            yield from items
+    
+    def iter_messages(self, room_id, page_size=WEBEX_PAGE_SIZE, before=None, prefetch=False):
+        """
+        룸 메시지 전체 순회 (최신순)
+        
+        Args:
+            room_id: 룸 ID
+            page_size: 페이지당 항목 수 (선택적)
+            before: 이 시각(ISO 8601) 이전 메시지만 (선택적)
+            prefetch: 다음 페이지 미리 받기 (선택적)
+        """
+        params = {"roomId": room_id, "max": page_size}
+        if before:
+            params["before"] = before
+        return self.iter_items("messages", params, prefetch)
+    
+    def iter_memberships(self, room_id=None, person_email=None, page_size=WEBEX_PAGE_SIZE, prefetch=False):
+        """룸 멤버십 순회 (room_id / person_email로 필터)"""
+        params = {"max": page_size}
+        if room_id:
+            params["roomId"] = room_id
+        if person_email:
+            params["personEmail"] = person_email
+        return self.iter_items("memberships", params, prefetch)
+    
+    def iter_rooms(self, team_id=None, room_type=None, page_size=WEBEX_PAGE_SIZE, prefetch=False):
+        """룸 순회 (team_id / room_type('group', 'direct')으로 필터)"""
+        params = {"max": page_size}
+        if team_id:
+            params["teamId"] = team_id
+        if room_type:
+            params["type"] = room_type
+        return self.iter_items("rooms", params, prefetch)
+    
+    def iter_meetings(self, from_time=None, to_time=None, page_size=WEBEX_PAGE_SIZE, prefetch=False):
+        """미팅 순회 (from_time / to_time: ISO 8601 기간 필터)"""
+        params = {"max": page_size}
+        if from_time:
+            params["from"] = from_time
+        if to_time:
+            params["to"] = to_time
+        return self.iter_items("meetings", params, prefetch)
+    
     # Instant Connect 관련 메서드
     
     def create_instant_connect_session(self, destination_type, destination_address, subject=None):
@@ -207,7 +599,7 @@ class WebexAPI:
             max_items: 최대 항목 수 (선택적)
             
         Returns:
-            messages: 메시지 목록
+            messages: 메시지 목록 (첫 페이지만, 전체 기록은 iter_messages 사용)
         """
         params = {
             "roomId": room_id,
@@ -385,16 +777,21 @@ class MedicalWebexIntegration:
     - 정기 원격 진료 일정 관리
     """
     
-    def __init__(self, webex_api):
+    def __init__(self, webex_api, outbox=None, team=None, account=None):
         """
         의료 Webex 통합 초기화
         
         Args:
             webex_api: WebexAPI 인스턴스
+            outbox: WebexOutbox 인스턴스 (선택적, 지정 시 메시지를 보관함에 기록 후 전송하여 실패해도 재시도)
+            team: 이미 준비된 긴급 대응 팀 {"team_id", "room_id"} (선택적, webex_bootstrap.ensure_emergency_team 결과)
+            account: webex_api의 계정 (의사별 토큰이면 사용자 ID). 보관함 재전송도 이 계정으로 보냄
         """
         self.webex_api = webex_api
-        self.emergency_team_id = None
-        self.emergency_room_id = None
+        self.outbox = outbox
+        self.account = account
+        self.emergency_team_id = (team or {}).get("team_id")
+        self.emergency_room_id = (team or {}).get("room_id")
     
     def setup_emergency_team(self, team_name="의료 긴급 대응팀", description="1형 당뇨 환자 긴급 대응을 위한 의료진 팀"):
         """
@@ -405,8 +802,10 @@ class MedicalWebexIntegration:
             description: 팀 설명
             
         Returns:
-            team_info: 생성된 팀 정보
+            team_info: 생성된 팀 정보 (이미 설정되어 있으면 {"id": 팀 ID}, 다시 만들지 않음)
         """
+        if self.emergency_team_id and self.emergency_room_id:
+            return {"id": self.emergency_team_id}
         team_info = self.webex_api.create_team(team_name, description)
         self.emergency_team_id = team_info["id"]
         
@@ -416,6 +815,7 @@ class MedicalWebexIntegration:
         
         return team_info
     
+    @with_priority(PRIORITY_ROUTINE)
     def add_healthcare_provider(self, email, name=None, role=None):
         """
         의료진 추가
@@ -434,6 +834,13 @@ class MedicalWebexIntegration:
         membership_info = self.webex_api.add_member_to_room(self.emergency_room_id, person_email=email)
         
         # 환영 메시지 전송
+        self.webex_api.send_message(room_id=self.emergency_room_id, text=self.welcome_message(name, role))
+        
+        return membership_info
+    
+    @staticmethod
+    def welcome_message(name=None, role=None):
+        """의료진 환영 메시지"""
         welcome_message = f"안녕하세요"
         if name:
             welcome_message += f" {name}"
@@ -441,11 +848,9 @@ class MedicalWebexIntegration:
         
         if role:
             welcome_message += f" 귀하는 {role} 역할로 등록되었습니다."
-        
-        self.webex_api.send_message(room_id=self.emergency_room_id, text=welcome_message)
-        
-        return membership_info
+        return welcome_message
     
+    @with_priority(PRIORITY_EMERGENCY)
     def create_emergency_session(self, patient_email, patient_name, glucose_value, prediction, doctor_email=None):
         """
         긴급 원격 진료 세션 생성
@@ -458,7 +863,7 @@ class MedicalWebexIntegration:
             doctor_email: 담당 의사 이메일 (선택적)
             
         Returns:
-            session_info: 생성된 세션 정보
+            session_info: 생성된 세션 정보 + notifications (대응 룸 / 담당 의사 메시지별 전송 결과)
         """
         # 세션 제목 생성
         subject = f"긴급 원격 진료: {patient_name} - 혈당 {glucose_value}mg/dL (예측: {prediction}mg/dL)"
@@ -470,27 +875,86 @@ class MedicalWebexIntegration:
             subject=subject
         )
         
-        # 긴급 대응 룸에 알림
+        # 긴급 대응 룸 알림과 담당 의사 메시지는 joinUrl만 있으면 되므로 동시에 전송
+        messages = self.emergency_messages(patient_name, glucose_value, prediction,
+                                           session_info.get('joinUrl', '링크 없음'), doctor_email)
+        session_info["notifications"] = self._send_notifications(messages)
+        return session_info
+    
+    def emergency_messages(self, patient_name, glucose_value, prediction, join_url, doctor_email=None):
+        """
+        긴급 세션 알림 메시지 (대응 룸 / 담당 의사)
+        
+        Returns:
+            messages: {"room" | "doctor": send_message 인자}
+        """
+        messages = {}
         if self.emergency_room_id:
             alert_message = f"⚠️ 긴급 알림: {patient_name} 환자의 혈당이 위험 수준입니다.\n"
             alert_message += f"현재 혈당: {glucose_value}mg/dL\n"
             alert_message += f"예측된 혈당: {prediction}mg/dL\n"
             alert_message += f"긴급 원격 진료 세션이 시작되었습니다.\n"
-            alert_message += f"세션 링크: {session_info.get('joinUrl', '링크 없음')}"
-            
-            self.webex_api.send_message(room_id=self.emergency_room_id, markdown=alert_message)
+            alert_message += f"세션 링크: {join_url}"
+            messages["room"] = {"room_id": self.emergency_room_id, "markdown": alert_message}
         
-        # 담당 의사에게 직접 메시지 전송
         if doctor_email:
             doctor_message = f"⚠️ 긴급 알림: 귀하의 환자 {patient_name}의 혈당이 위험 수준입니다.\n"
             doctor_message += f"현재 혈당: {glucose_value}mg/dL\n"
             doctor_message += f"예측된 혈당: {prediction}mg/dL\n"
             doctor_message += f"긴급 원격 진료 세션에 참여해 주세요.\n"
-            doctor_message += f"세션 링크: {session_info.get('joinUrl', '링크 없음')}"
-            
-            self.webex_api.send_message(person_email=doctor_email, markdown=doctor_message)
+            doctor_message += f"세션 링크: {join_url}"
+            messages["doctor"] = {"person_email": doctor_email, "markdown": doctor_message}
+        return messages
+    
+    def _send_notifications(self, messages, timeout=WEBEX_NOTIFY_TIMEOUT):
+        """
+        메시지 여러 건을 동시에 전송하고 건별 결과 반환 (일부 실패해도 예외를 던지지 않음)
         
-        return session_info
+        Args:
+            messages: {이름: send_message 인자}
+            timeout: 전체 대기 한도 (초, 메시지가 동시에 전송되므로 건별 한도와 같음)
+            
+        Returns:
+            results: {이름: {"status": "sent" | "failed" | "timeout", "message_id" | "error", "elapsed_ms"}}
+            보관함 사용 시 실패/시간 초과 메시지는 "outbox_id"와 함께 보관함에서 재시도된다.
+        """
+        priority = current_priority()  # 작업 스레드에도 호출한 쪽 우선순위 적용
+        started = time.perf_counter()
+        # 전송 전에 보관함에 먼저 기록 (바로 전송하되, 실패하면 보관함 발신 스레드가 재시도)
+        outbox_ids = {name: self.outbox.enqueue(kwargs, priority, claim=True, account=self.account)
+                      for name, kwargs in messages.items()} if self.outbox else {}
+        
+        def send(name, kwargs):
+            try:
+                with request_priority(priority):
+                    result = self.webex_api.send_message(**kwargs)
+            except Exception as e:
+                if name in outbox_ids:
+                    self.outbox.mark_failed([outbox_ids[name]], e)
+                raise
+            if name in outbox_ids:
+                self.outbox.mark_sent([outbox_ids[name]], result.get("id"))
+            return result, round((time.perf_counter() - started) * 1000, 1)
+        
+        futures = {name: notification_executor.submit(send, name, kwargs) for name, kwargs in messages.items()}
+        wait_futures(futures.values(), timeout=timeout)
+        results = {}
+        for name, future in futures.items():
+            if not future.done():
+                if future.cancel() and name in outbox_ids:
+                    self.outbox.mark_failed([outbox_ids[name]], "전송 시작 전 시간 초과")
+                results[name] = {"status": "timeout", "error": f"{timeout}초 내 응답 없음"}
+            elif future.exception() is not None:
+                results[name] = {"status": "failed", "error": str(future.exception())}
+            else:
+                message, elapsed_ms = future.result()
+                results[name] = {"status": "sent", "message_id": message.get("id"), "elapsed_ms": elapsed_ms}
+            if name in outbox_ids:
+                results[name]["outbox_id"] = outbox_ids[name]
+        failed = [name for name, result in results.items() if result["status"] != "sent"]
+        if failed:
+            print(f"긴급 알림 일부 전송 실패: {failed} ({results})")
+        return results
     
     def schedule_regular_checkup(self, patient_email, patient_name, doctor_email, doctor_name, 
                                 start_time, duration_minutes=30, notes=None):
@@ -509,6 +973,15 @@ class MedicalWebexIntegration:
         Returns:
             meeting_info: 생성된 미팅 정보
         """
+        meeting_info = self.webex_api.create_meeting(**self.checkup_meeting(
+            patient_email, patient_name, doctor_email, doctor_name, start_time, duration_minutes, notes))
+        
+        return meeting_info
+    
+    @staticmethod
+    def checkup_meeting(patient_email, patient_name, doctor_email, doctor_name,
+                        start_time, duration_minutes=30, notes=None):
+        """정기 원격 진료 미팅 생성 인자 (create_meeting 키워드 인자)"""
         # 미팅 제목 생성
         title = f"정기 원격 진료: {doctor_name} 의사 - {patient_name} 환자"
         
@@ -525,17 +998,15 @@ class MedicalWebexIntegration:
         if notes:
             agenda += f"\n\n메모: {notes}"
         
-        # 미팅 생성
-        meeting_info = self.webex_api.create_meeting(
-            title=title,
-            start_time=start_iso,
-            end_time=end_iso,
-            invitees=[patient_email, doctor_email],
-            agenda=agenda
-        )
-        
-        return meeting_info
+        return {
+            "title": title,
+            "start_time": start_iso,
+            "end_time": end_iso,
+            "invitees": [patient_email, doctor_email],
+            "agenda": agenda
+        }
     
+    @with_priority(PRIORITY_ROUTINE)
     def send_glucose_alert(self, patient_email, patient_name, glucose_value, prediction, 
                           alert_type="warning", recommendation=None):
         """
@@ -543,6 +1014,42 @@ class MedicalWebexIntegration:
         
         Args:
             patient_email: 환자 이메일
-            patient_name: 환자
-(Content truncated due to size limit. Use line ranges to read in chunks)
-        """
\ No newline at end of file
+            patient_name: 환자 이름
+            glucose_value: 현재 혈당 수치
+            prediction: 예측된 혈당 수치
+            alert_type: 알림 수준 ('info', 'warning', 'danger')
+            recommendation: 권장 조치 (선택적)
+            
+        Returns:
+            results: {"patient" | "room": 메시지 정보}
+            보관함 사용 시 {"status": "queued", "outbox_id"} (danger가 아니면 같은 대상의 알림과 묶어서 전송)
+        """
+        messages = self.glucose_alert_messages(patient_email, patient_name, glucose_value, prediction,
+                                               alert_type, recommendation)
+        if self.outbox:
+            digest = alert_type not in URGENT_ALERT_TYPES
+            priority = current_priority()
+            return {name: {"status": "queued",
+                           "outbox_id": self.outbox.enqueue(kwargs, priority, digest, account=self.account)}
+                    for name, kwargs in messages.items()}
+        return {name: self.webex_api.send_message(**kwargs) for name, kwargs in messages.items()}
+    
+    def glucose_alert_messages(self, patient_email, patient_name, glucose_value, prediction,
+                               alert_type="warning", recommendation=None):
+        """
+        혈당 알림 메시지 (환자 / 긴급 대응 룸)
+        
+        Returns:
+            messages: {"patient" | "room": send_message 인자}
+        """
+        label = GLUCOSE_ALERT_LABELS.get(alert_type, GLUCOSE_ALERT_LABELS["warning"])
+        alert_message = f"{label}: {patient_name} 환자\n"
+        alert_message += f"현재 혈당: {glucose_value}mg/dL\n"
+        alert_message += f"예측된 혈당: {prediction}mg/dL"
+        if recommendation:
+            alert_message += f"\n권장 조치: {recommendation}"
+        
+        messages = {"patient": {"person_email": patient_email, "markdown": alert_message}}
+        if self.emergency_room_id:
+            messages["room"] = {"room_id": self.emergency_room_id, "markdown": alert_message}
+        return messages
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Webex 발신 메시지 보관함 (SQLite)
+
+보낼 메시지를 먼저 로컬 SQLite에 기록하고(커밋 후 반환), 백그라운드 발신 스레드가 전송한다.
+- 전송 실패 시 지수 백오프로 재시도 (WEBEX_OUTBOX_MAX_ATTEMPTS회 후 dead)
+- 프로세스가 재시작되어도 기록된 메시지는 다시 전송 (전송 중 종료된 메시지는 임대 시간 후 재시도, 최소 1회 전달)
+- 긴급하지 않은 알림(digest)은 같은 대상(룸/사용자)에 WEBEX_DIGEST_WINDOW초 동안 모아 메시지 1건으로 합쳐 전송
+- 여러 프로세스가 같은 파일을 써도 BEGIN IMMEDIATE로 메시지를 선점하므로 중복 전송하지 않음
+- 의사별 토큰으로 보낸 메시지는 account(사용자 ID)를 함께 기록하고, 재전송도 그 계정의 클라이언트(client_for)로 보냄
+
+    outbox = WebexOutbox(webex_api, client_for=get_webex_api_client_for_user).start()
+    medical_webex = MedicalWebexIntegration(webex_api, outbox=outbox)
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from webex_integration import PRIORITY_NORMAL, request_priority
+
+# 보관함 파일 (기본: backend 디렉터리, 재시작 후에도 유지되는 경로여야 함. 쓸 수 없으면 app.py는 보관함 없이 바로 전송)
+WEBEX_OUTBOX_PATH = os.environ.get("WEBEX_OUTBOX_PATH",
+                                   os.path.join(os.path.dirname(os.path.abspath(__file__)), "webex_outbox.db"))
+WEBEX_DIGEST_WINDOW = float(os.environ.get("WEBEX_DIGEST_WINDOW", 300))  # 같은 대상 알림을 모으는 시간 (초)
+WEBEX_OUTBOX_MAX_ATTEMPTS = int(os.environ.get("WEBEX_OUTBOX_MAX_ATTEMPTS", 8))  # 전송 시도 한도
+WEBEX_OUTBOX_RETRY_BASE = float(os.environ.get("WEBEX_OUTBOX_RETRY_BASE", 5))  # 재시도 대기: 5s, 10s, 20s ... (최대 300s)
+WEBEX_OUTBOX_RETRY_MAX = 300
+WEBEX_OUTBOX_POLL_INTERVAL = 1.0  # 발신 스레드 확인 주기 (초)
+OUTBOX_LEASE_SECONDS = 120  # 전송 중 상태가 이보다 오래되면 (프로세스 종료 등) 다시 대기 상태로
+OUTBOX_BATCH_SIZE = 50  # 1회 확인에서 전송할 최대 메시지 수
+DIGEST_MAX_ITEMS = 30  # 묶음 메시지 1건에 합칠 최대 알림 수
+SENT_RETENTION_SECONDS = 7 * 24 * 3600  # 전송 완료 기록 보관 기간
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    target TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    priority INTEGER NOT NULL,
+    digest INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    next_attempt_at REAL NOT NULL,
+    claimed_at REAL,
+    sent_at REAL,
+    message_id TEXT,
+    last_error TEXT,
+    account TEXT
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS outbox_target ON outbox (status, digest, target);
+"""
+
+
+def message_target(message, account=None):
+    """send_message 인자 -> 묶음 단위 대상 키 (보내는 계정이 다르면 다른 대상)"""
+    if message.get("room_id"):
+        target = f"room:{message['room_id']}"
+    elif message.get("person_email"):
+        target = f"email:{message['person_email']}"
+    else:
+        target = f"person:{message.get('person_id')}"
+    return f"{account}|{target}" if account else target
+
+
+def digest_message(messages, window=WEBEX_DIGEST_WINDOW):
+    """같은 대상에 보낼 메시지 여러 건을 1건으로 합침 (1건이면 그대로)"""
+    if len(messages) == 1:
+        return messages[0]
+    merged = {k: v for k, v in messages[0].items() if k in ("room_id", "person_email", "person_id")}
+    body = "\n\n---\n\n".join(m.get("markdown") or m.get("text") or "" for m in messages)
+    merged["markdown"] = f"📋 혈당 알림 {len(messages)}건 (최근 {window / 60:.0f}분)\n\n{body}"
+    return merged
+
+
+class WebexOutbox:
+    """SQLite 기반 Webex 발신 보관함 + 백그라운드 발신 스레드"""
+
+    def __init__(self, webex_api, path=WEBEX_OUTBOX_PATH, digest_window=WEBEX_DIGEST_WINDOW,
+                 max_attempts=WEBEX_OUTBOX_MAX_ATTEMPTS, client_for=None):
+        """
+        Args:
+            webex_api: 기본(서비스 계정) 전송 클라이언트
+            client_for: account -> 그 계정의 WebexAPI (토큰이 없으면 None). account가 기록된 메시지 전송용
+        """
+        self.webex_api = webex_api
+        self.client_for = client_for
+        self.path = path
+        self.digest_window = digest_window
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            if "account" not in {row["name"] for row in conn.execute("PRAGMA table_info(outbox)")}:
+                conn.execute("ALTER TABLE outbox ADD COLUMN account TEXT")  # 이전 버전 보관함 파일
+
+    def _connection(self):
+        """스레드별 SQLite 연결 (WAL, 커밋 시 디스크 동기화)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=FULL")
+            self._local.conn = conn
+        return conn
+
+    def enqueue(self, message, priority=PRIORITY_NORMAL, digest=False, claim=False, account=None):
+        """
+        메시지 기록 (반환 시점에 디스크에 커밋됨)
+
+        Args:
+            message: send_message 인자 (room_id / person_email / person_id, text / markdown)
+            priority: 전송 우선순위
+            digest: True면 같은 대상의 다른 알림과 묶어서 전송
+            claim: True면 호출한 쪽이 바로 전송 (mark_sent / mark_failed로 결과 기록)
+            account: 보내는 계정 (의사별 토큰의 사용자 ID, None이면 서비스 계정)
+
+        Returns:
+            outbox_id
+        """
+        now = time.time()
+        cursor = self._connection().execute(
+            "INSERT INTO outbox (target, payload, priority, digest, status, created_at, next_attempt_at, claimed_at, "
+            "account) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (message_target(message, account), json.dumps(message, ensure_ascii=False), priority, int(digest),
+             "sending" if claim else "pending", now, now, now if claim else None, account))
+        if not digest and not claim:
+            self._wake.set()
+        return cursor.lastrowid
+
+    def mark_sent(self, ids, message_id=None):
+        self._connection().executemany(
+            "UPDATE outbox SET status = 'sent', sent_at = ?, message_id = ?, attempts = attempts + 1, "
+            "claimed_at = NULL WHERE id = ?", [(time.time(), message_id, i) for i in ids])
+
+    def mark_failed(self, ids, error):
+        """전송 실패: 재시도 대기 (시도 한도를 넘으면 dead)"""
+        conn = self._connection()
+        now = time.time()
+        for outbox_id in ids:
+            row = conn.execute("SELECT attempts FROM outbox WHERE id = ?", (outbox_id,)).fetchone()
+            attempts = (row["attempts"] if row else 0) + 1
+            status = "dead" if attempts >= self.max_attempts else "pending"
+            delay = min(WEBEX_OUTBOX_RETRY_MAX, WEBEX_OUTBOX_RETRY_BASE * 2 ** (attempts - 1))
+            conn.execute("UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, claimed_at = NULL, "
+                         "last_error = ? WHERE id = ?", (status, attempts, now + delay, str(error)[:500], outbox_id))
+            if status == "dead":
+                print(f"[outbox] 메시지({outbox_id}) 전송 포기 ({attempts}회 실패): {error}")
+
+    def claim_due(self, now=None):
+        """
+        지금 보낼 메시지를 선점하여 반환
+
+        Returns:
+            [(outbox_ids, send_message 인자, 우선순위, 보내는 계정), ...]
+        """
+        now = now or time.time()
+        conn = self._connection()
+        deliveries = []
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("UPDATE outbox SET status = 'pending', claimed_at = NULL "
+                         "WHERE status = 'sending' AND claimed_at < ?", (now - OUTBOX_LEASE_SECONDS,))
+            for row in conn.execute(
+                    "SELECT id, payload, priority, account FROM outbox WHERE status = 'pending' AND digest = 0 "
+                    "AND next_attempt_at <= ? ORDER BY priority, id LIMIT ?", (now, OUTBOX_BATCH_SIZE)).fetchall():
+                deliveries.append(([row["id"]], json.loads(row["payload"]), row["priority"], row["account"]))
+            # 묶음 알림: 대상별로 가장 오래된 알림이 묶음 시간을 넘기면 그때까지 쌓인 알림을 1건으로 전송
+            targets = conn.execute(
+                "SELECT target FROM outbox WHERE status = 'pending' AND digest = 1 AND next_attempt_at <= ? "
+                "GROUP BY target HAVING MIN(created_at) <= ?", (now, now - self.digest_window)).fetchall()
+            for target in targets:
+                rows = conn.execute(
+                    "SELECT id, payload, priority, account FROM outbox WHERE status = 'pending' AND digest = 1 "
+                    "AND target = ? AND next_attempt_at <= ? ORDER BY id LIMIT ?",
+                    (target["target"], now, DIGEST_MAX_ITEMS)).fetchall()
+                deliveries.append(([r["id"] for r in rows],
+                                   digest_message([json.loads(r["payload"]) for r in rows], self.digest_window),
+                                   min(r["priority"] for r in rows), rows[0]["account"]))
+            claimed = [i for ids, _, _, _ in deliveries for i in ids]
+            conn.executemany("UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                             [(now, i) for i in claimed])
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        deliveries.sort(key=lambda d: (d[2], d[0][0]))
+        return deliveries
+
+    def deliver_due(self, now=None):
+        """보낼 메시지를 전송하고 결과 기록. {"messages": API 호출 수, "items": 처리한 기록 수, "failed": 실패 수}"""
+        stats = {"messages": 0, "items": 0, "failed": 0}
+        for ids, message, priority, account in self.claim_due(now):
+            try:
+                webex_api = self.api_for(account)
+                if webex_api is None:
+                    raise RuntimeError(f"계정({account}) Webex 토큰 없음")
+                with request_priority(priority):
+                    result = webex_api.send_message(**message)
+                self.mark_sent(ids, result.get("id"))
+            except Exception as e:
+                self.mark_failed(ids, e)
+                stats["failed"] += 1
+            stats["messages"] += 1
+            stats["items"] += len(ids)
+        return stats
+
+    def api_for(self, account):
+        """메시지를 보낼 클라이언트 (account가 없으면 서비스 계정)"""
+        if account is None:
+            return self.webex_api
+        return self.client_for(account) if self.client_for else None
+
+    def prune(self, older_than=SENT_RETENTION_SECONDS):
+        self._connection().execute("DELETE FROM outbox WHERE status = 'sent' AND sent_at < ?",
+                                   (time.time() - older_than,))
+
+    def counts(self):
+        """{상태: 메시지 수}"""
+        rows = self._connection().execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def _run(self):
+        last_prune = 0.0
+        while not self._stop.is_set():
+            try:
+                stats = self.deliver_due()
+                if stats["items"]:
+                    print(f"[outbox] 전송 {stats['messages']}건 (알림 {stats['items']}건, 실패 {stats['failed']}건)")
+                if time.time() - last_prune > 3600:
+                    self.prune()
+                    last_prune = time.time()
+            except Exception as e:
+                print(f"[outbox] 발신 처리 오류: {e}")
+            self._wake.wait(WEBEX_OUTBOX_POLL_INTERVAL)
+            self._wake.clear()
+
+    def start(self):
+        """백그라운드 발신 스레드 시작 (이전 실행에서 남은 메시지부터 전송)"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="webex-outbox", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+"""
+사용자별 Webex 토큰 메모리 캐시
+
+- get(): 캐시된 토큰이 유효하면 메모리에서 바로 반환 (Firestore 조회 없음)
+  처음 조회하는 사용자는 load_fn(Firestore)으로 한 번 읽고, 만료된 경우에만 요청 중에 갱신
+- 백그라운드 스레드가 만료 WEBEX_TOKEN_REFRESH_AHEAD초 전에 미리 갱신
+- 사용자별 조회/갱신은 single-flight: 동시에 여러 요청이 와도 진행 중인 갱신은 사용자당 1건
+- 갱신 함수는 결과를 put()으로 반영 (app.store_tokens가 Firestore 저장과 함께 호출)
+- WebexClientPool: 사용자별 WebexAPI 클라이언트를 LRU로 보관, 토큰이 갱신되면 클라이언트의 토큰만 교체
+
+    webex_token_cache = WebexTokenCache(get_tokens, lambda user_id, record: refresh_tokens(user_id, record.get('refresh_token')))
+    access_token = webex_token_cache.get(user_id)
+
+    webex_client_pool = WebexClientPool(WebexAPI)
+    webex_token_cache.add_listener(webex_client_pool.rebind)
+    client = webex_client_pool.get(user_id, access_token)
+"""
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from singleflight import SingleFlight
+
+WEBEX_TOKEN_REFRESH_AHEAD = float(os.environ.get("WEBEX_TOKEN_REFRESH_AHEAD", 600))  # 만료 몇 초 전에 미리 갱신할지
+WEBEX_TOKEN_CHECK_INTERVAL = float(os.environ.get("WEBEX_TOKEN_CHECK_INTERVAL", 60))  # 백그라운드 만료 확인 주기 (초)
+WEBEX_CLIENT_POOL_SIZE = int(os.environ.get("WEBEX_CLIENT_POOL_SIZE", 256))  # 보관할 사용자별 클라이언트 수
+
+
+def normalize_expiry(expires_at):
+    """Firestore Timestamp / naive datetime -> UTC aware datetime (알 수 없으면 None)"""
+    if not isinstance(expires_at, datetime):
+        return None
+    if expires_at.tzinfo is None:
+        return expires_at.replace(tzinfo=timezone.utc)
+    return expires_at
+
+
+class WebexTokenCache:
+    """사용자별 Webex 토큰 캐시 + 선제 갱신"""
+
+    def __init__(self, load_fn, refresh_fn, refresh_ahead=WEBEX_TOKEN_REFRESH_AHEAD):
+        """
+        Args:
+            load_fn: user_id -> 저장된 토큰 dict (access_token, refresh_token, expires_at) 또는 None
+            refresh_fn: (user_id, 토큰 dict) -> 새 access_token 또는 None (성공 시 put()으로 반영)
+            refresh_ahead: 만료 몇 초 전부터 백그라운드 갱신 대상으로 볼지
+        """
+        self.load_fn = load_fn
+        self.refresh_fn = refresh_fn
+        self.refresh_ahead = refresh_ahead
+        self._records = {}
+        self._lock = threading.Lock()
+        self._loads = SingleFlight()
+        self._refreshes = SingleFlight()
+        self._listeners = []
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"hits": 0, "loads": 0, "refreshes": 0, "background_refreshes": 0}
+
+    def put(self, user_id, record):
+        """새 토큰 반영 (저장 / 갱신 직후 호출)"""
+        record = dict(record, expires_at=normalize_expiry(record.get("expires_at")))
+        with self._lock:
+            previous = self._records.get(user_id)
+            self._records[user_id] = record
+        if previous is None or previous.get("access_token") != record.get("access_token"):
+            for listener in list(self._listeners):
+                listener(user_id, record.get("access_token"))
+
+    def invalidate(self, user_id):
+        """캐시 삭제 (토큰 폐기 / 재인증 필요 시)"""
+        with self._lock:
+            self._records.pop(user_id, None)
+        for listener in list(self._listeners):
+            listener(user_id, None)
+
+    def add_listener(self, listener):
+        """토큰이 바뀌거나 삭제될 때 listener(user_id, access_token 또는 None) 호출"""
+        self._listeners.append(listener)
+
+    def peek(self, user_id):
+        """캐시에 유효한 토큰이 있으면 반환 (조회 / 갱신하지 않음)"""
+        with self._lock:
+            record = self._records.get(user_id)
+        if record and record["expires_at"] and record["expires_at"] > datetime.now(timezone.utc):
+            return record.get("access_token")
+        return None
+
+    def _load(self, user_id):
+        def load():
+            self.stats["loads"] += 1
+            record = self.load_fn(user_id)
+            if record:
+                record = dict(record, expires_at=normalize_expiry(record.get("expires_at")))
+                with self._lock:
+                    self._records.setdefault(user_id, record)
+            return record
+        return self._loads.do(user_id, load)
+
+    def refresh(self, user_id, record=None):
+        """사용자 토큰 갱신 (이미 진행 중이면 그 결과를 기다려 공유)"""
+        def renew():
+            self.stats["refreshes"] += 1
+            current = record or self._records.get(user_id) or self.load_fn(user_id) or {}
+            access_token = self.refresh_fn(user_id, current)
+            if access_token is None:
+                self.invalidate(user_id)  # 다음 요청에서 저장소를 다시 읽음 (다른 프로세스가 갱신했을 수 있음)
+            return access_token
+        return self._refreshes.do(user_id, renew)
+
+    def get(self, user_id):
+        """유효한 access_token 반환 (없거나 갱신 실패 시 None)"""
+        access_token = self.peek(user_id)
+        if access_token is not None:
+            self.stats["hits"] += 1
+            return access_token
+        record = self._records.get(user_id) or self._load(user_id)
+        if not record:
+            return None
+        if record["expires_at"] and record["expires_at"] > datetime.now(timezone.utc):
+            return record.get("access_token")
+        print(f"토큰 만료 또는 시간 정보 없음, 갱신 시도: 사용자={user_id}")
+        return self.refresh(user_id, record)
+
+    def refresh_expiring(self):
+        """만료가 가까운 캐시 토큰을 미리 갱신. 갱신한 사용자 수 반환"""
+        deadline = datetime.now(timezone.utc).timestamp() + self.refresh_ahead
+        with self._lock:
+            expiring = [user_id for user_id, record in self._records.items()
+                        if record["expires_at"] is None or record["expires_at"].timestamp() < deadline]
+        for user_id in expiring:
+            try:
+                # 다른 프로세스가 이미 갱신해 저장했으면 그 토큰을 사용 (refresh_token 중복 사용 방지)
+                stored = self.load_fn(user_id)
+                expires_at = normalize_expiry((stored or {}).get("expires_at"))
+                if expires_at and expires_at.timestamp() >= deadline:
+                    self.put(user_id, stored)
+                    continue
+                if self.refresh(user_id, stored):
+                    self.stats["background_refreshes"] += 1
+            except Exception as e:
+                print(f"[webex_tokens] 사용자({user_id}) 토큰 선제 갱신 실패: {e}")
+        return len(expiring)
+
+    def _run(self):
+        while not self._stop.wait(WEBEX_TOKEN_CHECK_INTERVAL):
+            self.refresh_expiring()
+
+    def start(self):
+        """백그라운드 선제 갱신 스레드 시작"""
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="webex-token-refresh", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+
+
+class WebexClientPool:
+    """
+    사용자별 Webex API 클라이언트 LRU 풀
+
+    클라이언트는 공유 세션(연결 풀)을 쓰므로 같은 의사의 반복 요청은 만들어 둔 클라이언트와
+    keep-alive 연결을 그대로 사용한다. 한도를 넘으면 가장 오래 쓰지 않은 클라이언트부터 제거.
+    """
+
+    def __init__(self, factory, max_size=WEBEX_CLIENT_POOL_SIZE):
+        """
+        Args:
+            factory: access_token 키워드 인자를 받아 클라이언트를 만드는 함수 (예: WebexAPI)
+            max_size: 보관할 최대 클라이언트 수
+        """
+        self.factory = factory
+        self.max_size = max_size
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "created": 0, "evicted": 0, "rebound": 0}
+
+    def get(self, user_id, access_token):
+        """사용자 클라이언트 반환 (없으면 생성, 토큰이 바뀌었으면 교체)"""
+        with self._lock:
+            client = self._clients.get(user_id)
+            if client is not None:
+                self._clients.move_to_end(user_id)
+                self.stats["hits"] += 1
+                if client.access_token != access_token:
+                    client.access_token = access_token
+                    self.stats["rebound"] += 1
+                return client
+            client = self.factory(access_token=access_token)
+            self._clients[user_id] = client
+            self.stats["created"] += 1
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+                self.stats["evicted"] += 1
+            return client
+
+    def rebind(self, user_id, access_token):
+        """토큰 캐시 listener: 갱신된 토큰을 클라이언트에 반영 (None이면 클라이언트 제거)"""
+        with self._lock:
+            if access_token is None:
+                self._clients.pop(user_id, None)
+                return
+            client = self._clients.get(user_id)
+            if client is not None and client.access_token != access_token:
+                client.access_token = access_token
+                self.stats["rebound"] += 1
+
+    def clear(self):
+        with self._lock:
+            self._clients.clear()
+
+    def __len__(self):
+        return len(self._clients)
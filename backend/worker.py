@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+예측 워커 진입점
+
+웹 프로세스(app.py)는 torch / 모델을 import하지 않고, 예측은 이 워커가 담당한다.
+- 주기적 예측 루프 (bit_maml.run_prediction_task)
+- 웹에서 남긴 prediction_requests/{patient_id} 요청 처리 (PREDICTION_MODE=worker)
+- 예측/상태 기록 보존 기간 압축 (compaction.run_compaction, COMPACTION_INTERVAL_HOURS 간격)
+
+실행: python worker.py
+Vercel 같은 서버리스 배포에서는 워커가 실행되지 않으므로 웹은 PREDICTION_MODE=inline으로 둔다 (vercel.json).
+"""
+import os
+import time
+
+from apscheduler.schedulers.background import BackgroundScheduler
+
+from firebase_client import get_db
+
+PREDICTION_REQUESTS_COLLECTION = 'prediction_requests'
+COMPACTION_INTERVAL_HOURS = float(os.environ.get("COMPACTION_INTERVAL_HOURS", 6))  # 압축 주기 (0이면 비활성)
+
+
+def handle_prediction_requests(snapshot, changes, read_time):
+    """prediction_requests 컬렉션 리스너: 새 요청마다 예측 후 요청 문서 삭제"""
+    from bit_maml import predict_and_store_once
+    for change in changes:
+        if change.type.name not in ("ADDED", "MODIFIED"):
+            continue
+        doc = change.document
+        patient_id = doc.to_dict().get("patient_id", doc.id)
+        try:
+            predict_and_store_once(patient_id)
+        except Exception as e:
+            print(f"[worker] 환자({patient_id}) 예측 실패: {e}")
+        finally:
+            doc.reference.delete()
+
+
+def start_compaction_scheduler():
+    """보존 기간 압축 작업을 백그라운드 스케줄러에 등록 (이전 실행이 끝나지 않았으면 건너뜀)"""
+    if COMPACTION_INTERVAL_HOURS <= 0:
+        return None
+    from compaction import run_compaction
+    scheduler = BackgroundScheduler(timezone="Asia/Seoul")
+    scheduler.add_job(run_compaction, "interval", hours=COMPACTION_INTERVAL_HOURS,
+                      id="compaction", max_instances=1, coalesce=True)
+    scheduler.start()
+    print(f"[worker] 압축 작업 등록 ({COMPACTION_INTERVAL_HOURS}시간 간격)")
+    return scheduler
+
+
+def run_worker():
+    started = time.perf_counter()
+    from bit_maml import run_prediction_task  # torch 로드
+    print(f"[worker] 모델 모듈 로드 완료 ({time.perf_counter() - started:.2f}s)")
+
+    db = get_db()
+    if db is None:
+        print("[worker] Firestore 미연결. 예측 워커를 시작하지 않습니다.")
+        return
+    watch = db.collection(PREDICTION_REQUESTS_COLLECTION).on_snapshot(handle_prediction_requests)
+    scheduler = start_compaction_scheduler()
+    try:
+        run_prediction_task()  # 주기적 예측 루프 (블로킹)
+    finally:
+        watch.unsubscribe()
+        if scheduler is not None:
+            scheduler.shutdown(wait=False)
+
+
+if __name__ == '__main__':
+    run_worker()